@@ -61,6 +61,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mall.metrics.MetricsMiddleware",
+    # 세션/인증 쿼리까지 집계하도록 가장 먼저 실행
+    "mall.query_budget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -110,6 +113,18 @@ DATABASES = {
 }
 
 
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# 상품 목록 캐시는 상품 변경 시 버전으로 무효화하므로 만료 시간을 길게 지정
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=60 * 60 * 24)
+
+# 관리자 목록에서 필터 없는 전체 건수(COUNT)를 캐시하는 시간(초)
+ESTIMATED_COUNT_CACHE_TIMEOUT = env.int("ESTIMATED_COUNT_CACHE_TIMEOUT", default=60 * 5)
+
+# 상품 재고를 나누어 저장할 행 수. 동시 주문이 많은 상품일수록 크게 지정
+PRODUCT_STOCK_SHARD_COUNT = env.int("PRODUCT_STOCK_SHARD_COUNT", default=4)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -153,6 +168,12 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "media/"
 MEDIA_ROOT = env.str("MEDIA_ROOT", default=BASE_DIR / "media")
 
+# 상품 사진 저장 시, warm_thumbnails 실행 시 미리 생성할 썸네일 (geometry, 옵션)
+# mall/_product_list.html의 {% thumbnail %} 태그와 같은 값을 지정해야 합니다.
+PRODUCT_THUMBNAIL_LIST = [
+    ("300x300", {"crop": "center"}),
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -162,8 +183,44 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # django debug toolbar
 INTERNAL_IPS = env.list("INTERNAL_IPS", default=["127.0.0.1"])
 
+# 응답에 X-Query-Count, X-Query-Time 헤더를 추가하고 쿼리 예산을 검사할지 여부
+# (DB 시간과 쿼리 수가 외부에 노출되므로 운영 환경에서는 끔)
+QUERY_BUDGET_ENABLED = env.bool("QUERY_BUDGET_ENABLED", default=DEBUG)
+
+# /mall/metrics/ 수집용 토큰. Prometheus에서 Authorization: Bearer <토큰> 헤더로 전달
+# (토큰을 지정하지 않으면 스태프 계정이나 METRICS_ALLOWED_IPS에서만 조회 가능)
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
+# /mall/metrics/ 를 토큰 없이 수집할 수 있는 Prometheus 서버 IP (REMOTE_ADDR 기준)
+# 같은 서버의 리버스 프록시(nginx 등)를 거치면 모든 요청이 127.0.0.1에서 오므로
+# 프록시 뒤에서는 지정하지 말고 METRICS_TOKEN을 사용
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=[])
+
+# 장바구니 일괄 담기 요청 1번에 담을 수 있는 최대 항목 수
+CART_BATCH_MAX_ITEMS = env.int("CART_BATCH_MAX_ITEMS", default=100)
+
 PORTONE_SHOP_ID = env.str("PORTONE_SHOP_ID", default="")
 PORTONE_API_KEY = env.str("PORTONE_API_KEY", default="")
 PORTONE_API_SECRET = env.str("PORTONE_API_SECRET", default="")
+PORTONE_API_URL = env.str("PORTONE_API_URL", default="https://api.iamport.kr/")
+# ASGI로 배포할 때 결제 검증을 비동기 뷰(order_check_async, payment_check_async)로 처리
+PORTONE_ASYNC_CHECK = env.bool("PORTONE_ASYNC_CHECK", default=False)
+# 같은 웹훅 알림을 중복 처리하지 않도록 기억하는 시간(초)
+PORTONE_WEBHOOK_DEDUP_TIMEOUT = env.int("PORTONE_WEBHOOK_DEDUP_TIMEOUT", default=60 * 60)
+# 웹훅의 merchant_uid로 결제를 찾을 모델 (uid 필드와 update_by_webhook() 메서드 필요, 순서대로 조회)
+PORTONE_WEBHOOK_PAYMENT_MODELS = ["mall.OrderPayment", "mall_test.Payment"]
+# order_pay를 다시 열었을 때 새로 만들지 않고 재사용할 결제 준비(READY) 건의 유효 시간(초)
+PORTONE_PAYMENT_REUSE_TIMEOUT = env.int("PORTONE_PAYMENT_REUSE_TIMEOUT", default=60 * 30)
+# 포트원 연결/응답 대기 시간(초). 포트원 장애 시 워커가 무한정 대기하지 않도록 지정
+PORTONE_CONNECT_TIMEOUT = env.float("PORTONE_CONNECT_TIMEOUT", default=3.0)
+PORTONE_READ_TIMEOUT = env.float("PORTONE_READ_TIMEOUT", default=10.0)
+# 결제 조회(find)가 타임아웃/5xx로 실패했을 때 재시도 횟수와 재시도 대기 기준 시간(초)
+PORTONE_FIND_RETRIES = env.int("PORTONE_FIND_RETRIES", default=2)
+PORTONE_RETRY_BACKOFF = env.float("PORTONE_RETRY_BACKOFF", default=0.2)
+# 최근 PORTONE_CIRCUIT_WINDOW_SIZE번 호출 중 PORTONE_CIRCUIT_MIN_CALLS번 이상 호출했고
+# 실패 비율이 PORTONE_CIRCUIT_FAILURE_RATE 이상이면 PORTONE_CIRCUIT_RESET_TIMEOUT초 동안 호출하지 않음
+PORTONE_CIRCUIT_FAILURE_RATE = env.float("PORTONE_CIRCUIT_FAILURE_RATE", default=0.5)
+PORTONE_CIRCUIT_MIN_CALLS = env.int("PORTONE_CIRCUIT_MIN_CALLS", default=10)
+PORTONE_CIRCUIT_WINDOW_SIZE = env.int("PORTONE_CIRCUIT_WINDOW_SIZE", default=20)
+PORTONE_CIRCUIT_RESET_TIMEOUT = env.float("PORTONE_CIRCUIT_RESET_TIMEOUT", default=30.0)
 PORTONE_PG_PROVIDER = env.str("PORTONE_PG_PROVIDER", default="")
 PORTONE_PG = PORTONE_PG_PROVIDER
@@ -1,21 +1,61 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import F, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 
-from mall.models import CartProduct, Category, Order, OrderPayment, Product
+from mall.catalog_cache import bump_catalog_version
+from mall.export import make_export_response
+from mall.forms import SalesReportForm
+from mall.models import (
+    CartProduct,
+    Category,
+    DailyCategorySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderPayment,
+    PortoneResponse,
+    Product,
+    ProductStock,
+)
+from mall.paginator import EstimatedCountPaginator
+from mall.reconcile import reconcile_payments
 
 # Register your models here.
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    주문/결제처럼 행이 많은 테이블의 관리자.
+    전체 건수는 추정 건수를 사용하고, 필터 결과 옆에 전체 건수를 표시하기 위한 COUNT를 생략
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ["pk", "name"]
     list_display_links = ["name"]
 
 
+class ProductStockInline(admin.TabularInline):
+    model = ProductStock
+    extra = 0
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
+    inlines = [ProductStockInline]
     search_fields = ["name"]
     list_display = ["category", "name", "price", "status"]
     list_display_links = ["name"]
+    list_select_related = ["category"]
     list_filter = ["category", "status", "created_at", "updated_at"]
     date_hierarchy = "updated_at"
     actions = ["make_active"]
@@ -25,6 +65,8 @@ class ProductAdmin(admin.ModelAdmin):
     )
     def make_active(self, request, queryset):
         count = queryset.update(status=Product.Status.ACTIVE)
+        # QuerySet.update는 post_save 시그널이 발생하지 않으므로 직접 캐시 무효화
+        bump_catalog_version()
         # for q in queryset:
         #     q.status = Product.status.ACTIVE
         #     q.save()
@@ -35,30 +77,182 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(CartProduct)
-class CartProductAdmin(admin.ModelAdmin):
-    pass
+class CartProductAdmin(LargeTableAdmin):
+    list_display = ["pk", "user", "product", "quantity", "line_amount"]
+    list_select_related = ["user", "product"]
+    # 전체 사용자/상품을 select 박스로 불러오지 않도록 지정
+    raw_id_fields = ["user"]
+    autocomplete_fields = ["product"]
+
+    def get_queryset(self, request):
+        # 행마다 amount 속성을 계산하지 않고 DB에서 계산
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(line_amount=F("product__price") * F("quantity"))
+        )
+
+    @admin.display(description="금액", ordering="line_amount")
+    def line_amount(self, obj):
+        return obj.line_amount
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ["pk", "name", "total_amount", "status"]
-    actions = ["make_cancel", "order_update"]
+class OrderAdmin(LargeTableAdmin):
+    list_display = ["pk", "name", "user", "total_amount", "status", "created_at"]
+    list_select_related = ["user"]
+    # 인덱스가 있는 필드로만 필터
+    list_filter = ["status", "created_at"]
+    raw_id_fields = ["user"]
+    actions = [
+        "make_cancel",
+        "order_update",
+        "export_orders_csv",
+        "export_orders_jsonl",
+        "export_ordered_products_csv",
+        "export_ordered_products_jsonl",
+    ]
 
     @admin.display(description=f"지정 주문 결제를 취소합니다.")
     def make_cancel(self, request, queryset):
-        for order in queryset:
-            order.cancel("관리자가 주문 결제를 취소했습니다.")
-        self.message_user(request, f"{queryset.count()}개의 주문 결제를 취소했습니다.")
+        result = reconcile_payments(
+            OrderPayment.objects.filter(order__in=queryset),
+            cancel=True,
+            reason="관리자가 주문 결제를 취소했습니다.",
+        )
+        self.message_user(
+            request,
+            f"{queryset.count()}개의 주문 결제를 취소했습니다. (실패 {result.failed}건)",
+        )
 
     @admin.display(description="지정 주문의 결제 상황을 업데이트합니다.")
     def order_update(self, request, queryset):
-        for order in queryset:
-            order.update()
+        result = reconcile_payments(OrderPayment.objects.filter(order__in=queryset))
         self.message_user(
-            request, f"{queryset.count()}개의 결제 상태를 업데이트했습니다."
+            request,
+            f"{queryset.count()}개의 결제 상태를 업데이트했습니다. (실패 {result.failed}건)",
         )
 
+    # 날짜/상태로 거른 목록에서 "모두 선택"하면 필터 결과 전체를 내보냄
+    @admin.display(description="지정 주문을 CSV로 내보냅니다.")
+    def export_orders_csv(self, request, queryset):
+        return make_export_response("orders", queryset, "csv")
+
+    @admin.display(description="지정 주문을 JSONL로 내보냅니다.")
+    def export_orders_jsonl(self, request, queryset):
+        return make_export_response("orders", queryset, "jsonl")
+
+    @admin.display(description="지정 주문의 주문 상품을 CSV로 내보냅니다.")
+    def export_ordered_products_csv(self, request, queryset):
+        return make_export_response("ordered_products", queryset, "csv")
+
+    @admin.display(description="지정 주문의 주문 상품을 JSONL로 내보냅니다.")
+    def export_ordered_products_jsonl(self, request, queryset):
+        return make_export_response("ordered_products", queryset, "jsonl")
+
 
 @admin.register(OrderPayment)
-class OrderPaymentAdmin(admin.ModelAdmin):
-    pass
+class OrderPaymentAdmin(LargeTableAdmin):
+    list_display = [
+        "pk",
+        "order_id",
+        "name",
+        "desired_amount",
+        "pay_status",
+        "is_paid_ok",
+        "updated_at",
+    ]
+    list_filter = ["pay_status", "is_paid_ok"]
+    search_fields = ["=uid"]
+    raw_id_fields = ["order"]
+
+
+@admin.register(PortoneResponse)
+class PortoneResponseAdmin(LargeTableAdmin):
+    list_display = ["pk", "merchant_uid", "status", "created_at"]
+    list_filter = ["status"]
+    search_fields = ["=merchant_uid"]
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """매출 집계는 주문 상태 변경과 rebuild_sales 명령으로만 변경하므로 조회만 허용"""
+
+    list_display = ["date", "order_count", "quantity", "amount"]
+    date_hierarchy = "date"
+
+    # 매출 보고서에 표시할 상품/분류 수
+    REPORT_TOP_SIZE = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "report/",
+                self.admin_site.admin_view(self.report_view),
+                name="mall_dailysales_report",
+            ),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """기간별 매출 보고서. 주문/주문 상품 테이블은 조회하지 않고 집계 테이블만 조회"""
+        # admin_view는 스태프 여부만 확인하므로 매출 조회 권한을 직접 확인
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        today = timezone.localdate()
+        form = SalesReportForm(
+            request.GET or {"start": today - timedelta(days=29), "end": today}
+        )
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title="매출 보고서",
+            form=form,
+        )
+
+        if form.is_valid():
+            date_range = (form.cleaned_data["start"], form.cleaned_data["end"])
+            sales_qs = DailySales.objects.filter(date__range=date_range)
+            context["sales_list"] = sales_qs.order_by("date")
+            context["total"] = sales_qs.aggregate(
+                order_count=Sum("order_count"),
+                quantity=Sum("quantity"),
+                amount=Sum("amount"),
+            )
+
+            product_sales_list = list(
+                DailyProductSales.objects.filter(date__range=date_range)
+                .values("product_id")
+                .annotate(quantity=Sum("quantity"), amount=Sum("amount"))
+                .order_by("-amount")[: self.REPORT_TOP_SIZE]
+            )
+            # 순위에 든 상품의 이름만 pk로 조회
+            product_dict = Product.objects.only("name").in_bulk(
+                [row["product_id"] for row in product_sales_list]
+            )
+            for row in product_sales_list:
+                row["product"] = product_dict.get(row["product_id"])
+            context["product_sales_list"] = product_sales_list
+
+            category_sales_list = list(
+                DailyCategorySales.objects.filter(date__range=date_range)
+                .values("category_id")
+                .annotate(quantity=Sum("quantity"), amount=Sum("amount"))
+                .order_by("-amount")[: self.REPORT_TOP_SIZE]
+            )
+            category_dict = Category.objects.in_bulk(
+                [row["category_id"] for row in category_sales_list]
+            )
+            for row in category_sales_list:
+                row["category"] = category_dict.get(row["category_id"])
+            context["category_sales_list"] = category_sales_list
+
+        return TemplateResponse(request, "admin/mall/dailysales/report.html", context)
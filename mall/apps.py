@@ -1,6 +1,35 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+)
+
+
+def ensure_search_index(using, **kwargs):
+    from django.db import connections
+    from mall.search import install_search_index
+
+    # SQLite는 컬럼 변경 시 테이블을 다시 만들면서 FTS 트리거가 삭제되므로 migrate 후 다시 생성
+    install_search_index(connections[using])
 
 
 class MallConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mall'
+
+    def ready(self):
+        from mall.catalog_cache import invalidate_catalog
+        from mall.thumbnails import generate_thumbnails_on_save, remember_photo_name
+
+        post_migrate.connect(ensure_search_index, sender=self)
+
+        for model_name in ["Product", "Category"]:
+            model = self.get_model(model_name)
+            post_save.connect(invalidate_catalog, sender=model)
+            post_delete.connect(invalidate_catalog, sender=model)
+
+        product_model = self.get_model("Product")
+        post_init.connect(remember_photo_name, sender=product_model)
+        post_save.connect(generate_thumbnails_on_save, sender=product_model)
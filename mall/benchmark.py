@@ -0,0 +1,271 @@
+import json
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+from urllib.parse import urljoin
+
+import requests
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Sum
+from django.urls import reverse
+
+from mall.models import (
+    CartProduct,
+    Order,
+    OutOfStockError,
+    ProductStock,
+    StockReservation,
+)
+
+PAYMENT_PROPS_PATTERN = re.compile(
+    r'<script id="payment-props" type="application/json">(.*?)</script>', re.S
+)
+NEXT_URL_PATTERN = re.compile(r'const next_url = "(.*?)";')
+
+
+@dataclass
+class ViewStats:
+    name: str
+    latency_list: List[float] = field(default_factory=list)
+    error_count: int = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.latency_list)
+
+    def percentile(self, p: int) -> float:
+        """p 백분위 응답 시간(초)"""
+        if not self.latency_list:
+            return 0.0
+        if len(self.latency_list) == 1:
+            return self.latency_list[0]
+        return statistics.quantiles(self.latency_list, n=100, method="inclusive")[
+            p - 1
+        ]
+
+
+@dataclass
+class BenchmarkResult:
+    elapsed: float
+    stats_dict: Dict[str, ViewStats]
+
+    def rps(self, view_stats: ViewStats) -> float:
+        return view_stats.count / self.elapsed if self.elapsed else 0.0
+
+    def format(self) -> str:
+        line_list = [
+            f"{'view':<14}{'count':>7}{'errors':>8}{'p50(ms)':>10}"
+            f"{'p95(ms)':>10}{'p99(ms)':>10}{'req/s':>9}"
+        ]
+        for view_stats in self.stats_dict.values():
+            line_list.append(
+                f"{view_stats.name:<14}{view_stats.count:>7}{view_stats.error_count:>8}"
+                f"{view_stats.percentile(50) * 1000:>10.1f}"
+                f"{view_stats.percentile(95) * 1000:>10.1f}"
+                f"{view_stats.percentile(99) * 1000:>10.1f}"
+                f"{self.rps(view_stats):>9.1f}"
+            )
+        line_list.append(f"elapsed: {self.elapsed:.2f}s")
+        return "\n".join(line_list)
+
+
+class Shopper:
+    """로그인 → 장바구니 담기 → 주문 → 결제 → 결제 검증 → 주문 상세까지 진행하는 가상 구매자"""
+
+    def __init__(self, benchmark: "CheckoutBenchmark", username: str):
+        self.benchmark = benchmark
+        self.username = username
+        self.session = requests.Session()
+
+    def url(self, path: str) -> str:
+        return urljoin(self.benchmark.base_url, path)
+
+    def request(self, view_name, method, path, **kwargs) -> requests.Response:
+        started = time.perf_counter()
+        response = self.session.request(
+            method, self.url(path), allow_redirects=False, **kwargs
+        )
+        self.benchmark.record(
+            view_name, time.perf_counter() - started, response.status_code < 400
+        )
+        return response
+
+    @property
+    def csrf_headers(self):
+        return {"X-CSRFToken": self.session.cookies.get("csrftoken", "")}
+
+    def login(self):
+        login_url = self.url(reverse("login"))
+        self.session.get(login_url)
+        self.session.post(
+            login_url,
+            data={
+                "username": self.username,
+                "password": self.benchmark.password,
+                "csrfmiddlewaretoken": self.session.cookies.get("csrftoken", ""),
+            },
+            allow_redirects=False,
+        )
+
+    def checkout(self):
+        benchmark = self.benchmark
+        self.request("product_list", "GET", reverse("product_list"))
+        self.request(
+            "add_to_cart",
+            "POST",
+            reverse("add_to_cart", args=[benchmark.product_pk]),
+            headers=self.csrf_headers,
+        )
+
+        response = self.request("order_new", "GET", reverse("order_new"))
+        if response.status_code != 302:
+            return
+        response = self.request("order_pay", "GET", response.headers["Location"])
+        props_match = PAYMENT_PROPS_PATTERN.search(response.text)
+        next_url_match = NEXT_URL_PATTERN.search(response.text)
+        if props_match is None or next_url_match is None:
+            return
+
+        # 브라우저 결제창에서 결제가 완료된 상황을 FakePortone에 등록
+        payment_props = json.loads(props_match.group(1))
+        self.session.post(
+            urljoin(benchmark.portone_url, "_fake/payments"),
+            json={
+                "merchant_uid": payment_props["merchant_uid"],
+                "amount": payment_props["amount"],
+            },
+        )
+
+        response = self.request("order_check", "GET", next_url_match.group(1))
+        if response.status_code == 302:
+            self.request("order_detail", "GET", response.headers["Location"])
+
+    def run(self, iterations: int):
+        self.login()
+        for _ in range(iterations):
+            self.checkout()
+
+
+class CheckoutBenchmark:
+    def __init__(self, base_url, portone_url, product_pk, password):
+        self.base_url = base_url
+        self.portone_url = portone_url
+        self.product_pk = product_pk
+        self.password = password
+        self.stats_dict: Dict[str, ViewStats] = {}
+        self.lock = threading.Lock()
+
+    def record(self, view_name: str, elapsed: float, ok: bool):
+        with self.lock:
+            view_stats = self.stats_dict.get(view_name)
+            if view_stats is None:
+                view_stats = self.stats_dict[view_name] = ViewStats(view_name)
+            view_stats.latency_list.append(elapsed)
+            if not ok:
+                view_stats.error_count += 1
+
+    def run(self, username_list: List[str], iterations: int) -> BenchmarkResult:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(username_list)) as executor:
+            future_list = [
+                executor.submit(Shopper(self, username).run, iterations)
+                for username in username_list
+            ]
+            for future in future_list:
+                future.result()
+        return BenchmarkResult(
+            elapsed=time.perf_counter() - started, stats_dict=dict(self.stats_dict)
+        )
+
+
+@dataclass
+class StockBenchmarkResult:
+    shard_count: int
+    stock: int
+    ordered: int = 0
+    out_of_stock: int = 0
+    error_count: int = 0
+    remaining: int = 0
+    reserved: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def is_oversold(self) -> bool:
+        return self.reserved > self.stock or self.reserved + self.remaining != self.stock
+
+    def format(self) -> str:
+        rps = self.ordered / self.elapsed if self.elapsed else 0.0
+        return (
+            f"shards={self.shard_count:<4} ordered={self.ordered:<6} "
+            f"out_of_stock={self.out_of_stock:<6} errors={self.error_count:<4} "
+            f"reserved={self.reserved}/{self.stock} remaining={self.remaining} "
+            f"({self.elapsed:.2f}s, {rps:.1f}주문/s)"
+            + (" 초과 판매!" if self.is_oversold else "")
+        )
+
+
+class StockBenchmark:
+    """구매자마다 스레드를 하나씩 실행해 같은 상품을 동시에 주문하면서 재고 예약 처리량을 측정"""
+
+    def __init__(self, product, user_list, orders_per_user):
+        self.product = product
+        self.user_list = user_list
+        self.orders_per_user = orders_per_user
+        self.lock = threading.Lock()
+
+    def order(self, user, result: StockBenchmarkResult):
+        close_old_connections()
+        try:
+            for _ in range(self.orders_per_user):
+                try:
+                    # add_products는 판매중인 상품만 담으므로 비활성화된 벤치마크 상품을 직접 담음
+                    CartProduct.objects.create(user=user, product=self.product)
+                    Order.create_from_cart(
+                        user=user,
+                        cart_product_ps=CartProduct.objects.filter(user=user),
+                    )
+                    counter = "ordered"
+                except OutOfStockError:
+                    counter = "out_of_stock"
+                except DatabaseError:
+                    counter = "error_count"
+                if counter != "ordered":
+                    # 다음 주문도 1개만 주문하도록 주문되지 않은 장바구니를 비움
+                    CartProduct.objects.filter(user=user).delete()
+                with self.lock:
+                    setattr(result, counter, getattr(result, counter) + 1)
+        finally:
+            connection.close()
+
+    def run(self, stock: int, shard_count: int) -> StockBenchmarkResult:
+        Order.objects.filter(user__in=self.user_list).delete()
+        CartProduct.objects.filter(user__in=self.user_list).delete()
+        ProductStock.set_stock(self.product, stock, shard_count=shard_count)
+
+        result = StockBenchmarkResult(shard_count=shard_count, stock=stock)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.user_list)) as executor:
+            future_list = [
+                executor.submit(self.order, user, result) for user in self.user_list
+            ]
+            for future in future_list:
+                future.result()
+        result.elapsed = time.perf_counter() - started
+
+        result.remaining = (
+            ProductStock.objects.filter(product=self.product).aggregate(
+                total=Sum("quantity")
+            )["total"]
+            or 0
+        )
+        result.reserved = (
+            StockReservation.objects.filter(order__user__in=self.user_list).aggregate(
+                total=Sum("quantity")
+            )["total"]
+            or 0
+        )
+        return result
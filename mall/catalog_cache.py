@@ -0,0 +1,57 @@
+"""
+상품 목록 페이지 캐시.
+
+상품 목록 조각(상품 카드 + 페이지네이션)을 (카탈로그 버전, 페이지, 검색어)를 키로 캐시합니다.
+Product/Category가 저장/삭제되거나 QuerySet.update로 일괄 수정되면 카탈로그 버전을 올려
+이전 버전의 캐시가 더 이상 조회되지 않도록 합니다. 여러 프로세스로 서비스할 때는
+버전이 공유되도록 CACHE_URL로 redis/memcached 같은 공유 캐시를 지정해야 합니다.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = "mall:catalog:version"
+
+
+def get_catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # 버전 키가 캐시에서 밀려나도 예전 버전 번호와 겹치지 않도록 현재 시각으로 초기화
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_product_list_cache_key(page, query) -> str:
+    query_hash = hashlib.md5(query.encode()).hexdigest()
+    return f"mall:product_list:{get_catalog_version()}:{page}:{query_hash}"
+
+
+def get_product_count_cache_key() -> str:
+    return f"mall:product_count:{get_catalog_version()}"
+
+
+def get_cached_product_list(page, query):
+    return cache.get(get_product_list_cache_key(page, query))
+
+
+def set_cached_product_list(page, query, html):
+    cache.set(
+        get_product_list_cache_key(page, query),
+        html,
+        timeout=settings.CATALOG_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
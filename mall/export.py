@@ -0,0 +1,148 @@
+"""
+주문(Order)과 주문 상품(OrderedProduct)을 CSV 또는 JSONL로 내보냅니다.
+
+전체 목록을 메모리에 올리지 않도록 QuerySet.iterator(chunk_size)로 나누어 조회하고
+(PostgreSQL은 서버 측 커서), 행마다 문자열로 변환해 바로 내보내므로 행 수와 관계없이 메모리 사용량이 일정합니다.
+관리자 액션은 StreamingHttpResponse로, export_orders 명령은 파일/표준 출력으로 내보냅니다.
+pgbouncer 트랜잭션 풀링을 사용하면 DATABASES의 DISABLE_SERVER_SIDE_CURSORS를 지정해야 합니다.
+"""
+
+import csv
+import datetime
+import itertools
+import json
+from typing import Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from mall.models import Order, OrderedProduct
+from mall.sales import local_datetime
+
+EXPORT_CHUNK_SIZE = 2000
+
+# 내보내기 종류: 열 목록 (values_list 필드명이 그대로 CSV 헤더/JSON 키)
+EXPORT_FIELD_DICT = {
+    "orders": [
+        "id",
+        "uid",
+        "user_id",
+        "name",
+        "product_count",
+        "total_amount",
+        "status",
+        "created_at",
+        "updated_at",
+    ],
+    "ordered_products": [
+        "id",
+        "order_id",
+        "order__uid",
+        "order__status",
+        "product_id",
+        "name",
+        "price",
+        "quantity",
+        "created_at",
+    ],
+}
+
+CONTENT_TYPE_DICT = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def filter_orders(
+    order_qs: QuerySet[Order] = None,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    status_list: Optional[List[str]] = None,
+) -> QuerySet[Order]:
+    """주문일(start_date ~ end_date, 포함)과 주문 상태로 주문을 거릅니다."""
+    if order_qs is None:
+        order_qs = Order.objects.all()
+    if start_date:
+        order_qs = order_qs.filter(created_at__gte=local_datetime(start_date))
+    if end_date:
+        order_qs = order_qs.filter(
+            created_at__lt=local_datetime(end_date + datetime.timedelta(days=1))
+        )
+    if status_list:
+        order_qs = order_qs.filter(status__in=status_list)
+    return order_qs
+
+
+def get_export_qs(kind: str, order_qs: QuerySet[Order]) -> QuerySet:
+    if kind == "orders":
+        qs = order_qs
+    else:
+        qs = OrderedProduct.objects.filter(order__in=order_qs.values("pk"))
+    # 모델 인스턴스를 만들지 않도록 values_list로 조회하고, 내보낸 순서가 일정하도록 pk 순서로 정렬
+    return qs.order_by("pk").values_list(*EXPORT_FIELD_DICT[kind])
+
+
+def format_value(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, (datetime.date, UUID)):
+        return str(value)
+    return value
+
+
+# 스프레드시트가 수식으로 해석하는 시작 문자 (CSV 수식 주입 방지)
+CSV_FORMULA_PREFIX_TUPLE = ("=", "+", "-", "@")
+
+
+def escape_csv_value(value):
+    """수식으로 해석되지 않도록 수식 시작 문자로 시작하는 문자열 앞에 '를 붙입니다."""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIX_TUPLE):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """csv.writer가 쓴 한 줄을 그대로 반환하는 파일 대용 객체"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header: List[str], row_iter: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in row_iter:
+        # 상품명 등 사용자가 입력한 값이 엑셀에서 수식으로 실행되지 않도록 CSV에서만 이스케이프
+        yield writer.writerow([escape_csv_value(format_value(value)) for value in row])
+
+
+def iter_jsonl(header: List[str], row_iter: Iterable[tuple]) -> Iterator[str]:
+    for row in row_iter:
+        row_dict = dict(zip(header, (format_value(value) for value in row)))
+        yield json.dumps(row_dict, ensure_ascii=False) + "\n"
+
+
+def iter_export(
+    kind: str, order_qs: QuerySet[Order], fmt="csv", chunk_size=EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """주문 목록(order_qs)의 주문 또는 주문 상품을 한 줄씩 내보냅니다."""
+    header = EXPORT_FIELD_DICT[kind]
+    row_iter = get_export_qs(kind, order_qs).iterator(chunk_size=chunk_size)
+    if fmt == "jsonl":
+        return iter_jsonl(header, row_iter)
+    return iter_csv(header, row_iter)
+
+
+def make_export_response(kind: str, order_qs: QuerySet[Order], fmt="csv"):
+    filename = f"{kind}-{timezone.localtime():%Y%m%d%H%M%S}.{fmt}"
+    line_iter = iter_export(kind, order_qs, fmt)
+    if fmt == "csv":
+        # 엑셀에서 한글이 깨지지 않도록 BOM 추가
+        line_iter = itertools.chain(["\ufeff"], line_iter)
+    return StreamingHttpResponse(
+        line_iter,
+        content_type=CONTENT_TYPE_DICT[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,224 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+
+class FakePortoneRequestHandler(BaseHTTPRequestHandler):
+    """
+    포트원 REST API 중 토큰 발급, merchant_uid 조회, 결제 취소만 흉내낸다.
+    /_fake/payments 는 브라우저 결제창(IMP.request_pay)에서 결제가 끝난 상황을 재현한다.
+    """
+
+    server: "FakePortoneHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_portone_response(self, response, status=200, code=0, message=None):
+        self.send_json(
+            {"code": code, "message": message, "response": response}, status=status
+        )
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def is_authorized(self):
+        return self.headers.get("Authorization") in self.server.fake.token_set
+
+    def send_fake_failure(self):
+        self.send_portone_response(
+            None, status=500, code=-1, message="FakePortone failure"
+        )
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.log_request(self.command, self.path)
+        payload = self.read_json()
+
+        if self.path.endswith("/_fake/payments"):
+            fake.add_payment(
+                payload["merchant_uid"],
+                amount=payload["amount"],
+                status=payload.get("status", "paid"),
+            )
+            self.send_portone_response(fake.get_payment(payload["merchant_uid"]))
+            return
+
+        fake.wait()
+        if fake.should_fail():
+            self.send_fake_failure()
+        elif self.path.endswith("/users/getToken"):
+            now = int(time.time())
+            access_token = fake.issue_token()
+            self.send_portone_response(
+                {
+                    "access_token": access_token,
+                    "now": now,
+                    "expired_at": now + fake.token_lifetime,
+                }
+            )
+        elif self.path.endswith("/payments/cancel"):
+            if not self.is_authorized():
+                self.send_portone_response(None, status=401, code=-1)
+                return
+            payment = fake.cancel_payment(payload.get("merchant_uid"))
+            if payment is None:
+                self.send_portone_response(
+                    None, code=1, message="취소할 결제건이 존재하지 않습니다."
+                )
+            else:
+                self.send_portone_response(payment)
+        else:
+            self.send_json({"message": "Not Found"}, status=404)
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.log_request(self.command, self.path)
+        fake.wait()
+
+        if fake.should_fail():
+            self.send_fake_failure()
+        elif "/payments/find/" in self.path:
+            if not self.is_authorized():
+                self.send_portone_response(None, status=401, code=-1)
+                return
+            merchant_uid = self.path.rsplit("/", 1)[-1]
+            payment = fake.get_payment(merchant_uid)
+            if payment is None:
+                self.send_portone_response(
+                    None, status=404, code=-1, message="존재하지 않는 결제정보입니다."
+                )
+            else:
+                self.send_portone_response(payment)
+        else:
+            self.send_json({"message": "Not Found"}, status=404)
+
+
+class FakePortoneHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fake: "FakePortone", *args, **kwargs):
+        self.fake = fake
+        super().__init__(*args, **kwargs)
+
+    def handle_error(self, request, client_address):
+        # latency보다 짧은 타임아웃으로 클라이언트가 먼저 연결을 끊은 경우는 무시
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakePortone:
+    """
+    테스트와 벤치마크에서 실제 포트원 대신 사용하는 로컬 HTTP 서버.
+    latency 만큼 응답을 지연시키고 failure_rate 비율만큼 500 응답을 돌려주어
+    느리거나 불안정한 결제대행사 상황을 재현할 수 있다.
+
+        with FakePortone(latency=0.5) as fake:
+            fake.add_payment(merchant_uid, amount=1000)
+            settings.PORTONE_API_URL = fake.url
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        failure_rate=0.0,
+        token_lifetime=1800,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.token_lifetime = token_lifetime
+        self.token_set = set()
+        self.payment_dict = {}
+        self.request_log = []
+        self.fail_count = 0
+        self.lock = threading.Lock()
+        self.httpd = FakePortoneHTTPServer(
+            self, (host, port), FakePortoneRequestHandler
+        )
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def log_request(self, method, path):
+        with self.lock:
+            self.request_log.append((method, path))
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            if self.fail_count > 0:
+                self.fail_count -= 1
+                return True
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+    def fail_next(self, count=1):
+        """다음 count번의 API 요청을 500으로 응답"""
+        with self.lock:
+            self.fail_count = count
+
+    def issue_token(self) -> str:
+        access_token = uuid4().hex
+        with self.lock:
+            self.token_set.add(access_token)
+        return access_token
+
+    def add_payment(self, merchant_uid, amount, status="paid"):
+        with self.lock:
+            self.payment_dict[merchant_uid] = {
+                "imp_uid": f"imp_{uuid4().hex[:12]}",
+                "merchant_uid": merchant_uid,
+                "amount": amount,
+                "status": status,
+            }
+
+    def get_payment(self, merchant_uid):
+        with self.lock:
+            payment = self.payment_dict.get(merchant_uid)
+            return dict(payment) if payment else None
+
+    def cancel_payment(self, merchant_uid):
+        with self.lock:
+            payment = self.payment_dict.get(merchant_uid)
+            if payment is None:
+                return None
+            payment["status"] = "cancelled"
+            return dict(payment)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
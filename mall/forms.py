@@ -6,3 +6,15 @@ class CartProductForm(forms.ModelForm):
     class Meta:
         model = CartProduct
         fields = ["quantity"]
+
+
+class SalesReportForm(forms.Form):
+    start = forms.DateField(label="시작일", widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(label="종료일", widget=forms.DateInput(attrs={"type": "date"}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("시작일이 종료일보다 늦습니다.")
+        return cleaned_data
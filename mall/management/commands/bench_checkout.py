@@ -0,0 +1,66 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+
+from accounts.models import User
+from mall.benchmark import CheckoutBenchmark
+from mall.fake_portone import FakePortone
+from mall.models import Product
+
+PASSWORD = "bench-shopper-password"
+
+
+class Command(BaseCommand):
+    help = "Run concurrent simulated shoppers through the checkout flow of a running server"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/")
+        parser.add_argument(
+            "--portone-url",
+            help="run_fake_portone으로 실행한 FakePortone 주소. "
+            "지정하지 않으면 --portone-port로 FakePortone을 직접 실행합니다.",
+        )
+        parser.add_argument("--portone-port", type=int, default=8001)
+        parser.add_argument("--portone-latency", type=float, default=0.0)
+        parser.add_argument("--portone-failure-rate", type=float, default=0.0)
+        parser.add_argument("--shoppers", type=int, default=10)
+        parser.add_argument("--iterations", type=int, default=5)
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(status=Product.Status.ACTIVE).first()
+        if product is None:
+            raise CommandError("판매중인 상품이 없습니다. load_products를 먼저 실행하세요.")
+
+        username_list = [f"bench-shopper-{i}" for i in range(options["shoppers"])]
+        hashed_password = make_password(PASSWORD)
+        for username in username_list:
+            User.objects.update_or_create(
+                username=username, defaults={"password": hashed_password}
+            )
+
+        fake_portone = None
+        portone_url = options["portone_url"]
+        if portone_url is None:
+            fake_portone = FakePortone(
+                port=options["portone_port"],
+                latency=options["portone_latency"],
+                failure_rate=options["portone_failure_rate"],
+            ).start()
+            portone_url = fake_portone.url
+            self.stdout.write(
+                f"FakePortone 실행: {portone_url} "
+                f"(서버는 PORTONE_API_URL={portone_url} 로 실행되어 있어야 합니다)"
+            )
+
+        try:
+            benchmark = CheckoutBenchmark(
+                base_url=options["base_url"],
+                portone_url=portone_url,
+                product_pk=product.pk,
+                password=PASSWORD,
+            )
+            result = benchmark.run(username_list, iterations=options["iterations"])
+        finally:
+            if fake_portone is not None:
+                fake_portone.stop()
+
+        self.stdout.write(result.format())
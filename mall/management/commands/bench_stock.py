@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.models import User
+from mall.benchmark import StockBenchmark
+from mall.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent checkout throughput of one hot product per stock shard count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards",
+            type=int,
+            nargs="+",
+            default=[1, 4, 16],
+            help="비교할 재고 행(shard) 수 목록",
+        )
+        parser.add_argument("--stock", type=int, default=500)
+        parser.add_argument("--buyers", type=int, default=16)
+        parser.add_argument("--orders", type=int, default=50, help="구매자당 주문 수")
+        parser.add_argument(
+            "--database",
+            help="벤치마크 상품/주문을 만들고 지울 DB 이름 (DATABASES의 NAME). "
+            "DEBUG가 아니면 지정해야 실행합니다.",
+        )
+
+    def handle(self, *args, **options):
+        # 벤치마크 구매자의 주문을 삭제하므로 운영 DB에서 실수로 실행하지 않도록 DB 이름을 확인
+        database_name = str(connection.settings_dict["NAME"])
+        if options["database"] is None and not settings.DEBUG:
+            raise CommandError(
+                f"DEBUG가 아닌 환경에서는 --database={database_name} 로 DB를 지정해야 합니다."
+            )
+        if options["database"] is not None and options["database"] != database_name:
+            raise CommandError(
+                f"--database가 설정된 DB({database_name})와 다릅니다."
+            )
+
+        category, _ = Category.objects.get_or_create(name="벤치마크")
+        # 상품 목록에 노출되지 않도록 비활성화 상태로 생성 (장바구니에는 직접 담음)
+        product, _ = Product.objects.update_or_create(
+            category=category,
+            name="재고 벤치마크 상품",
+            defaults={"price": 1000, "status": Product.Status.INACTIVE},
+        )
+
+        hashed_password = make_password(None)
+        user_list = []
+        for i in range(options["buyers"]):
+            user, _ = User.objects.get_or_create(
+                username=f"bench-stock-buyer-{i}",
+                defaults={"password": hashed_password},
+            )
+            user_list.append(user)
+
+        benchmark = StockBenchmark(product, user_list, options["orders"])
+        for shard_count in options["shards"]:
+            result = benchmark.run(options["stock"], shard_count)
+            style = self.style.ERROR if result.is_oversold else self.style.SUCCESS
+            self.stdout.write(style(result.format()))
@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from mall.models import Order
+
+
+class Command(BaseCommand):
+    help = "Expire abandoned REQUESTED orders and release their stock reservations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60,
+            help="마지막 변경 후 지정한 시간(분)이 지난 주문 요청 건을 결제 실패로 변경합니다. "
+            "결제 준비 건 재사용 시간(PORTONE_PAYMENT_REUSE_TIMEOUT)보다 길게 지정합니다.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="변경하지 않고 대상 건수만 출력합니다.",
+        )
+
+    def handle(self, *args, **options):
+        expired_before = timezone.now() - timedelta(minutes=options["older_than"])
+        order_qs = Order.objects.filter(
+            status=Order.Status.REQUESTED, updated_at__lt=expired_before
+        ).exclude(
+            # 결제창을 열어 둔 주문은 제외
+            orderpayment__created_at__gte=expired_before
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"[dry-run] {order_qs.count()}건 만료 대상")
+            return
+
+        started = time.monotonic()
+        expired_count = 0
+        last_pk = 0
+        while True:
+            pk_list = list(
+                order_qs.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not pk_list:
+                break
+            last_pk = pk_list[-1]
+            now = timezone.now()
+            for pk in pk_list:
+                # 조회한 뒤 결제가 진행된 주문은 조건부 UPDATE에서 제외되고, 변경된 주문만 재고 반환
+                if Order.transition_by_pk(pk, Order.Status.FAILED_PAYMEMT, now=now):
+                    expired_count += 1
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"주문 요청 건 {expired_count}건 만료 ({elapsed:.2f}s)")
+        )
@@ -0,0 +1,68 @@
+import datetime
+
+from django.core.management import BaseCommand
+
+from mall.export import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FIELD_DICT,
+    filter_orders,
+    iter_export,
+)
+from mall.models import Order
+
+
+class Command(BaseCommand):
+    help = "Stream orders or ordered products to CSV/JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kind", choices=list(EXPORT_FIELD_DICT), help="내보낼 대상 (주문/주문 상품)"
+        )
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument(
+            "--start", type=datetime.date.fromisoformat, help="주문일 시작 (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--end",
+            type=datetime.date.fromisoformat,
+            help="주문일 끝 (YYYY-MM-DD, 포함)",
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=Order.Status.values,
+            help="주문 상태 (여러 번 지정 가능)",
+        )
+        parser.add_argument("--output", "-o", help="저장할 파일 경로 (기본: 표준 출력)")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        order_qs = filter_orders(
+            start_date=options["start"],
+            end_date=options["end"],
+            status_list=options["status"],
+        )
+        line_iter = iter_export(
+            options["kind"],
+            order_qs,
+            fmt=options["format"],
+            chunk_size=options["chunk_size"],
+        )
+
+        row_count = 0
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as f:
+                for line in line_iter:
+                    f.write(line)
+                    row_count += 1
+        else:
+            for line in line_iter:
+                self.stdout.write(line, ending="")
+                row_count += 1
+
+        if options["format"] == "csv":
+            row_count -= 1  # 헤더
+        # 표준 출력으로 내보낼 때 데이터와 섞이지 않도록 결과는 표준 에러로 출력
+        self.stderr.write(
+            f"{max(row_count, 0)}행 내보냄", style_func=self.style.SUCCESS
+        )
@@ -1,12 +1,25 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from django.core.management import BaseCommand
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from django.core.management import BaseCommand, call_command
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from mall.catalog_cache import bump_catalog_version
 from mall.models import Category, Product
+from mall.thumbnails import delete_product_photo, generate_product_thumbnails
 
 BASE_URL = "https://raw.githubusercontent.com/pyhub-kr/dump-data/main/django-shopping-with-iamport/"
+JSON_FILENAME = "product-list.json"
 
 
 @dataclass
@@ -18,28 +31,140 @@ class Item:
     desc: str
     photo_path: str
 
+    @property
+    def content_hash(self) -> str:
+        # 분류와 상품명은 상품을 찾는 키이므로 나머지 내용만 비교
+        content = json.dumps([self.desc, self.price, self.priceUnit], ensure_ascii=False)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
+class HttpSource:
+    def __init__(self, base_url, pool_maxsize=10):
+        self.base_url = base_url
+        # 사진을 동시에 내려받을 때 연결을 재사용하도록 풀 크기를 동시 요청 수에 맞춤
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=pool_maxsize))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=pool_maxsize))
+
+    def load_item_dict_list(self):
+        return self.session.get(self.base_url + JSON_FILENAME).json()
+
+    def read_photo(self, photo_path) -> Tuple[bytes, str]:
+        """(사진 내용, 사진 해시)"""
+        response = self.session.get(self.base_url + photo_path)
+        response.raise_for_status()
+        return response.content, self.make_photo_hash(photo_path, response)
+
+    def get_photo_hash(self, photo_path) -> str:
+        # 내려받지 않고 ETag/Last-Modified 헤더로 사진이 바뀌었는지 확인 (헤더가 없으면 내려받아 해시)
+        response = self.session.head(self.base_url + photo_path, allow_redirects=True)
+        response.raise_for_status()
+        photo_hash = self.make_photo_hash(photo_path, response)
+        if photo_hash is None:
+            _, photo_hash = self.read_photo(photo_path)
+        return photo_hash
+
+    @staticmethod
+    def make_photo_hash(photo_path, response) -> Optional[str]:
+        version = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if version is None:
+            if response.request.method == "HEAD":
+                return None
+            return hashlib.sha256(response.content).hexdigest()
+        return hashlib.sha256(f"{photo_path}:{version}".encode()).hexdigest()
+
+
+class LocalSource:
+    """JSON 파일 또는 product-list.json이 있는 디렉터리. 사진 경로는 JSON 파일 위치 기준"""
+
+    def __init__(self, path):
+        path = Path(path)
+        self.json_path = path / JSON_FILENAME if path.is_dir() else path
+        self.root_dir = self.json_path.parent
+
+    def load_item_dict_list(self):
+        return json.loads(self.json_path.read_text(encoding="utf-8"))
+
+    def read_photo(self, photo_path) -> Tuple[bytes, str]:
+        """(사진 내용, 사진 해시)"""
+        photo_data = (self.root_dir / photo_path).read_bytes()
+        return photo_data, hashlib.sha256(photo_data).hexdigest()
+
+    def get_photo_hash(self, photo_path) -> str:
+        return hashlib.sha256((self.root_dir / photo_path).read_bytes()).hexdigest()
+
 
 class Command(BaseCommand):
     help = "Load products from JSON file"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=BASE_URL,
+            help="상품 목록 URL(디렉터리) 또는 로컬 JSON 파일/디렉터리 경로",
+        )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="사진을 동시에 내려받고 bulk_create로 일괄 저장합니다.",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="새 상품은 등록하고, 내용/사진 해시가 바뀐 기존 상품만 갱신합니다.",
+        )
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--skip-thumbnails",
+            action="store_true",
+            help="bulk 모드에서 새 상품의 썸네일을 미리 생성하지 않습니다.",
+        )
+
     def handle(self, *args, **options):
-        json_url = BASE_URL + "product-list.json"
-        response = requests.get(json_url).json()
+        source_path = options["source"]
+        if source_path.startswith(("http://", "https://")):
+            source = HttpSource(source_path, pool_maxsize=options["workers"])
+        else:
+            source = LocalSource(source_path)
 
         item_list = []
-        for item_dict in response:
+        for item_dict in source.load_item_dict_list():
             # 같은 이름으로 모든 키워드 인자가 들어가 있어 unpack 문법 이용
             item = Item(**item_dict)
             item_list.append(item)
 
-        category_name_set = {item.category_name for item in item_list}
+        started = time.monotonic()
+        updated_count = 0
+        if options["sync"]:
+            created_count, updated_count = self.sync(source, item_list, options)
+        elif options["bulk"]:
+            created_count = self.bulk_load(source, item_list, options)
+        else:
+            created_count = self.load(source, item_list, options)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(item_list)}개 상품 중 {created_count}개 등록, {updated_count}개 갱신 "
+                f"({elapsed:.2f}s, {len(item_list) / elapsed if elapsed else 0:.1f}개/s)"
+            )
+        )
+
+    def get_category_dict(self, item_list: List[Item]):
+        category_name_set = {item.category_name or "미분류" for item in item_list}
 
         category_dict = {}
         for category_name in category_name_set:
-            category, _ = Category.objects.get_or_create(name=category_name or "미분류")
+            category, _ = Category.objects.get_or_create(name=category_name)
             category_dict[category.name] = category
+        return category_dict
 
-        for item in tqdm(item_list):
+    def load(self, source, item_list: List[Item], options) -> int:
+        category_dict = self.get_category_dict(item_list)
+
+        created_count = 0
+        for item in tqdm(item_list, disable=options["verbosity"] == 0):
             category: Category = category_dict[item.category_name or "미분류"]
             product, is_created = Product.objects.get_or_create(
                 category=category,
@@ -47,13 +172,187 @@ class Command(BaseCommand):
                 defaults={
                     "description": item.desc,
                     "price": item.price,
+                    "content_hash": item.content_hash,
                 },
             )
 
             if is_created:
-                photo_url = BASE_URL + item.photo_path
-                filename = photo_url.rsplit("/", 1)[-1]
-                photo_data = requests.get(photo_url).content  # raw data
-                product.photo.save(
-                    name=filename, content=ContentFile(photo_data), save=True
+                self.save_photo(source, product, item)
+                product.save(update_fields=["photo", "photo_hash"])
+                created_count += 1
+        return created_count
+
+    def get_product_dict(self, category_dict):
+        # 기존 상품을 한 번의 쿼리로 조회해 (분류, 상품명)으로 중복 여부 확인
+        product_qs = Product.objects.filter(category__in=category_dict.values()).only(
+            "pk", "category_id", "name", "photo", "content_hash", "photo_hash"
+        )
+        return {(product.category_id, product.name): product for product in product_qs}
+
+    def bulk_load(self, source, item_list: List[Item], options) -> int:
+        category_dict = self.get_category_dict(item_list)
+        product_dict = self.get_product_dict(category_dict)
+
+        new_item_list = []
+        for item in item_list:
+            category = category_dict[item.category_name or "미분류"]
+            key = (category.pk, item.name)
+            if key not in product_dict:
+                product_dict[key] = None
+                new_item_list.append(item)
+
+        return self.bulk_create_items(source, new_item_list, category_dict, options)
+
+    def save_photo(self, source, product: Product, item: Item) -> Product:
+        filename = item.photo_path.rsplit("/", 1)[-1]
+        photo_data, photo_hash = source.read_photo(item.photo_path)
+        # DB 저장 없이 스토리지에만 저장하고, DB에는 bulk_create/bulk_update로 일괄 저장
+        product.photo.save(name=filename, content=ContentFile(photo_data), save=False)
+        product.photo_hash = photo_hash
+        return product
+
+    def bulk_create_items(
+        self, source, new_item_list: List[Item], category_dict, options
+    ) -> int:
+        def make_product(item: Item) -> Product:
+            product = Product(
+                category=category_dict[item.category_name or "미분류"],
+                name=item.name,
+                description=item.desc,
+                price=item.price,
+                content_hash=item.content_hash,
+            )
+            return self.save_photo(source, product, item)
+
+        created_pk_list = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            product_iter = executor.map(make_product, new_item_list)
+            batch = []
+            for product in tqdm(
+                product_iter,
+                total=len(new_item_list),
+                disable=options["verbosity"] == 0,
+            ):
+                batch.append(product)
+                if len(batch) >= options["batch_size"]:
+                    created_pk_list += self.bulk_create(batch)
+                    batch = []
+            if batch:
+                created_pk_list += self.bulk_create(batch)
+
+        if created_pk_list:
+            # bulk_create는 post_save 시그널이 발생하지 않으므로 캐시 무효화와 썸네일 생성을 직접 실행
+            bump_catalog_version()
+            if not options["skip_thumbnails"]:
+                call_command(
+                    "warm_thumbnails",
+                    start_pk=min(created_pk_list),
+                    verbosity=options["verbosity"],
+                    stdout=self.stdout,
+                    stderr=self.stderr,
+                )
+        return len(created_pk_list)
+
+    def bulk_create(self, product_list: List[Product]) -> List[int]:
+        return [product.pk for product in Product.objects.bulk_create(product_list)]
+
+    def sync(self, source, item_list: List[Item], options):
+        category_dict = self.get_category_dict(item_list)
+        product_dict = self.get_product_dict(category_dict)
+
+        new_item_list = []
+        existing_list = []
+        for item in item_list:
+            category = category_dict[item.category_name or "미분류"]
+            key = (category.pk, item.name)
+            if key not in product_dict:
+                product_dict[key] = None
+                new_item_list.append(item)
+            elif product_dict[key] is not None:  # 목록에 같은 상품이 중복된 경우 제외
+                existing_list.append((product_dict[key], item))
+                product_dict[key] = None
+
+        # 기존 상품의 사진 해시를 동시에 확인 (HTTP는 ETag/Last-Modified로 확인해 내려받지 않음)
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            photo_hash_list = list(
+                executor.map(
+                    lambda args: source.get_photo_hash(args[1].photo_path),
+                    existing_list,
                 )
+            )
+
+        content_changed_list = []
+        photo_changed_list = []
+        now = timezone.now()
+        for (product, item), photo_hash in zip(existing_list, photo_hash_list):
+            is_changed = False
+            if product.content_hash != item.content_hash:
+                product.description = item.desc
+                product.price = item.price
+                product.content_hash = item.content_hash
+                is_changed = True
+
+            if product.photo_hash != photo_hash:
+                if not product.photo_hash and product.photo:
+                    # 해시 도입 전에 등록된 사진은 그대로 두고 해시만 기록
+                    product.photo_hash = photo_hash
+                    is_changed = True
+                else:
+                    photo_changed_list.append((product, item))
+
+            if is_changed:
+                product.updated_at = now  # bulk_update는 auto_now 필드를 갱신하지 않음
+                content_changed_list.append(product)
+
+        # 해시가 바뀐 사진만 DB를 변경하기 전에 모두 내려받음
+        # (중간에 실패하면 이미 저장한 새 사진만 지우고 DB와 기존 사진은 그대로 둠)
+        old_photo_list = [product.photo.name for product, _ in photo_changed_list]
+        saved_product_list = []
+
+        def save_photo(args):
+            product = self.save_photo(source, *args)
+            saved_product_list.append(product)
+            return product
+
+        try:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                photo_product_list = list(executor.map(save_photo, photo_changed_list))
+        except Exception:
+            for product in saved_product_list:
+                product.photo.storage.delete(product.photo.name)
+            raise
+
+        for product in photo_product_list:
+            product.updated_at = now
+        batch_size = options["batch_size"]
+        with transaction.atomic():
+            Product.objects.bulk_update(
+                content_changed_list,
+                ["description", "price", "content_hash", "photo_hash", "updated_at"],
+                batch_size=batch_size,
+            )
+            Product.objects.bulk_update(
+                photo_product_list,
+                ["photo", "photo_hash", "updated_at"],
+                batch_size=batch_size,
+            )
+            # 이전 사진과 썸네일은 새 사진이 DB에 반영된 뒤에 삭제
+            for old_photo in old_photo_list:
+                if old_photo:
+                    transaction.on_commit(
+                        lambda old_photo=old_photo: delete_product_photo(old_photo)
+                    )
+
+        if not options["skip_thumbnails"]:
+            for product in photo_product_list:
+                generate_product_thumbnails(product.photo)
+
+        updated_pk_set = {product.pk for product in content_changed_list}
+        updated_pk_set |= {product.pk for product in photo_product_list}
+        if updated_pk_set:
+            bump_catalog_version()
+
+        created_count = self.bulk_create_items(
+            source, new_item_list, category_dict, options
+        )
+        return created_count, len(updated_pk_set)
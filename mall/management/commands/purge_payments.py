@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from mall.models import OrderPayment
+from mall.reconcile import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned READY payment attempts in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60 * 24,
+            help="생성 후 지정한 시간(분)이 지난 결제 준비(READY) 건만 삭제합니다. "
+            "reconcile_payments로 상태를 확인할 시간이 지나도록 충분히 길게 지정합니다.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="포트원 결제내역을 동시에 조회할 스레드 수",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="배치 사이에 대기할 시간(초). 다른 요청이 쓰기 잠금을 얻을 수 있도록 합니다.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="포트원 조회 결과를 반영하거나 삭제하지 않고 삭제 대상 건수만 출력합니다.",
+        )
+
+    def handle(self, *args, **options):
+        created_before = timezone.now() - timedelta(minutes=options["older_than"])
+        payment_qs = OrderPayment.objects.filter(
+            pay_status=OrderPayment.PayStatus.READY,
+            created_at__lt=created_before,
+        )
+
+        started = time.monotonic()
+        deleted_count = 0
+        kept_count = 0
+        last_pk = 0
+        while True:
+            # 한 번에 모두 삭제하면 삭제하는 동안 테이블 잠금이 길어지므로
+            # pk 순서로 batch_size개씩 나누어 배치마다 짧게 삭제
+            # (삭제하지 않은 건을 다시 조회하지 않도록 마지막 pk 이후부터 조회)
+            pk_list = list(
+                payment_qs.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not pk_list:
+                break
+            last_pk = pk_list[-1]
+
+            # 사용자가 결제했지만 웹훅이 누락된 건을 삭제하지 않도록 포트원에 먼저 확인하고,
+            # 포트원에서도 결제 준비 상태이거나 결제내역이 없는 건만 삭제
+            result = reconcile_payments(
+                payment_qs.filter(pk__in=pk_list),
+                max_workers=options["workers"],
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+            kept_count += len(pk_list) - len(result.unpaid_pk_list)
+            # 조회한 뒤 결제가 진행된 건은 삭제하지 않도록 상태 조건을 다시 지정
+            unpaid_qs = payment_qs.filter(pk__in=result.unpaid_pk_list)
+            if options["dry_run"]:
+                deleted_count += unpaid_qs.count()
+            else:
+                deleted, _ = unpaid_qs.delete()
+                deleted_count += deleted
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{deleted_count}건 삭제")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        if options["dry_run"]:
+            self.stdout.write(
+                f"[dry-run] {deleted_count}건 삭제 대상 (포트원 확인 후 유지 {kept_count}건)"
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"결제 준비 건 {deleted_count}건 삭제, 포트원 확인 후 유지 {kept_count}건 ({elapsed:.2f}s)"
+            )
+        )
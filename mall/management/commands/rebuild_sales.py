@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management import BaseCommand
+
+from mall.sales import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily sales rollups from ordered products"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", type=datetime.date.fromisoformat, help="주문일 시작 (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--end",
+            type=datetime.date.fromisoformat,
+            help="주문일 끝 (YYYY-MM-DD, 포함)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="한 번에 집계할 주문 pk 범위",
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_sales(
+            start_date=options["start"],
+            end_date=options["end"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"주문 {result.order_count}건 (주문 상품 {result.line_count}건)으로 "
+                f"매출 집계 {result.row_count}행 생성 ({result.elapsed:.2f}s)"
+            )
+        )
@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+
+from mall.search import install_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Create the product search index if missing and rebuild it from mall_product"
+
+    def handle(self, *args, **options):
+        install_search_index()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("상품 검색 색인을 다시 만들었습니다."))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from mall.models import OrderPayment
+from mall.reconcile import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = "Reconcile stale READY/FAILED payments with PortOne"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=10,
+            help="마지막 갱신 후 지정한 시간(분)이 지난 결제만 대상으로 합니다.",
+        )
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="포트원 조회만 하고 DB에 저장하지 않습니다.",
+        )
+
+    def handle(self, *args, **options):
+        updated_before = timezone.now() - timedelta(minutes=options["older_than"])
+        payment_qs = OrderPayment.objects.filter(
+            pay_status__in=[OrderPayment.PayStatus.READY, OrderPayment.PayStatus.FAILED],
+            updated_at__lt=updated_before,
+        )
+
+        result = reconcile_payments(
+            payment_qs,
+            max_workers=options["workers"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{result.total}건 조회, {result.changed}건 변경, "
+                f"{result.failed}건 실패 ({result.elapsed:.2f}s, {result.throughput:.1f}건/s)"
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand
+
+from mall.fake_portone import FakePortone
+
+
+class Command(BaseCommand):
+    help = "Run a local PortOne stand-in server for benchmarks and manual testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="응답 지연 시간(초)"
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="500 오류로 응답할 비율 (0.0 ~ 1.0)",
+        )
+
+    def handle(self, *args, **options):
+        fake = FakePortone(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            failure_rate=options["failure_rate"],
+        )
+        self.stdout.write(
+            f"FakePortone 실행 중: {fake.url} "
+            f"(PORTONE_API_URL={fake.url} 로 서버를 실행하세요. 종료: Ctrl+C)"
+        )
+        try:
+            fake.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.httpd.server_close()
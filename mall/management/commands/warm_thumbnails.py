@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connections
+from tqdm import tqdm
+
+from mall.models import Product
+from mall.thumbnails import generate_product_thumbnails
+
+
+def warm_photo(product):
+    pk, photo_name = product
+    generate_product_thumbnails(photo_name)
+    return pk
+
+
+class Command(BaseCommand):
+    help = "Pre-generate product thumbnails for every configured size using all CPU cores"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="썸네일을 생성할 프로세스 수 (1이면 현재 프로세스에서 생성)",
+        )
+        parser.add_argument(
+            "--start-pk",
+            type=int,
+            default=0,
+            help="중단된 작업을 이어서 실행할 때, 지정한 pk 이상의 상품부터 처리합니다.",
+        )
+
+    def handle(self, *args, **options):
+        product_list = list(
+            Product.objects.filter(pk__gte=options["start_pk"])
+            .exclude(photo="")
+            .order_by("pk")
+            .values_list("pk", "photo")
+        )
+
+        disable_progress = options["verbosity"] == 0
+
+        # 이미 생성된 썸네일은 sorl-thumbnail이 원본을 읽지 않고 건너뛰므로 다시 실행해도 안전
+        last_pk = None
+        try:
+            if options["workers"] <= 1:
+                for product in tqdm(product_list, disable=disable_progress):
+                    last_pk = warm_photo(product)
+            else:
+                # fork된 자식 프로세스가 부모의 DB 연결을 물려받지 않도록 먼저 닫음
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+                    # map은 입력 순서대로 결과를 반환하므로 last_pk 이하는 모두 처리된 상품
+                    result_iter = executor.map(warm_photo, product_list, chunksize=16)
+                    for pk in tqdm(
+                        result_iter, total=len(product_list), disable=disable_progress
+                    ):
+                        last_pk = pk
+        except (Exception, KeyboardInterrupt):
+            # 중단된 위치부터 --start-pk로 이어서 실행할 수 있도록 마지막으로 처리한 pk를 출력
+            if last_pk is None:
+                self.stderr.write("처리한 상품이 없습니다.")
+            else:
+                self.stderr.write(
+                    f"마지막으로 처리한 상품 pk: {last_pk} "
+                    f"(이어서 실행하려면 --start-pk={last_pk + 1})"
+                )
+            raise
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(product_list)}개 상품의 썸네일을 준비했습니다.")
+        )
@@ -0,0 +1,104 @@
+"""
+Prometheus 지표.
+
+- portone_request_duration_seconds: 포트원 API 호출 시간 (operation: get_token, find, cancel)
+- portone_request_errors_total: 포트원 API 호출 실패 수 (operation, error: 예외 클래스명)
+- mall_view_duration_seconds: URL 이름별 요청 처리 시간
+- mall_orders_created_total, mall_order_transitions_total: 주문 생성/상태 변경 수 (결제 퍼널)
+
+gunicorn처럼 여러 프로세스로 서비스할 때는 PROMETHEUS_MULTIPROC_DIR 환경변수를 지정하면
+모든 프로세스의 지표를 합쳐서 노출합니다.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+PORTONE_REQUEST_DURATION = Histogram(
+    "portone_request_duration_seconds",
+    "PortOne API call latency",
+    ["operation"],
+)
+PORTONE_REQUEST_ERRORS = Counter(
+    "portone_request_errors_total",
+    "PortOne API call errors",
+    ["operation", "error"],
+)
+VIEW_DURATION = Histogram(
+    "mall_view_duration_seconds",
+    "Request latency by URL name",
+    ["view", "method"],
+)
+ORDERS_CREATED = Counter("mall_orders_created_total", "Orders created from carts")
+ORDER_TRANSITIONS = Counter(
+    "mall_order_transitions_total",
+    "Order status transitions (result: changed, rejected)",
+    ["status", "result"],
+)
+
+
+@contextmanager
+def observe_portone(operation):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        PORTONE_REQUEST_ERRORS.labels(operation, type(e).__name__).inc()
+        raise
+    finally:
+        PORTONE_REQUEST_DURATION.labels(operation).observe(
+            time.perf_counter() - started
+        )
+
+
+def generate_metrics() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # 비동기 뷰가 스레드로 감싸지지 않도록 비동기 체인에서는 코루틴으로 동작
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, started)
+        return response
+
+    def observe(self, request, started):
+        resolver_match = getattr(request, "resolver_match", None)
+        # 404 등 URL이 매칭되지 않은 요청은 경로별로 지표가 늘어나지 않도록 하나로 집계
+        view = (resolver_match.url_name if resolver_match else None) or "unmatched"
+        VIEW_DURATION.labels(view, request.method).observe(
+            time.perf_counter() - started
+        )
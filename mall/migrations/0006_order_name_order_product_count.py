@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0005_orderpayment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='주문명'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='주문 상품 수'),
+        ),
+    ]
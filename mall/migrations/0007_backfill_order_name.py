@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_order_name(apps, schema_editor):
+    Order = apps.get_model("mall", "Order")
+    OrderedProduct = apps.get_model("mall", "OrderedProduct")
+
+    first_name_qs = (
+        OrderedProduct.objects.filter(order=OuterRef("pk"))
+        .order_by("pk")
+        .values("name")[:1]
+    )
+    order_qs = Order.objects.annotate(
+        first_name=Subquery(first_name_qs),
+        size=Count("orderedproduct"),
+    ).only("pk")
+
+    batch = []
+    for order in order_qs.iterator(chunk_size=1000):
+        # 마이그레이션에서는 모델 메서드를 사용할 수 없어 Order.make_name 로직을 그대로 옮김
+        if order.first_name is None:
+            order.name = "등록된 상품이 없습니다."
+        elif order.size < 2:
+            order.name = order.first_name
+        else:
+            order.name = f"{order.first_name} 외 {order.size - 1}건"
+        order.product_count = order.size
+        batch.append(order)
+
+        if len(batch) >= 1000:
+            Order.objects.bulk_update(batch, ["name", "product_count"])
+            batch = []
+
+    if batch:
+        Order.objects.bulk_update(batch, ["name", "product_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mall", "0006_order_name_order_product_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:29
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0008_orderpayment_created_at_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderpayment',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='쇼핑몰 결제식별자'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+def copy_meta_to_portone_response(apps, schema_editor):
+    OrderPayment = apps.get_model("mall", "OrderPayment")
+    PortoneResponse = apps.get_model("mall", "PortoneResponse")
+
+    batch = []
+    payment_qs = OrderPayment.objects.exclude(meta={}).only("uid", "meta")
+    for payment in payment_qs.iterator(chunk_size=1000):
+        batch.append(
+            PortoneResponse(
+                merchant_uid=payment.uid,
+                status=payment.meta.get("status", ""),
+                response=payment.meta,
+            )
+        )
+        if len(batch) >= 1000:
+            PortoneResponse.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        PortoneResponse.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0012_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortoneResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant_uid', models.UUIDField(db_index=True)),
+                ('status', models.CharField(blank=True, max_length=20, verbose_name='결제 상태')),
+                ('response', models.JSONField(default=dict, verbose_name='포트원 결제내역')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': '포트원 응답',
+                'verbose_name_plural': '포트원 응답',
+            },
+        ),
+        migrations.RunPython(
+            copy_meta_to_portone_response, migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name='orderpayment',
+            name='meta',
+        ),
+    ]
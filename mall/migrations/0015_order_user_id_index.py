@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0014_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-id'], name='mall_order_user_id_desc'),
+        ),
+    ]
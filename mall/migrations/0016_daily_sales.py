@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0015_order_user_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='주문일')),
+                ('order_count', models.IntegerField(default=0, verbose_name='주문 수')),
+                ('quantity', models.IntegerField(default=0, verbose_name='판매 수량')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='매출')),
+            ],
+            options={
+                'verbose_name': '분류별 일 매출',
+                'verbose_name_plural': '분류별 일 매출',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='주문일')),
+                ('order_count', models.IntegerField(default=0, verbose_name='주문 수')),
+                ('quantity', models.IntegerField(default=0, verbose_name='판매 수량')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='매출')),
+            ],
+            options={
+                'verbose_name': '상품별 일 매출',
+                'verbose_name_plural': '상품별 일 매출',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='주문일')),
+                ('order_count', models.IntegerField(default=0, verbose_name='주문 수')),
+                ('quantity', models.IntegerField(default=0, verbose_name='판매 수량')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='매출')),
+            ],
+            options={
+                'verbose_name': '일별 매출',
+                'verbose_name_plural': '일별 매출',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('date',), name='unique_daily_sales'),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='mall.product'),
+        ),
+        migrations.AddField(
+            model_name='dailycategorysales',
+            name='category',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='mall.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_product_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorysales',
+            constraint=models.UniqueConstraint(fields=('date', 'category'), name='unique_daily_category_sales'),
+        ),
+    ]
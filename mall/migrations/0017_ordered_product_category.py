@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_product_category(apps, schema_editor):
+    # 기존 주문 상품은 현재 상품 분류를 주문 시점의 분류로 기록
+    OrderedProduct = apps.get_model("mall", "OrderedProduct")
+    Product = apps.get_model("mall", "Product")
+    OrderedProduct.objects.filter(category__isnull=True).update(
+        category_id=models.Subquery(
+            Product.objects.filter(pk=models.OuterRef("product_id")).values(
+                "category_id"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0016_daily_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderedproduct',
+            name='category',
+            field=models.ForeignKey(db_constraint=False, help_text='주문 시점의 분류를 저장합니다.', null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='mall.category', verbose_name='분류'),
+        ),
+        migrations.AlterField(
+            model_name='orderedproduct',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='mall.product'),
+        ),
+        migrations.RunPython(copy_product_category, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0017_ordered_product_category'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-pk'], 'verbose_name': '주문', 'verbose_name_plural': '주문'},
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('requested', '주문 요청'), ('failed_payment', '결제 실패'), ('paid', '결제 완료'), ('prepared_product', '상품 준비중'), ('shipped', '배송중'), ('delivered', '배송완료'), ('cancelled', '주문 취소')], db_index=True, default='requested', max_length=20, verbose_name='진행 상황'),
+        ),
+    ]
@@ -1,22 +1,48 @@
-from functools import cached_property
-from typing import List
+import random
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List
+from asgiref.sync import sync_to_async
 from uuid import uuid4
 import logging
-from django.db import models
+from django.db import connection, models, transaction
 from django.core.validators import MinValueValidator
-from django.db.models import UniqueConstraint
+from django.db.models import Case, F, UniqueConstraint, Value, When
 from django.db.models import QuerySet
+from django.db.models.functions import TruncDate
 from django.http import Http404
 from django.urls import reverse
+from django.utils import timezone
 from iamport import Iamport
 
 from accounts.models import User
+from mall.metrics import ORDER_TRANSITIONS, ORDERS_CREATED
+from mall.portone import (
+    PortoneUnavailableError,
+    get_async_portone_client,
+    get_portone_client,
+)
 from django.conf import settings
 
 
 logger = logging.getLogger(__name__)
 
 
+# 쿼리 변수 개수 제한이 없는 DB(PostgreSQL 등)에서 INSERT 1번에 저장할 최대 행 수
+MAX_INSERT_BATCH_SIZE = 3000
+
+
+def get_insert_batch_size(column_count: int) -> int:
+    """
+    행마다 column_count개 변수를 사용하는 여러 행 INSERT 1번에 저장할 행 수.
+    bulk_create와 같이 DB의 쿼리 변수 개수 제한(SQLite는 999개)을 넘지 않도록 계산합니다.
+    """
+    max_query_params = connection.features.max_query_params
+    if max_query_params is None:
+        return MAX_INSERT_BATCH_SIZE
+    return max(min(max_query_params // column_count, MAX_INSERT_BATCH_SIZE), 1)
+
+
 # Create your models here.
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -45,6 +71,9 @@ class Product(models.Model):
         choices=Status.choices, default=Status.INACTIVE, max_length=1
     )
     photo = models.ImageField(upload_to="mall/product/photo/%Y/%m/%d")
+    # load_products --sync에서 변경된 상품/사진만 갱신하기 위한 원본 데이터 해시
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -56,6 +85,141 @@ class Product(models.Model):
         ordering = ["-pk"]
 
 
+# 결제 실패 후 늦게 결제된 주문의 재고가 부족해 결제를 취소할 때의 사유
+OUT_OF_STOCK_CANCEL_REASON = "재고 부족으로 결제를 취소했습니다."
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product_name):
+        self.product_name = product_name
+        super().__init__(f"{product_name} 상품의 재고가 부족합니다.")
+
+
+class ProductStock(models.Model):
+    """
+    상품 재고. 주문이 몰리는 상품도 한 행의 잠금을 기다리지 않도록 재고를 여러 행(shard)에 나누어 저장합니다.
+    재고 행이 없는 상품은 재고를 관리하지 않습니다. (무제한 판매)
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="stock_set",
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(verbose_name="재고", default=0)
+
+    def __str__(self):
+        return f"[{self.shard}] {self.quantity}개"
+
+    class Meta:
+        verbose_name_plural = verbose_name = "상품 재고"
+        constraints = [
+            UniqueConstraint(
+                fields=["product", "shard"], name="unique_product_stock_shard"
+            )
+        ]
+
+    @classmethod
+    @transaction.atomic
+    def set_stock(cls, product: Product, quantity: int, shard_count: int = None):
+        """판매 가능한 재고를 shard_count개 행에 고르게 나누어 설정합니다. (이미 예약된 재고는 포함하지 않음)"""
+        shard_count = shard_count or settings.PRODUCT_STOCK_SHARD_COUNT
+        base, rest = divmod(quantity, shard_count)
+        cls.objects.filter(product=product, shard__gte=shard_count).delete()
+        for shard in range(shard_count):
+            cls.objects.update_or_create(
+                product=product,
+                shard=shard,
+                defaults={"quantity": base + (1 if shard < rest else 0)},
+            )
+
+    @classmethod
+    def reserve(cls, order: "Order", quantity_dict: Dict[int, int]) -> None:
+        """
+        {상품 pk: 수량}만큼 재고를 차감하고 주문의 재고 예약으로 기록합니다.
+        재고가 부족하면 OutOfStockError가 발생하므로 트랜잭션 안에서 호출해 차감분이 롤백되도록 합니다.
+        """
+        stock_dict = defaultdict(list)
+        for stock in cls.objects.filter(product_id__in=quantity_dict).order_by("shard"):
+            stock_dict[stock.product_id].append(stock)
+
+        reservation_list = []
+
+        def take_stock(stock, take) -> bool:
+            # 조회 이후 다른 주문이 차감했을 수 있으므로 남은 재고가 충분할 때만 차감
+            is_updated = cls.objects.filter(pk=stock.pk, quantity__gte=take).update(
+                quantity=F("quantity") - take
+            )
+            if is_updated:
+                reservation_list.append(
+                    StockReservation(order=order, stock=stock, quantity=take)
+                )
+                stock.quantity -= take
+            else:
+                stock.refresh_from_db(fields=["quantity"])
+            return bool(is_updated)
+
+        # 동시 주문끼리 교착 상태가 생기지 않도록 상품은 pk 순서, 재고 행은 shard 순서로 잠금
+        for product_pk in sorted(stock_dict):
+            stock_list = stock_dict[product_pk]
+            remaining = quantity_dict[product_pk]
+            # 동시 주문이 같은 행에 몰리지 않도록 한 행에서 모두 가져갈 수 있는 행 중 임의의 행을 먼저 시도
+            # (이 행 하나만 잠그고 같은 상품의 다른 행은 잠그지 않으므로 잠금 순서가 엇갈리지 않음)
+            candidate_list = [
+                stock for stock in stock_list if stock.quantity >= remaining
+            ]
+            if candidate_list and take_stock(random.choice(candidate_list), remaining):
+                remaining = 0
+            for stock in stock_list:
+                while remaining and stock.quantity:
+                    take = min(remaining, stock.quantity)
+                    if take_stock(stock, take):
+                        remaining -= take
+            if remaining:
+                raise OutOfStockError(Product.objects.get(pk=product_pk).name)
+
+        StockReservation.objects.bulk_create(reservation_list)
+
+    @classmethod
+    @transaction.atomic
+    def release(cls, order_pk_list: Iterable[int]) -> None:
+        """
+        주문들의 재고 예약을 취소하고 재고를 되돌립니다. 여러 번 호출해도 한 번만 되돌립니다.
+        예약 삭제와 재고 행별 증가를 각각 쿼리 1번으로 처리합니다.
+        """
+        # 동시에 같은 예약을 취소하는 요청은 잠금을 기다린 뒤 이미 삭제된 예약을 조회하지 않음
+        # (SQLite는 쓰기 트랜잭션을 하나씩 실행하므로 잠금 없이도 중복 반환되지 않음)
+        reservation_list = list(
+            StockReservation.objects.select_for_update().filter(
+                order_id__in=order_pk_list
+            )
+        )
+        if not reservation_list:
+            return
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in reservation_list]
+        ).delete()
+
+        quantity_dict = defaultdict(int)
+        for reservation in reservation_list:
+            # 재고를 다시 설정하면서 삭제된 재고 행의 예약분은 되돌리지 않음
+            if reservation.stock_id is not None:
+                quantity_dict[reservation.stock_id] += reservation.quantity
+        if quantity_dict:
+            cls.objects.filter(pk__in=quantity_dict).update(
+                quantity=F("quantity")
+                + Case(
+                    *[
+                        When(pk=stock_pk, then=Value(quantity))
+                        for stock_pk, quantity in quantity_dict.items()
+                    ],
+                    default=Value(0),
+                )
+            )
+
+
 class CartProduct(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -79,6 +243,71 @@ class CartProduct(models.Model):
     def amount(self):
         return self.product.price * self.quantity
 
+    @classmethod
+    def add_products(cls, user: User, quantity_dict: Dict[int, int]) -> int:
+        """
+        {상품 pk: 수량}만큼 장바구니에 담고, 담은 상품 수를 반환합니다.
+        판매중(ACTIVE)이 아닌 상품은 건너뜁니다.
+        상품 확인, 추가, 수량 증가를 INSERT ... ON CONFLICT DO UPDATE 한 문장으로 처리해
+        동시에 담아도 수량 증가가 유실되지 않습니다.
+        """
+        if not quantity_dict:
+            return 0
+        if connection.vendor in ("sqlite", "postgresql"):
+            return cls._upsert_products(user, quantity_dict)
+        return cls._add_products_with_f(user, quantity_dict)
+
+    @classmethod
+    def _upsert_products(cls, user: User, quantity_dict: Dict[int, int]) -> int:
+        qn = connection.ops.quote_name
+        cart_table = qn(cls._meta.db_table)
+        product_table = qn(Product._meta.db_table)
+        user_column = qn(cls._meta.get_field("user").column)
+        product_column = qn(cls._meta.get_field("product").column)
+
+        case_sql = " ".join("WHEN %s THEN %s" for _ in quantity_dict)
+        in_sql = ", ".join("%s" for _ in quantity_dict)
+        sql = (
+            f"INSERT INTO {cart_table} ({user_column}, {product_column}, quantity) "
+            f"SELECT %s, id, CASE id {case_sql} END FROM {product_table} "
+            f"WHERE status = %s AND id IN ({in_sql}) "
+            f"ON CONFLICT ({user_column}, {product_column}) "
+            f"DO UPDATE SET quantity = {cart_table}.quantity + excluded.quantity"
+        )
+        params = [user.pk]
+        for product_pk, quantity in quantity_dict.items():
+            params += [product_pk, quantity]
+        params.append(Product.Status.ACTIVE)
+        params += list(quantity_dict)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    @classmethod
+    @transaction.atomic
+    def _add_products_with_f(cls, user: User, quantity_dict: Dict[int, int]) -> int:
+        # ON CONFLICT를 지원하지 않는 DB에서는 F()로 DB에서 수량을 증가시키고, 없으면 생성
+        active_pk_list = Product.objects.filter(
+            pk__in=quantity_dict, status=Product.Status.ACTIVE
+        ).values_list("pk", flat=True)
+        count = 0
+        for product_pk in active_pk_list:
+            quantity = quantity_dict[product_pk]
+            updated = cls.objects.filter(user=user, product_id=product_pk).update(
+                quantity=F("quantity") + quantity
+            )
+            if not updated:
+                _, is_created = cls.objects.get_or_create(
+                    user=user, product_id=product_pk, defaults={"quantity": quantity}
+                )
+                if not is_created:
+                    cls.objects.filter(user=user, product_id=product_pk).update(
+                        quantity=F("quantity") + quantity
+                    )
+            count += 1
+        return count
+
 
 class Order(models.Model):
     class Status(models.TextChoices):
@@ -90,6 +319,34 @@ class Order(models.Model):
         DELIVERED = "delivered", "배송완료"
         CANCELLED = "cancelled", "주문 취소"
 
+    # 변경할 상태: 변경 전에 허용되는 상태 목록
+    TRANSITION_DICT = {
+        Status.REQUESTED: [Status.FAILED_PAYMEMT],
+        # 결제 실패 후 포트원에서 결제 완료가 확인되는 경우도 반영
+        Status.PAID: [Status.REQUESTED, Status.FAILED_PAYMEMT],
+        Status.FAILED_PAYMEMT: [Status.REQUESTED],
+        Status.PREPARED_PRODUCT: [Status.PAID],
+        Status.SHIPPED: [Status.PREPARED_PRODUCT],
+        Status.DELIVERED: [Status.SHIPPED],
+        Status.CANCELLED: [
+            Status.REQUESTED,
+            Status.FAILED_PAYMEMT,
+            Status.PAID,
+            Status.PREPARED_PRODUCT,
+        ],
+    }
+
+    # 재고 예약을 반환한 상태. 이 상태에서 벗어나면 재고를 다시 예약
+    STOCK_RELEASED_STATUS_LIST = [Status.FAILED_PAYMEMT, Status.CANCELLED]
+
+    # 매출 집계(DailySales 등)에 포함하는 상태 (결제 완료 이후)
+    SALES_STATUS_LIST = [
+        Status.PAID,
+        Status.PREPARED_PRODUCT,
+        Status.SHIPPED,
+        Status.DELIVERED,
+    ]
+
     uid = models.UUIDField(default=uuid4, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False
@@ -103,45 +360,171 @@ class Order(models.Model):
         db_index=True,
     )
     product_set = models.ManyToManyField(Product, through="OrderedProduct", blank=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # 주문 목록에서 주문마다 orderedproduct_set을 조회하지 않도록 주문 생성 시점에 저장
+    name = models.CharField(verbose_name="주문명", max_length=255, blank=True)
+    product_count = models.PositiveIntegerField(verbose_name="주문 상품 수", default=0)
+    # 관리자 목록의 날짜 필터에서 사용
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     @classmethod
+    @transaction.atomic
     def create_from_cart(
         cls, user: User, cart_product_ps: QuerySet[CartProduct]
     ) -> "Order":
-        # 리스트를 생성해 DB 조회가 1번만 실행되도록
-        cart_product_list: List[CartProduct] = list(cart_product_ps)
+        """
+        장바구니 상품으로 주문을 생성하고 장바구니를 비웁니다.
+        장바구니 크기와 관계없이 조회/주문 생성/주문 상품 생성/장바구니 삭제 쿼리가 1번씩만 실행됩니다.
+        """
+        # 장바구니를 상품과 함께 1번에 조회하고, 주문이 끝날 때까지 장바구니 행을 잠금
+        # (상품 행은 잠그지 않도록 of 지정. SQLite에서는 select_for_update가 무시됨)
+        lock_kwargs = (
+            {"of": ("self",)} if connection.features.has_select_for_update_of else {}
+        )
+        cart_product_list: List[CartProduct] = list(
+            cart_product_ps.select_related("product").select_for_update(**lock_kwargs)
+        )
         total_amount = sum(cart_product.amount for cart_product in cart_product_list)
-        order = cls.objects.create(user=user, total_amount=total_amount)
+        first_name = cart_product_list[0].product.name if cart_product_list else None
+        order = cls.objects.create(
+            user=user,
+            total_amount=total_amount,
+            name=cls.make_name(first_name, len(cart_product_list)),
+            product_count=len(cart_product_list),
+        )
+
+        cart_product_pk_list = [cart_product.pk for cart_product in cart_product_list]
+        OrderedProduct.insert_from_cart(order, cart_product_pk_list)
 
-        ordered_product_list = []
+        # 재고를 관리하는 상품은 재고 예약 (재고가 부족하면 주문 생성이 롤백됨)
+        quantity_dict = defaultdict(int)
         for cart_product in cart_product_list:
-            ordered_product = OrderedProduct(
-                order=order,
-                product=cart_product.product,
-                name=cart_product.product.name,
-                price=cart_product.product.price,
-                quantity=cart_product.quantity,
-            )
-            ordered_product_list.append(ordered_product)
+            quantity_dict[cart_product.product_id] += cart_product.quantity
+        ProductStock.reserve(order, quantity_dict)
+
+        # 조회한 장바구니 상품만 삭제 (주문 도중 새로 담은 상품은 남김)
+        CartProduct.objects.filter(pk__in=cart_product_pk_list).delete()
 
-        OrderedProduct.objects.bulk_create(ordered_product_list)
+        # 재고 부족 등으로 롤백되면 집계하지 않음
+        transaction.on_commit(ORDERS_CREATED.inc)
         return order
 
-    @property
-    def name(self):
-        first_product = self.orderedproduct_set.first()
-        if first_product is None:
+    @staticmethod
+    def make_name(first_product_name, size) -> str:
+        if first_product_name is None:
             return "등록된 상품이 없습니다."
-        size = self.orderedproduct_set.all().count()
         if size < 2:
-            return first_product.name
-        return f"{first_product.name} 외 {size - 1}건"
+            return first_product_name
+        return f"{first_product_name} 외 {size - 1}건"
 
     def can_pay(self) -> bool:
         return self.status in (self.Status.REQUESTED, self.Status.FAILED_PAYMEMT)
 
+    @classmethod
+    @transaction.atomic
+    def transition_by_pk(cls, pk, to_status, now=None) -> bool:
+        """
+        허용된 상태일 때만 상태를 변경하는 조건부 UPDATE로 주문 상태를 변경합니다.
+        다른 요청이 먼저 상태를 변경했거나 허용되지 않는 변경이면 False를 반환합니다.
+        같은 트랜잭션에서 매출 집계 포함 여부가 바뀌면 일별 매출 집계에 반영하고,
+        결제 실패/취소로 재고를 반환하거나 반환했던 주문이 다시 진행되면 재고를 다시 예약합니다.
+        재고가 부족하면 OutOfStockError가 발생하고 상태 변경도 롤백됩니다.
+        """
+        is_sales = to_status in cls.SALES_STATUS_LIST
+        is_released = to_status in cls.STOCK_RELEASED_STATUS_LIST
+        # 변경 전 상태를 따로 조회하지 않도록, 후속 처리가 같은 변경 전 상태끼리 묶어 조건부 UPDATE
+        # (TRANSITION_DICT에 먼저 적은 흔한 변경 전 상태의 묶음부터 시도)
+        from_status_dict = defaultdict(list)
+        for from_status in cls.TRANSITION_DICT[to_status]:
+            changes_sales = (from_status in cls.SALES_STATUS_LIST) != is_sales
+            changes_stock = (
+                from_status in cls.STOCK_RELEASED_STATUS_LIST
+            ) != is_released
+            from_status_dict[(changes_sales, changes_stock)].append(from_status)
+
+        updated = 0
+        for key, from_status_list in from_status_dict.items():
+            changes_sales, changes_stock = key
+            updated = cls.objects.filter(pk=pk, status__in=from_status_list).update(
+                status=to_status, updated_at=now or timezone.now()
+            )
+            if updated:
+                if changes_sales:
+                    cls.apply_sales([pk], sign=1 if is_sales else -1)
+                if changes_stock and is_released:
+                    ProductStock.release([pk])
+                elif changes_stock:
+                    cls(pk=pk).reserve_stock()
+                break
+
+        if not updated:
+            logger.info("주문 상태 변경 거부 (order=%s, → %s)", pk, to_status)
+        ORDER_TRANSITIONS.labels(to_status, "changed" if updated else "rejected").inc()
+        return bool(updated)
+
+    @classmethod
+    def apply_sales(cls, order_pk_list: Iterable[int], sign=1) -> None:
+        """주문들의 주문 상품을 주문일 기준 일별 매출 집계에 더합니다. (sign=-1이면 차감)"""
+        line_qs = OrderedProduct.objects.filter(order_id__in=order_pk_list).values_list(
+            "order_id",
+            TruncDate("order__created_at"),
+            "product_id",
+            "category_id",
+            "price",
+            "quantity",
+        )
+        # 집계 키: [주문 pk 집합, 수량, 매출]
+        sales_dict = defaultdict(lambda: [set(), 0, 0])
+        product_sales_dict = defaultdict(lambda: [set(), 0, 0])
+        category_sales_dict = defaultdict(lambda: [set(), 0, 0])
+        for order_pk, date, product_pk, category_pk, price, quantity in line_qs:
+            row_key_list = [
+                (sales_dict, (date,)),
+                (product_sales_dict, (date, product_pk)),
+            ]
+            # 분류가 없는 주문 상품은 분류별 집계에서 제외 (분류 집계의 분류는 NOT NULL)
+            if category_pk is not None:
+                row_key_list.append((category_sales_dict, (date, category_pk)))
+            for row, key in row_key_list:
+                row[key][0].add(order_pk)
+                row[key][1] += quantity
+                row[key][2] += price * quantity
+
+        for model_cls, row_dict in [
+            (DailySales, sales_dict),
+            (DailyProductSales, product_sales_dict),
+            (DailyCategorySales, category_sales_dict),
+        ]:
+            model_cls.add_rows(
+                {
+                    key: (len(order_pk_set) * sign, quantity * sign, amount * sign)
+                    for key, (order_pk_set, quantity, amount) in row_dict.items()
+                }
+            )
+
+    def transition(self, to_status) -> bool:
+        now = timezone.now()
+        is_changed = self.transition_by_pk(self.pk, to_status, now=now)
+        if is_changed:
+            self.status = to_status
+            self.updated_at = now
+        return is_changed
+
+    def reopen(self) -> bool:
+        """
+        결제 실패한 주문을 다시 결제할 수 있도록 주문 요청 상태로 되돌립니다. (재고는 transition_by_pk에서 다시 예약)
+        재고가 부족하면 OutOfStockError가 발생하고 상태 변경도 롤백됩니다.
+        """
+        return self.transition(self.Status.REQUESTED)
+
+    def reserve_stock(self):
+        quantity_dict = defaultdict(int)
+        for product_pk, quantity in self.orderedproduct_set.values_list(
+            "product_id", "quantity"
+        ):
+            quantity_dict[product_pk] += quantity
+        ProductStock.reserve(self, quantity_dict)
+
     def cancel(self, reason=""):
         # 실결제 로직이 AbstractPortonePayment에 구현되어 있어 실제 결제 취소 로직을 해당 모델에 구현
         for payment in self.orderpayment_set.all():
@@ -157,12 +540,28 @@ class Order(models.Model):
     class Meta:
         ordering = ["-pk"]
         verbose_name = verbose_name_plural = "주문"
+        indexes = [
+            # 사용자별 주문 목록을 pk 커서로 나눌 때 정렬 없이 인덱스 순서대로 조회
+            models.Index(fields=["user", "-id"], name="mall_order_user_id_desc"),
+        ]
 
 
 # order - product M2M으로 연결하는 모델
 class OrderedProduct(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, db_constraint=False)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_constraint=False)
+    # 상품을 삭제해도 주문 내역과 매출 집계 기준이 남도록 CASCADE 하지 않음
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    # 매출 집계는 상품의 현재 분류가 아닌 주문 시점의 분류 기준
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        verbose_name="분류",
+        help_text="주문 시점의 분류를 저장합니다.",
+    )
     name = models.CharField(
         verbose_name="상품명",
         max_length=255,
@@ -175,6 +574,97 @@ class OrderedProduct(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def insert_from_cart(cls, order: "Order", cart_product_pk_list: List[int]) -> None:
+        """
+        장바구니 상품을 상품과 조인해 INSERT ... SELECT 1번으로 주문 상품을 저장합니다.
+        장바구니 크기와 관계없이 쿼리 1번이며, 상품명/가격/분류는 이 시점의 상품 값을 저장합니다.
+        """
+        if not cart_product_pk_list:
+            return
+        qn = connection.ops.quote_name
+        now = timezone.now()
+        created_at_field = cls._meta.get_field("created_at")
+        updated_at_field = cls._meta.get_field("updated_at")
+        column_sql = ", ".join(
+            qn(cls._meta.get_field(name).column)
+            for name in [
+                "order",
+                "product",
+                "category",
+                "name",
+                "price",
+                "quantity",
+                "created_at",
+                "updated_at",
+            ]
+        )
+        cart_opts, product_opts = CartProduct._meta, Product._meta
+
+        def product_column(name):
+            return "p." + qn(product_opts.get_field(name).column)
+
+        def cart_column(name):
+            return "c." + qn(cart_opts.get_field(name).column)
+
+        select_sql = ", ".join(
+            ["%s"]
+            + [product_column(name) for name in ["id", "category", "name", "price"]]
+            + [cart_column("quantity"), "%s", "%s"]
+        )
+        sql = (
+            f"INSERT INTO {qn(cls._meta.db_table)} ({column_sql}) "
+            f"SELECT {select_sql} "
+            f"FROM {qn(cart_opts.db_table)} c "
+            f"INNER JOIN {qn(product_opts.db_table)} p "
+            f"ON {product_column('id')} = {cart_column('product')} "
+            f"WHERE {cart_column('id')} IN "
+            f"({', '.join(['%s'] * len(cart_product_pk_list))})"
+        )
+        params = [
+            order.pk,
+            created_at_field.get_db_prep_save(now, connection),
+            updated_at_field.get_db_prep_save(now, connection),
+            *cart_product_pk_list,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class StockReservation(models.Model):
+    """주문이 차감한 재고. 결제 실패/취소 시 차감한 재고 행에 되돌립니다."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, db_constraint=False)
+    # 재고를 다시 설정하면서 삭제된 재고 행의 예약분은 되돌리지 않음
+    stock = models.ForeignKey(
+        ProductStock, on_delete=models.SET_NULL, null=True, db_constraint=False
+    )
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class PortoneResponse(models.Model):
+    """
+    포트원 API 응답 원본. 응답마다 1행씩 추가만 하며, 결제 상태 변경 이력으로도 사용합니다.
+    결제 행을 삭제해도 이력이 남도록 결제 pk 대신 merchant_uid로 연결합니다.
+    """
+
+    merchant_uid = models.UUIDField(db_index=True)
+    status = models.CharField("결제 상태", max_length=20, blank=True)
+    response = models.JSONField("포트원 결제내역", default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = verbose_name = "포트원 응답"
+
+    @classmethod
+    def make(cls, payment: "AbstractPortonePayment") -> "PortoneResponse":
+        return cls(
+            merchant_uid=payment.uid,
+            status=payment.meta.get("status", ""),
+            response=payment.meta,
+        )
+
 
 # portone 결제와 관련된 필드 정의의
 class AbstractPortonePayment(models.Model):
@@ -187,8 +677,10 @@ class AbstractPortonePayment(models.Model):
         CANCELLED = "cancelled", "결제 취소"
         FAILED = "failed", "결제 실패"
 
-    meta = models.JSONField("포트원 결제내역", default=dict, editable=False)
-    uid = models.UUIDField("쇼핑몰 결제식별자", default=uuid4, editable=False)
+    # 웹훅으로 전달되는 merchant_uid로 결제를 조회하므로 unique 인덱스 지정
+    uid = models.UUIDField(
+        "쇼핑몰 결제식별자", default=uuid4, editable=False, unique=True
+    )
     name = models.CharField("결제명", max_length=200)
     desired_amount = models.PositiveIntegerField("결제금액", editable=False)
     buyer_name = models.CharField("구매자 이름", max_length=100, editable=False)
@@ -204,37 +696,75 @@ class AbstractPortonePayment(models.Model):
         choices=PayStatus.choices,
         max_length=20,
         default=PayStatus.READY,
+        db_index=True,
     )
     is_paid_ok = models.BooleanField(
         "결제 성공 여부", default=False, db_index=True, editable=False
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     @property
     def merchant_uid(self):
         return str(self.uid)
 
-    @cached_property
+    @property
     def api(self):
-        return Iamport(
-            imp_key=settings.PORTONE_API_KEY, imp_secret=settings.PORTONE_API_SECRET
-        )
+        return get_portone_client()
+
+    @property
+    def meta(self) -> dict:
+        """마지막 포트원 응답. 결제 행에는 저장하지 않고, 처음 접근할 때 PortoneResponse에서 조회"""
+        if not hasattr(self, "_latest_response"):
+            self._latest_response = (
+                self.response_qs.order_by("-pk")
+                .values_list("response", flat=True)
+                .first()
+                or {}
+            )
+        return self._latest_response
+
+    @property
+    def response_qs(self) -> QuerySet[PortoneResponse]:
+        return PortoneResponse.objects.filter(merchant_uid=self.uid)
 
     def update(self, response=None):
         if response is None:
             try:
-                self.meta = self.api.find(merchant_uid=self.merchant_uid)
+                response = self.api.find(merchant_uid=self.merchant_uid)
+            except PortoneUnavailableError:
+                # 포트원 장애는 결제가 없는 것과 구분해 호출한 쪽에서 처리 (결제 확인 대기 화면 등)
+                raise
             except (Iamport.ResponseError, Iamport.HttpError) as e:
                 logger.error(str(e), exc_info=e)
                 raise Http404("포트원에서 결제내역을 찾을 수 없습니다.")
-        else:
-            self.meta = response
 
-        self.pay_status = self.meta["status"]
-        self.is_paid_ok = self.api.is_paid(self.desired_amount, response=self.meta)
-        self.save()
+        self.apply_response(response)
+        # 조회에 사용하는 필드만 갱신하고, 응답 원본은 이력 테이블에 추가
+        self.save(update_fields=["pay_status", "is_paid_ok", "updated_at"])
+        PortoneResponse.make(self).save()
 
         # TODO: 결제완료지만 is_paid_ok=False => 결제 금액이 맞지 않은 경우
 
+    def update_by_webhook(self) -> str:
+        """포트원 웹훅을 받았을 때 포트원 API로 다시 조회해 반영하고, 조회한 결제 상태를 반환"""
+        self.update()
+        return self.pay_status
+
+    # 저장하지 않고 포트원 응답만 반영 (bulk_update로 일괄 저장하는 경우에도 사용)
+    def apply_response(self, response):
+        self._latest_response = response
+        self.pay_status = response["status"]
+        self.is_paid_ok = self.api.is_paid(self.desired_amount, response=response)
+
+    def is_changed_by(self, response) -> bool:
+        """포트원 응답을 반영하면 결제 상태가 바뀌는지 여부 (응답 원본을 조회하지 않고 비교)"""
+        return (
+            self.pay_status != response["status"]
+            or self.is_paid_ok
+            != self.api.is_paid(self.desired_amount, response=response)
+        )
+
     def cancel(self, reason=""):
         try:
             response = self.api.cancel(reason=reason, merchant_uid=self.merchant_uid)
@@ -244,6 +774,30 @@ class AbstractPortonePayment(models.Model):
         except Iamport.ResponseError:
             self.update()
 
+    # 포트원 응답을 기다리는 동안에는 스레드를 점유하지 않고, 응답을 받은 뒤 DB 반영만 update()로 처리
+    async def aupdate(self, response=None):
+        if response is None:
+            try:
+                response = await get_async_portone_client().find(
+                    merchant_uid=self.merchant_uid
+                )
+            except PortoneUnavailableError:
+                raise
+            except (Iamport.ResponseError, Iamport.HttpError) as e:
+                logger.error(str(e), exc_info=e)
+                raise Http404("포트원에서 결제내역을 찾을 수 없습니다.")
+
+        await sync_to_async(self.update)(response)
+
+    async def acancel(self, reason=""):
+        try:
+            response = await get_async_portone_client().cancel(
+                reason=reason, merchant_uid=self.merchant_uid
+            )
+        except Iamport.ResponseError:
+            response = None
+        await self.aupdate(response)
+
     class Meta:
         abstract = True
 
@@ -263,20 +817,193 @@ class OrderPayment(AbstractPortonePayment):
         )
         return payment
 
+    @classmethod
+    def get_or_create_by_order(cls, order: Order) -> "OrderPayment":
+        """
+        결제 페이지를 새로고침하거나 뒤로 가기로 다시 열 때마다 결제 시도가 쌓이지 않도록,
+        유효 시간이 지나지 않은 같은 금액의 결제 준비(READY) 건이 있으면 재사용합니다.
+        """
+        created_after = timezone.now() - timedelta(
+            seconds=settings.PORTONE_PAYMENT_REUSE_TIMEOUT
+        )
+        payment = (
+            cls.objects.filter(
+                order=order,
+                pay_status=cls.PayStatus.READY,
+                desired_amount=order.total_amount,
+                created_at__gte=created_after,
+            )
+            .order_by("-pk")
+            .first()
+        )
+        if payment is None:
+            payment = cls.create_by_order(order)
+        return payment
+
+    def get_order_status(self):
+        """결제 상태에 따라 변경되어야 할 주문 상태. 변경할 필요가 없으면 None"""
+        if self.is_paid_ok:
+            return Order.Status.PAID
+        elif self.pay_status == self.PayStatus.FAILED:
+            return Order.Status.FAILED_PAYMEMT
+        elif self.pay_status == self.PayStatus.CANCELLED:
+            return Order.Status.CANCELLED
+        return None
+
     def update(self, response=None):
         super().update(response)
 
-        if self.is_paid_ok:
-            self.order.status = Order.Status.PAID
-            self.order.save()
+        order_status = self.get_order_status()
+        if order_status is None:
+            return
 
+        # 이미 반영되었거나 다른 요청이 먼저 상태를 변경했으면 후속 처리를 하지 않음
+        # (재고 반환/재예약과 매출 집계는 transition_by_pk에서 처리)
+        try:
+            if not self.order.transition(order_status):
+                return
+        except OutOfStockError:
+            # 결제 실패로 재고를 반환한 주문이 늦게 결제된 사이에 재고가 소진되면 결제 취소
+            logger.warning("재고 부족으로 결제 취소 (order=%s)", self.order_id)
+            self.cancel(reason=OUT_OF_STOCK_CANCEL_REASON)
+            return
+
+        if order_status == Order.Status.PAID:
             # 다수의 결제 시도 (현재 order에 대한 결제 시도 삭제 - 현재 결제 시도 제외)
             self.order.orderpayment_set.exclude(pk=self.pk).delete()
 
-        elif self.pay_status == self.PayStatus.FAILED:
-            self.order.status = Order.Status.FAILED_PAYMEMT
-            self.order.save()
 
-        elif self.pay_status == self.PayStatus.CANCELLED:
-            self.order.status = Order.Status.CANCELLED
-            self.order.save()
+class AbstractSales(models.Model):
+    """
+    일별 매출 집계. 결제 완료 이후 상태(Order.SALES_STATUS_LIST)인 주문을 주문일 기준으로 집계합니다.
+    주문 상태가 바뀔 때 Order.transition_by_pk에서 증분 반영하고, rebuild_sales 명령으로 다시 계산합니다.
+    """
+
+    # 집계 키 필드 (unique 제약 조건과 같은 순서)
+    KEY_FIELD_LIST = ["date"]
+
+    date = models.DateField("주문일")
+    order_count = models.IntegerField("주문 수", default=0)
+    quantity = models.IntegerField("판매 수량", default=0)
+    amount = models.BigIntegerField("매출", default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ["-date"]
+
+    @classmethod
+    def add_rows(cls, row_dict: Dict[tuple, tuple]) -> None:
+        """
+        {집계 키: (주문 수, 수량, 매출)}을 기존 집계에 더합니다.
+        INSERT ... ON CONFLICT DO UPDATE 한 문장으로 처리해 동시에 반영해도 유실되지 않습니다.
+        """
+        if not row_dict:
+            return
+        if connection.vendor in ("sqlite", "postgresql"):
+            cls._upsert_rows(row_dict)
+        else:
+            cls._add_rows_with_f(row_dict)
+
+    @classmethod
+    def _upsert_rows(cls, row_dict: Dict[tuple, tuple]) -> None:
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        key_field_list = [cls._meta.get_field(name) for name in cls.KEY_FIELD_LIST]
+        key_column_sql = ", ".join(qn(field.column) for field in key_field_list)
+        value_column_list = ["order_count", "quantity", "amount"]
+        update_sql = ", ".join(
+            f"{column} = {table}.{column} + excluded.{column}"
+            for column in value_column_list
+        )
+        row_sql = "({})".format(
+            ", ".join(["%s"] * (len(key_field_list) + len(value_column_list)))
+        )
+
+        item_list = list(row_dict.items())
+        # 쿼리 변수 개수 제한을 넘지 않도록 나누어 저장
+        batch_size = get_insert_batch_size(
+            len(key_field_list) + len(value_column_list)
+        )
+        for i in range(0, len(item_list), batch_size):
+            batch = item_list[i : i + batch_size]
+            params = []
+            for key, value in batch:
+                params += [
+                    field.get_db_prep_save(key_value, connection)
+                    for field, key_value in zip(key_field_list, key)
+                ]
+                params += list(value)
+            sql = (
+                f"INSERT INTO {table} ({key_column_sql}, {', '.join(value_column_list)}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({key_column_sql}) DO UPDATE SET {update_sql}"
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+
+    @classmethod
+    @transaction.atomic
+    def _add_rows_with_f(cls, row_dict: Dict[tuple, tuple]) -> None:
+        # ON CONFLICT를 지원하지 않는 DB에서는 F()로 DB에서 더하고, 없으면 생성
+        for key, (order_count, quantity, amount) in row_dict.items():
+            key_dict = {
+                field.attname: value
+                for field, value in zip(
+                    [cls._meta.get_field(name) for name in cls.KEY_FIELD_LIST], key
+                )
+            }
+            value_dict = {
+                "order_count": F("order_count") + order_count,
+                "quantity": F("quantity") + quantity,
+                "amount": F("amount") + amount,
+            }
+            if not cls.objects.filter(**key_dict).update(**value_dict):
+                _, is_created = cls.objects.get_or_create(
+                    **key_dict,
+                    defaults={
+                        "order_count": order_count,
+                        "quantity": quantity,
+                        "amount": amount,
+                    },
+                )
+                if not is_created:
+                    cls.objects.filter(**key_dict).update(**value_dict)
+
+
+class DailySales(AbstractSales):
+    class Meta(AbstractSales.Meta):
+        verbose_name_plural = verbose_name = "일별 매출"
+        constraints = [UniqueConstraint(fields=["date"], name="unique_daily_sales")]
+
+
+class DailyProductSales(AbstractSales):
+    KEY_FIELD_LIST = ["date", "product"]
+
+    # 상품을 삭제해도 지난 매출은 남도록 CASCADE 하지 않음
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False
+    )
+
+    class Meta(AbstractSales.Meta):
+        verbose_name_plural = verbose_name = "상품별 일 매출"
+        constraints = [
+            UniqueConstraint(
+                fields=["date", "product"], name="unique_daily_product_sales"
+            )
+        ]
+
+
+class DailyCategorySales(AbstractSales):
+    KEY_FIELD_LIST = ["date", "category"]
+
+    category = models.ForeignKey(
+        Category, on_delete=models.DO_NOTHING, db_constraint=False
+    )
+
+    class Meta(AbstractSales.Meta):
+        verbose_name_plural = verbose_name = "분류별 일 매출"
+        constraints = [
+            UniqueConstraint(
+                fields=["date", "category"], name="unique_daily_category_sales"
+            )
+        ]
@@ -0,0 +1,234 @@
+"""
+대용량 테이블 목록용 Paginator.
+
+Django Paginator는 페이지마다 SELECT COUNT(*)를 실행하므로, 수백만 건 테이블에서는
+목록 조회보다 COUNT가 더 오래 걸립니다.
+
+- EstimatedCountPaginator: 전체 목록은 DB 추정 건수나 캐시한 COUNT를 사용
+- CountlessPaginator: COUNT 없이 한 행을 더 조회해 다음 페이지가 있는지만 확인 (검색 결과용)
+- CursorPaginator: OFFSET 대신 마지막 pk를 커서로 사용 (주문 목록, 상품 JSON)
+"""
+
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (
+    EmptyPage,
+    InvalidPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+# 추정 건수가 이보다 적으면 정확히 COUNT (작은 테이블은 COUNT도 빠르고, 추정 오차가 상대적으로 큼)
+ESTIMATE_THRESHOLD = 10000
+
+
+def get_estimated_count(qs: QuerySet):
+    """
+    PostgreSQL의 추정 건수. 추정할 수 없으면 None
+    필터가 없으면 테이블 통계(pg_class.reltuples)를, 있으면 실행 계획의 예상 행 수를 사용합니다.
+    """
+    conn = connections[qs.db]
+    if conn.vendor != "postgresql":
+        return None
+
+    with conn.cursor() as cursor:
+        if not qs.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [conn.ops.quote_name(qs.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+            # ANALYZE 전에는 -1
+            if row is None or row[0] < 0:
+                return None
+            return row[0]
+
+        sql, params = qs.order_by().values("pk").query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    필터가 없는 전체 목록은 COUNT(*) 대신 추정 건수를 사용하는 Paginator.
+    PostgreSQL은 테이블 통계를, 그 외 DB나 작은 테이블은 ESTIMATED_COUNT_CACHE_TIMEOUT초 동안 캐시한 COUNT를 사용합니다.
+    필터가 있으면 정확히 COUNT하므로 필터 필드에는 인덱스가 있어야 합니다.
+
+    count_cache_key를 지정하면 필터가 있어도 해당 키로 건수를 추정/캐시합니다.
+    (판매중 상품 목록처럼 고정된 조건의 목록. 키에 버전을 넣어 무효화)
+    """
+
+    def __init__(
+        self, *args, count_cache_key=None, count_cache_timeout=None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.count_cache_key = count_cache_key
+        self.count_cache_timeout = count_cache_timeout
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not isinstance(qs, QuerySet):
+            return super().count
+        if self.count_cache_key is None and qs.query.where:
+            return super().count
+
+        estimated_count = get_estimated_count(qs)
+        if estimated_count is not None and estimated_count >= ESTIMATE_THRESHOLD:
+            return estimated_count
+
+        cache_key = (
+            self.count_cache_key or f"mall:count:{qs.db}:{qs.model._meta.db_table}"
+        )
+        timeout = self.count_cache_timeout or settings.ESTIMATED_COUNT_CACHE_TIMEOUT
+        return cache.get_or_set(cache_key, qs.count, timeout=timeout)
+
+
+class CountlessPaginator(Paginator):
+    """
+    COUNT 없이 per_page + 1개를 조회해 다음 페이지 여부만 확인하는 Paginator.
+    page()를 호출한 뒤에는 num_pages가 (다음 페이지가 있으면) 현재 페이지 + 1이 되므로
+    bootstrap_pagination 등 num_pages를 사용하는 템플릿 태그도 그대로 동작합니다.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._num_pages = 1
+        self._count = 0
+
+    @property
+    def count(self):
+        """조회한 페이지까지의 건수 (다음 페이지가 있으면 1건 더한 하한값)"""
+        return self._count
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        object_list = list(self.object_list[bottom : top + 1])
+        has_next = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+        if not object_list and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_("That page contains no results"))
+
+        self._num_pages = number + 1 if has_next else number
+        self._count = bottom + len(object_list) + (1 if has_next else 0)
+        return self._get_page(object_list, number, self)
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(pk, reverse=False) -> str:
+    data = json.dumps({"pk": pk, "r": int(reverse)}, separators=(",", ":"))
+    return urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(기준 pk, 이전 페이지 방향 여부)"""
+    try:
+        data = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data["pk"]), bool(data["r"])
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise InvalidCursor(_("Invalid cursor"))
+
+
+def get_cursor_url(request, cursor):
+    """현재 URL의 다른 쿼리 파라미터는 유지하고 cursor만 바꾼 URL"""
+    if cursor is None:
+        return None
+    query_dict = request.GET.copy()
+    query_dict["cursor"] = cursor
+    return f"{request.path}?{query_dict.urlencode()}"
+
+
+@dataclass
+class CursorPage:
+    object_list: list
+    next_cursor: Optional[str]
+    previous_cursor: Optional[str]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    pk 내림차순(모델의 ordering = ["-pk"]) 목록을 마지막 pk 기준으로 나누는 keyset Paginator.
+    OFFSET 없이 "pk < 커서" 조건으로 인덱스에서 바로 찾으므로 몇 번째 페이지든 조회 비용이 같습니다.
+    커서는 (기준 pk, 방향)을 인코딩한 문자열이며, 전체 건수와 페이지 번호는 제공하지 않습니다.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None) -> CursorPage:
+        qs = self.queryset.order_by("-pk")
+        position, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if position is not None:
+            if reverse:
+                qs = qs.filter(pk__gt=position).order_by("pk")
+            else:
+                qs = qs.filter(pk__lt=position)
+
+        # 한 행을 더 조회해 같은 방향으로 더 있는지 확인
+        object_list = list(qs[: self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+        if reverse:
+            object_list.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        if not object_list:
+            has_next = has_previous = False
+
+        return CursorPage(
+            object_list=object_list,
+            next_cursor=encode_cursor(object_list[-1].pk) if has_next else None,
+            previous_cursor=(
+                encode_cursor(object_list[0].pk, reverse=True) if has_previous else None
+            ),
+        )
@@ -0,0 +1,478 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from functools import partial
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from iamport import Iamport
+from iamport.client import IAMPORT_API_URL
+from requests.adapters import HTTPAdapter
+
+from mall.metrics import PORTONE_REQUEST_ERRORS, observe_portone
+
+# 토큰 만료 직전에 요청이 실패하지 않도록 만료 시각보다 일찍 토큰을 갱신
+TOKEN_EXPIRE_MARGIN = 60
+
+
+class PortoneUnavailableError(Iamport.HttpError):
+    """
+    포트원이 응답하지 않거나(타임아웃, 연결 실패, 5xx) 서킷 브레이커가 열려 호출하지 않은 경우.
+    기존 Iamport.HttpError 처리 코드에서도 처리되도록 HttpError를 상속
+    """
+
+    def __init__(self, reason=None):
+        super().__init__(code=None, reason=reason)
+
+    def __str__(self):
+        return f"포트원 응답 없음: {self.reason}"
+
+
+def is_unavailable_error(e: Exception) -> bool:
+    """포트원 장애로 볼 수 있는 오류인지 여부 (결제 없음, 이미 취소됨 같은 응답 오류는 제외)"""
+    if isinstance(e, (requests.RequestException, httpx.TransportError)):
+        return True
+    return isinstance(e, Iamport.HttpError) and (e.code or 0) >= 500
+
+
+class CircuitBreaker:
+    """
+    최근 window_size번의 포트원 호출 중 장애 비율이 failure_rate 이상이면 서킷을 열고,
+    reset_timeout초 동안은 포트원을 호출하지 않고 바로 PortoneUnavailableError를 발생시킨다.
+    reset_timeout이 지나면 한 번만 시험 호출(half-open)해 성공하면 닫고, 실패하면 다시 연다.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window_size=20, reset_timeout=30):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.result_list = deque(maxlen=window_size)  # 실패하면 True
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                return
+        raise PortoneUnavailableError("서킷 브레이커가 열려 있습니다.")
+
+    def record_success(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.result_list.clear()
+            self.result_list.append(False)
+
+    def record_failure(self):
+        with self.lock:
+            self.result_list.append(True)
+            if self.state == self.HALF_OPEN or (
+                len(self.result_list) >= self.min_calls
+                and sum(self.result_list) / len(self.result_list) >= self.failure_rate
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def open(self):
+        with self.lock:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+
+def get_retry_delay(attempt) -> float:
+    # 동시에 실패한 요청들이 같은 시각에 재시도하지 않도록 full jitter 지수 백오프
+    return random.uniform(0, settings.PORTONE_RETRY_BACKOFF * 2**attempt)
+
+
+class TokenCache:
+    """포트원 액세스 토큰. 동기/비동기 클라이언트가 같은 토큰을 만료 직전까지 재사용하도록 공유"""
+
+    def __init__(self):
+        self.token = None
+        self.expired_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if (
+                self.token is None
+                or time.monotonic() >= self.expired_at - TOKEN_EXPIRE_MARGIN
+            ):
+                return None
+            return self.token
+
+    def set(self, token, expired_at):
+        with self.lock:
+            self.token = token
+            self.expired_at = expired_at
+
+    def invalidate(self):
+        self.set(None, 0.0)
+
+
+class TimeoutSession(requests.Session):
+    """timeout을 지정하지 않은 요청에 기본 timeout을 적용 (Iamport는 timeout 없이 요청)"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+class PortoneClient(Iamport):
+    """
+    프로세스 내에서 공유하는 포트원 API 클라이언트.
+    Iamport는 API 호출마다 /users/getToken을 호출하므로, 발급받은 액세스 토큰을
+    만료 직전까지 재사용하고 커넥션 풀을 유지해 TCP/TLS 연결을 재사용한다.
+    """
+
+    def __init__(
+        self,
+        imp_key,
+        imp_secret,
+        imp_url=IAMPORT_API_URL,
+        pool_maxsize=10,
+        timeout=None,
+        circuit_breaker=None,
+        token_cache=None,
+    ):
+        super().__init__(imp_key=imp_key, imp_secret=imp_secret, imp_url=imp_url)
+        # 재시도는 find만 _call에서 처리 (어댑터에서 재시도하면 결제 취소 요청도 재전송될 수 있음)
+        self.requests_session = TimeoutSession(timeout)
+        adapter = HTTPAdapter(
+            max_retries=0, pool_connections=1, pool_maxsize=pool_maxsize
+        )
+        self.requests_session.mount("https://", adapter)
+        self.requests_session.mount("http://", adapter)
+
+        self.token_cache = token_cache or TokenCache()
+        self._token_lock = threading.Lock()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+    def _request_token(self):
+        url = "{}users/getToken".format(self.imp_url)
+        payload = {"imp_key": self.imp_key, "imp_secret": self.imp_secret}
+        with observe_portone("get_token"):
+            response = self.requests_session.post(
+                url,
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(payload),
+            )
+            result = self.get_response(response)
+        # expired_at은 포트원 서버 시각 기준이므로 남은 시간만 로컬 시각에 더함
+        expires_in = result["expired_at"] - result["now"]
+        return result["access_token"], time.monotonic() + expires_in
+
+    def _get_token(self):
+        token = self.token_cache.get()
+        if token is None:
+            # 여러 스레드가 동시에 토큰을 발급받지 않도록 잠근 뒤 다시 확인
+            with self._token_lock:
+                token = self.token_cache.get()
+                if token is None:
+                    token, expired_at = self._request_token()
+                    self.token_cache.set(token, expired_at)
+        return token
+
+    def invalidate_token(self):
+        self.token_cache.invalidate()
+
+    def _retry_on_unauthorized(self, method, *args, **kwargs):
+        # 캐시된 토큰이 포트원에서 먼저 만료된 경우 한 번만 새 토큰으로 재시도
+        try:
+            return method(*args, **kwargs)
+        except Iamport.HttpError as e:
+            if e.code != 401:
+                raise
+            self.invalidate_token()
+            return method(*args, **kwargs)
+
+    def _get(self, url, payload=None):
+        return self._retry_on_unauthorized(super()._get, url, payload)
+
+    def _post(self, url, payload=None):
+        return self._retry_on_unauthorized(super()._post, url, payload)
+
+    def _delete(self, url):
+        return self._retry_on_unauthorized(super()._delete, url)
+
+    def _call(self, operation, func, retries=0):
+        """
+        서킷 브레이커를 확인하고 포트원을 호출한다. 포트원 장애이면 retries번까지 재시도한 뒤
+        PortoneUnavailableError를 발생시킨다.
+        """
+        for attempt in range(retries + 1):
+            try:
+                self.circuit_breaker.before_call()
+            except PortoneUnavailableError as e:
+                PORTONE_REQUEST_ERRORS.labels(operation, type(e).__name__).inc()
+                raise
+            try:
+                with observe_portone(operation):
+                    result = func()
+            except Exception as e:
+                if not is_unavailable_error(e):
+                    # 결제 없음 등 응답 오류는 포트원이 정상 응답한 것
+                    self.circuit_breaker.record_success()
+                    raise
+                self.circuit_breaker.record_failure()
+                if attempt == retries:
+                    raise PortoneUnavailableError(str(e)) from e
+                time.sleep(get_retry_delay(attempt))
+            else:
+                self.circuit_breaker.record_success()
+                return result
+
+    def find(self, **kwargs):
+        # 조회는 여러 번 호출해도 결과가 같으므로 재시도
+        return self._call(
+            "find",
+            partial(super().find, **kwargs),
+            retries=settings.PORTONE_FIND_RETRIES,
+        )
+
+    def cancel(self, reason, **kwargs):
+        return self._call("cancel", partial(super().cancel, reason, **kwargs))
+
+
+class AsyncPortoneClient:
+    """
+    asyncio 기반 포트원 API 클라이언트. ASGI 환경에서 포트원 응답을 기다리는 동안
+    워커 스레드를 점유하지 않도록 조회/취소/토큰 발급만 비동기로 구현한다.
+    예외는 동기 클라이언트와 같은 Iamport.ResponseError, Iamport.HttpError를 사용한다.
+
+    httpx.AsyncClient는 생성된 이벤트 루프에 묶이고, WSGI에서는 async_to_sync가 호출마다
+    새 루프를 만들므로 요청마다 async with로 열고 닫는다. 토큰은 TokenCache로 동기 클라이언트와 공유한다.
+    """
+
+    ResponseError = Iamport.ResponseError
+    HttpError = Iamport.HttpError
+
+    def __init__(
+        self,
+        imp_key,
+        imp_secret,
+        imp_url=IAMPORT_API_URL,
+        timeout=None,
+        circuit_breaker=None,
+        token_cache=None,
+    ):
+        self.imp_key = imp_key
+        self.imp_secret = imp_secret
+        self.imp_url = imp_url
+        connect_timeout, read_timeout = timeout or (None, None)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        # 요청마다 클라이언트를 만들 때 인증서 번들을 다시 읽지 않도록 SSL 컨텍스트는 공유
+        self.ssl_context = httpx.create_ssl_context()
+        self.token_cache = token_cache or TokenCache()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+    def make_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=self.timeout, verify=self.ssl_context)
+
+    @staticmethod
+    def get_response(response: httpx.Response):
+        if response.status_code != httpx.codes.OK:
+            raise Iamport.HttpError(response.status_code, response.reason_phrase)
+        result = response.json()
+        if result["code"] != 0:
+            raise Iamport.ResponseError(result.get("code"), result.get("message"))
+        return result.get("response")
+
+    async def _request_token(self, http_client: httpx.AsyncClient):
+        url = "{}users/getToken".format(self.imp_url)
+        payload = {"imp_key": self.imp_key, "imp_secret": self.imp_secret}
+        with observe_portone("get_token"):
+            response = await http_client.post(url, json=payload)
+            result = self.get_response(response)
+        expires_in = result["expired_at"] - result["now"]
+        return result["access_token"], time.monotonic() + expires_in
+
+    async def _get_token(self, http_client: httpx.AsyncClient):
+        token = self.token_cache.get()
+        if token is None:
+            # asyncio.Lock은 이벤트 루프에 묶이므로 잠그지 않음 (동시에 만료되면 여러 번 발급받을 수 있음)
+            token, expired_at = await self._request_token(http_client)
+            self.token_cache.set(token, expired_at)
+        return token
+
+    def invalidate_token(self):
+        self.token_cache.invalidate()
+
+    async def _request(self, method, url, **kwargs):
+        async with self.make_http_client() as http_client:
+            for retry in (False, True):
+                headers = {"Authorization": await self._get_token(http_client)}
+                response = await http_client.request(
+                    method, url, headers=headers, **kwargs
+                )
+                if response.status_code == httpx.codes.UNAUTHORIZED and not retry:
+                    self.invalidate_token()
+                    continue
+                return self.get_response(response)
+
+    async def _call(self, operation, func, retries=0):
+        """PortoneClient._call과 같고, 재시도 대기 중에는 이벤트 루프를 점유하지 않음"""
+        for attempt in range(retries + 1):
+            try:
+                self.circuit_breaker.before_call()
+            except PortoneUnavailableError as e:
+                PORTONE_REQUEST_ERRORS.labels(operation, type(e).__name__).inc()
+                raise
+            try:
+                with observe_portone(operation):
+                    result = await func()
+            except Exception as e:
+                if not is_unavailable_error(e):
+                    self.circuit_breaker.record_success()
+                    raise
+                self.circuit_breaker.record_failure()
+                if attempt == retries:
+                    raise PortoneUnavailableError(str(e)) from e
+                await asyncio.sleep(get_retry_delay(attempt))
+            else:
+                self.circuit_breaker.record_success()
+                return result
+
+    async def find(self, **kwargs):
+        merchant_uid = kwargs.get("merchant_uid")
+        if merchant_uid:
+            url = "{}payments/find/{}".format(self.imp_url, merchant_uid)
+        else:
+            try:
+                imp_uid = kwargs["imp_uid"]
+            except KeyError:
+                raise KeyError("merchant_uid or imp_uid is required")
+            url = "{}payments/{}".format(self.imp_url, imp_uid)
+        return await self._call(
+            "find",
+            partial(self._request, "GET", url),
+            retries=settings.PORTONE_FIND_RETRIES,
+        )
+
+    async def cancel(self, reason, **kwargs):
+        payload = {"reason": reason, **kwargs}
+        if not payload.get("imp_uid") and not payload.get("merchant_uid"):
+            raise KeyError("merchant_uid or imp_uid is required")
+        url = "{}payments/cancel".format(self.imp_url)
+        return await self._call(
+            "cancel", partial(self._request, "POST", url, json=payload)
+        )
+
+    @staticmethod
+    def is_paid(amount, response) -> bool:
+        return response.get("status") == "paid" and response.get("amount") == amount
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# 동기/비동기 클라이언트가 포트원 장애 상태를 공유하도록 프로세스에 하나만 생성
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+_async_client = None
+_async_client_lock = threading.Lock()
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_portone_client() -> PortoneClient:
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PortoneClient(
+                    imp_key=settings.PORTONE_API_KEY,
+                    imp_secret=settings.PORTONE_API_SECRET,
+                    imp_url=settings.PORTONE_API_URL,
+                    timeout=get_timeout(),
+                    circuit_breaker=get_circuit_breaker(),
+                    token_cache=get_token_cache(),
+                )
+    return _client
+
+
+def get_timeout():
+    return (settings.PORTONE_CONNECT_TIMEOUT, settings.PORTONE_READ_TIMEOUT)
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(
+                    failure_rate=settings.PORTONE_CIRCUIT_FAILURE_RATE,
+                    min_calls=settings.PORTONE_CIRCUIT_MIN_CALLS,
+                    window_size=settings.PORTONE_CIRCUIT_WINDOW_SIZE,
+                    reset_timeout=settings.PORTONE_CIRCUIT_RESET_TIMEOUT,
+                )
+    return _circuit_breaker
+
+
+def get_token_cache() -> TokenCache:
+    global _token_cache
+
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = TokenCache()
+    return _token_cache
+
+
+def get_async_portone_client() -> AsyncPortoneClient:
+    global _async_client
+
+    if _async_client is None:
+        with _async_client_lock:
+            if _async_client is None:
+                _async_client = AsyncPortoneClient(
+                    imp_key=settings.PORTONE_API_KEY,
+                    imp_secret=settings.PORTONE_API_SECRET,
+                    imp_url=settings.PORTONE_API_URL,
+                    timeout=get_timeout(),
+                    circuit_breaker=get_circuit_breaker(),
+                    token_cache=get_token_cache(),
+                )
+    return _async_client
+
+
+@receiver(setting_changed)
+def reset_portone_client(*, setting, **kwargs):
+    global _client, _async_client, _circuit_breaker, _token_cache
+
+    if setting.startswith("PORTONE_"):
+        with _client_lock:
+            _client = None
+        with _async_client_lock:
+            _async_client = None
+        with _circuit_breaker_lock:
+            _circuit_breaker = None
+        with _token_cache_lock:
+            _token_cache = None
@@ -0,0 +1,121 @@
+"""
+요청마다 실행된 SQL 쿼리 수와 DB 시간을 기록하고, URL 이름별 쿼리 예산과 비교합니다.
+
+- QueryBudgetMiddleware: 응답에 query_count, query_time 속성과 X-Query-Count, X-Query-Time 헤더를
+  추가하고, mall/urls.py의 QUERY_BUDGET_DICT에 지정한 예산을 넘으면 경고 로그를 남깁니다.
+- QueryBudgetTestMixin: 테스트에서 응답이 예산을 넘으면 실패하도록 검사합니다.
+
+세션/인증 미들웨어의 쿼리도 포함하도록 MIDDLEWARE 맨 앞에 지정합니다.
+DB 시간과 쿼리 수가 외부에 노출되지 않도록 QUERY_BUDGET_ENABLED 설정(기본값 DEBUG)이 켜져 있을 때만 동작합니다.
+비동기 뷰에서 sync_to_async(thread_sensitive=False)로 실행한 쿼리는 다른 스레드의 연결을 사용하므로
+집계되지 않습니다.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+
+
+def enter_query_stats(stack, query_stats):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(query_stats))
+
+
+def get_query_budget(url_name):
+    # mall.urls가 views를 import하므로 미들웨어 로딩 시점이 아닌 요청 시점에 import
+    from mall.urls import QUERY_BUDGET_DICT
+
+    return QUERY_BUDGET_DICT.get(url_name)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # 비동기 뷰가 스레드로 감싸지지 않도록 비동기 체인에서는 코루틴으로 동작
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        query_stats = QueryStats()
+        with ExitStack() as stack:
+            enter_query_stats(stack, query_stats)
+            response = self.get_response(request)
+        return self.process_response(request, response, query_stats)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return await self.get_response(request)
+
+        # DB 연결은 스레드별이므로 쿼리가 실행되는 sync_to_async(thread_sensitive=True) 스레드에서 등록
+        query_stats = QueryStats()
+        stack = ExitStack()
+        await sync_to_async(enter_query_stats)(stack, query_stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.process_response(request, response, query_stats)
+
+    def process_response(self, request, response, query_stats):
+        response.query_count = query_stats.count
+        response.query_time = query_stats.time
+        response["X-Query-Count"] = str(query_stats.count)
+        response["X-Query-Time"] = f"{query_stats.time * 1000:.1f}ms"
+
+        resolver_match = getattr(request, "resolver_match", None)
+        url_name = resolver_match.url_name if resolver_match else None
+        budget = get_query_budget(url_name)
+        if budget is not None and query_stats.count > budget:
+            logger.warning(
+                "쿼리 예산 초과: %s %s쿼리 (예산 %s, %.1fms)",
+                url_name,
+                query_stats.count,
+                budget,
+                query_stats.time * 1000,
+            )
+        return response
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase와 함께 상속해 self.client 응답이 URL 이름별 쿼리 예산 이내인지 검사
+    (테스트는 DEBUG=False로 실행되므로 QUERY_BUDGET_ENABLED=True로 지정)
+    """
+
+    def assertQueryBudget(self, response):
+        url_name = response.resolver_match.url_name
+        budget = get_query_budget(url_name)
+        self.assertIsNotNone(budget, f"{url_name}의 쿼리 예산이 지정되지 않았습니다.")
+        self.assertLessEqual(
+            response.query_count,
+            budget,
+            f"{url_name}: 쿼리 {response.query_count}번 실행 (예산 {budget}번)",
+        )
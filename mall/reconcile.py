@@ -0,0 +1,169 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, List
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from iamport import Iamport
+
+from mall.models import (
+    OUT_OF_STOCK_CANCEL_REASON,
+    Order,
+    OrderPayment,
+    OutOfStockError,
+    PortoneResponse,
+)
+from mall.portone import get_portone_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReconcileResult:
+    total: int = 0
+    changed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    # 포트원에서 결제 준비(ready) 상태이거나 결제내역이 없는 결제 (조회한 경우만)
+    unpaid_pk_list: List[int] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """초당 처리한 결제 수"""
+        if self.elapsed == 0:
+            return 0.0
+        return self.total / self.elapsed
+
+
+def fetch_payment(payment: OrderPayment):
+    return get_portone_client().find(merchant_uid=payment.merchant_uid)
+
+
+def cancel_payment(payment: OrderPayment, reason=""):
+    client = get_portone_client()
+    try:
+        return client.cancel(reason=reason, merchant_uid=payment.merchant_uid)
+    except Iamport.ResponseError:
+        # 이미 취소되었거나 결제되지 않은 건은 현재 상태를 조회해 반영 (AbstractPortonePayment.cancel과 동일)
+        return client.find(merchant_uid=payment.merchant_uid)
+
+
+def is_not_found(e: Exception) -> bool:
+    """포트원이 결제내역이 없다고 응답했는지 (존재하지 않는 결제정보는 HTTP 404로 응답)"""
+    return isinstance(e, Iamport.ResponseError) or (
+        isinstance(e, Iamport.HttpError) and e.code == 404
+    )
+
+
+def chunked(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def reconcile_payments(
+    payment_qs: QuerySet[OrderPayment],
+    cancel=False,
+    reason="",
+    max_workers=8,
+    batch_size=100,
+    dry_run=False,
+) -> ReconcileResult:
+    """
+    결제 목록을 포트원과 동시에 조회(cancel=True면 취소)하고, 결과를 배치 단위로 일괄 저장한다.
+    결제마다 OrderPayment.update()를 호출하는 것과 같은 상태 전이를 적용한다.
+    결제 상태가 바뀐 결제만 저장하고, 그 응답 원본을 PortoneResponse에 추가한다.
+    """
+    result = ReconcileResult()
+    started = time.monotonic()
+
+    def call_portone(payment):
+        try:
+            if cancel:
+                return cancel_payment(payment, reason=reason)
+            return fetch_payment(payment)
+        except (Iamport.ResponseError, Iamport.HttpError) as e:
+            logger.warning("포트원 결제내역 조회 실패 (%s): %s", payment.merchant_uid, e)
+            return e
+
+    # 처리 도중 결제가 삭제/수정되므로 대상 pk를 먼저 확정하고 배치마다 다시 조회
+    payment_pk_list = list(payment_qs.order_by("pk").values_list("pk", flat=True))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pk_list in chunked(payment_pk_list, batch_size):
+            payment_list = list(
+                OrderPayment.objects.filter(pk__in=pk_list).order_by("pk")
+            )
+            response_list = list(executor.map(call_portone, payment_list))
+
+            changed_list = []
+            for payment, response in zip(payment_list, response_list):
+                result.total += 1
+                if isinstance(response, Exception):
+                    result.failed += 1
+                    # 결제내역이 없다는 응답만 미결제로 보고, 그 외 오류는 상태를 알 수 없으므로 제외
+                    if not cancel and is_not_found(response):
+                        result.unpaid_pk_list.append(payment.pk)
+                    continue
+                if not cancel and response["status"] == OrderPayment.PayStatus.READY:
+                    result.unpaid_pk_list.append(payment.pk)
+                if not payment.is_changed_by(response):
+                    continue
+                payment.apply_response(response)
+                changed_list.append(payment)
+
+            result.changed += len(changed_list)
+            if changed_list and not dry_run:
+                out_of_stock_list = save_payment_list(changed_list)
+                # 재고가 부족해 결제 완료로 변경하지 못한 결제는 트랜잭션 밖에서 취소 (OrderPayment.update와 동일)
+                for payment in out_of_stock_list:
+                    payment.cancel(reason=OUT_OF_STOCK_CANCEL_REASON)
+
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+@transaction.atomic
+def save_payment_list(payment_list: List[OrderPayment]) -> List[OrderPayment]:
+    """결제 상태를 일괄 저장하고, 재고가 부족해 주문을 결제 완료로 변경하지 못한 결제 목록을 반환"""
+    now = timezone.now()
+    for payment in payment_list:
+        # bulk_update는 auto_now 필드를 갱신하지 않음
+        payment.updated_at = now
+    OrderPayment.objects.bulk_update(
+        payment_list, ["pay_status", "is_paid_ok", "updated_at"]
+    )
+    PortoneResponse.objects.bulk_create(
+        PortoneResponse.make(payment) for payment in payment_list
+    )
+
+    # 주문마다 조건부 UPDATE 1번으로 상태를 변경하고, 실제로 변경된 주문만 후속 처리
+    # (재고 반환/재예약과 매출 집계는 transition_by_pk에서 처리)
+    paid_order_pk_list = []
+    paid_payment_pk_list = []
+    out_of_stock_list = []
+    for payment in payment_list:
+        order_status = payment.get_order_status()
+        if order_status is None:
+            continue
+        try:
+            if not Order.transition_by_pk(payment.order_id, order_status, now=now):
+                continue
+        except OutOfStockError:
+            logger.warning("재고 부족으로 결제 취소 (order=%s)", payment.order_id)
+            out_of_stock_list.append(payment)
+            continue
+        if order_status == Order.Status.PAID:
+            paid_order_pk_list.append(payment.order_id)
+            paid_payment_pk_list.append(payment.pk)
+
+    if paid_payment_pk_list:
+        # 결제 완료된 주문의 다른 결제 시도 삭제 (OrderPayment.update와 동일)
+        OrderPayment.objects.filter(order_id__in=paid_order_pk_list).exclude(
+            pk__in=paid_payment_pk_list
+        ).delete()
+    return out_of_stock_list
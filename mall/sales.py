@@ -0,0 +1,187 @@
+"""
+일별 매출 집계(DailySales, DailyProductSales, DailyCategorySales) 재계산.
+
+평소에는 주문 상태가 바뀔 때 Order.transition_by_pk가 증분 반영하지만, 관리자 화면에서 주문 상태를
+직접 수정하는 등 상태 전이를 거치지 않은 변경은 반영되지 않으므로 rebuild_sales 명령으로 다시 계산합니다.
+주문을 pk 범위로 나누어 조회하고, 배치마다 NumPy로 집계 키별 합계를 구해 누적합니다.
+"""
+
+import datetime
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from mall.models import (
+    DailyCategorySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderedProduct,
+)
+
+
+@dataclass
+class RebuildSalesResult:
+    order_count: int = 0
+    line_count: int = 0
+    row_count: int = 0
+    elapsed: float = 0.0
+
+
+def aggregate(key_array: np.ndarray, order_array, quantity_array, amount_array):
+    """
+    집계 키(행마다 1줄인 2차원 배열)별 (주문 수, 수량, 매출) 합계.
+    주문 수는 같은 키 안에서 중복되지 않는 주문 pk 수입니다.
+    """
+    key_list, inverse = np.unique(key_array, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    quantity_sum = np.zeros(len(key_list), dtype=np.int64)
+    amount_sum = np.zeros(len(key_list), dtype=np.int64)
+    np.add.at(quantity_sum, inverse, quantity_array)
+    np.add.at(amount_sum, inverse, amount_array)
+
+    # (키, 주문) 쌍의 중복을 제거한 뒤 키별로 센 값이 주문 수
+    order_pair_array = np.unique(np.column_stack([inverse, order_array]), axis=0)
+    order_count = np.bincount(order_pair_array[:, 0], minlength=len(key_list))
+
+    return {
+        tuple(key.tolist()): (int(count), int(quantity), int(amount))
+        for key, count, quantity, amount in zip(
+            key_list, order_count, quantity_sum, amount_sum
+        )
+    }
+
+
+def merge(total_dict: Dict[tuple, list], batch_dict: Dict[tuple, tuple]):
+    # 배치 사이에는 같은 주문이 없으므로 주문 수도 그대로 더함
+    for key, value in batch_dict.items():
+        total = total_dict[key]
+        for i, v in enumerate(value):
+            total[i] += v
+
+
+def rebuild_sales(
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    batch_size=10000,
+) -> RebuildSalesResult:
+    """
+    주문일이 start_date ~ end_date(포함)인 매출 집계를 주문 상품에서 다시 계산해 교체합니다.
+    재계산 도중 결제된 주문은 누락될 수 있으므로 주문이 적은 시간에 실행합니다.
+    """
+    result = RebuildSalesResult()
+    started = time.monotonic()
+
+    order_qs = Order.objects.filter(status__in=Order.SALES_STATUS_LIST)
+    date_filter = {}
+    if start_date:
+        date_filter["date__gte"] = start_date
+        order_qs = order_qs.filter(created_at__gte=local_datetime(start_date))
+    if end_date:
+        date_filter["date__lte"] = end_date
+        order_qs = order_qs.filter(
+            created_at__lt=local_datetime(end_date + datetime.timedelta(days=1))
+        )
+
+    sales_dict = defaultdict(lambda: [0, 0, 0])
+    product_sales_dict = defaultdict(lambda: [0, 0, 0])
+    category_sales_dict = defaultdict(lambda: [0, 0, 0])
+
+    pk_range = order_qs.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+    if pk_range["min_pk"] is not None:
+        # 한 주문의 주문 상품이 여러 배치에 나뉘지 않도록 주문 pk 범위로 나누어 조회
+        for min_pk in range(pk_range["min_pk"], pk_range["max_pk"] + 1, batch_size):
+            line_list = list(
+                OrderedProduct.objects.filter(
+                    order__in=order_qs.filter(
+                        pk__gte=min_pk, pk__lt=min_pk + batch_size
+                    )
+                ).values_list(
+                    "order_id",
+                    TruncDate("order__created_at"),
+                    "product_id",
+                    "category_id",
+                    "price",
+                    "quantity",
+                )
+            )
+            if not line_list:
+                continue
+            result.line_count += len(line_list)
+
+            order_array, date_list, product_array, category_array, price, quantity = (
+                zip(*line_list)
+            )
+            order_array = np.array(order_array, dtype=np.int64)
+            date_array = np.fromiter(
+                (date.toordinal() for date in date_list),
+                dtype=np.int64,
+                count=len(line_list),
+            )
+            product_array = np.array(product_array, dtype=np.int64)
+            # 분류가 없는 주문 상품은 분류별 집계에서 제외
+            has_category = np.array([pk is not None for pk in category_array])
+            category_array = np.array(
+                [pk or 0 for pk in category_array], dtype=np.int64
+            )
+            quantity_array = np.array(quantity, dtype=np.int64)
+            amount_array = np.array(price, dtype=np.int64) * quantity_array
+            result.order_count += len(np.unique(order_array))
+
+            for total_dict, key_array in [
+                (sales_dict, date_array.reshape(-1, 1)),
+                (product_sales_dict, np.column_stack([date_array, product_array])),
+            ]:
+                merge(
+                    total_dict,
+                    aggregate(key_array, order_array, quantity_array, amount_array),
+                )
+            if has_category.any():
+                merge(
+                    category_sales_dict,
+                    aggregate(
+                        np.column_stack([date_array, category_array])[has_category],
+                        order_array[has_category],
+                        quantity_array[has_category],
+                        amount_array[has_category],
+                    ),
+                )
+
+    with transaction.atomic():
+        for model_cls, total_dict in [
+            (DailySales, sales_dict),
+            (DailyProductSales, product_sales_dict),
+            (DailyCategorySales, category_sales_dict),
+        ]:
+            model_cls.objects.filter(**date_filter).delete()
+            row_list = []
+            for key, (order_count, quantity, amount) in total_dict.items():
+                key_dict = dict(zip(model_cls.KEY_FIELD_LIST, key))
+                key_dict["date"] = datetime.date.fromordinal(key_dict["date"])
+                for name in model_cls.KEY_FIELD_LIST[1:]:
+                    key_dict[f"{name}_id"] = key_dict.pop(name)
+                row_list.append(
+                    model_cls(
+                        **key_dict,
+                        order_count=order_count,
+                        quantity=quantity,
+                        amount=amount,
+                    )
+                )
+            model_cls.objects.bulk_create(row_list, batch_size=1000)
+            result.row_count += len(row_list)
+
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def local_datetime(date: datetime.date) -> datetime.datetime:
+    """현재 시간대 기준 date 0시 (TruncDate와 같은 기준으로 주문일 범위를 지정)"""
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
@@ -0,0 +1,157 @@
+"""
+상품 검색 백엔드.
+
+- SQLite: FTS5 trigram 토크나이저를 사용하는 external content 테이블(mall_product_fts)과
+  mall_product 트리거로 색인을 유지합니다. 트리거로 동기화하므로 save()뿐 아니라
+  bulk_create, QuerySet.update 등 일괄 처리에도 색인이 갱신됩니다.
+- PostgreSQL: pg_trgm GIN 인덱스로 name/description의 icontains 검색을 인덱스로 처리합니다.
+- 그 외 DB이거나 검색어가 trigram 최소 길이(3자)보다 짧으면 icontains로 검색합니다.
+"""
+
+import sqlite3
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "mall_product_fts"
+
+# trigram 토크나이저는 3글자 이상의 검색어만 색인으로 찾을 수 있음
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+SQLITE_FTS_SQL_LIST = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='mall_product', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON mall_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON mall_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description
+    ON mall_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+POSTGRESQL_TRGM_SQL_LIST = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Django의 icontains는 UPPER("name"::text) LIKE UPPER(%s)로 변환되므로 같은 식으로 색인
+    "CREATE INDEX IF NOT EXISTS mall_product_name_trgm "
+    "ON mall_product USING gin (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS mall_product_description_trgm "
+    "ON mall_product USING gin (UPPER(description::text) gin_trgm_ops)",
+]
+
+
+def is_fts_available(conn=connection) -> bool:
+    return conn.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def install_search_index(conn=connection):
+    """검색 색인을 생성합니다. 이미 있으면 아무 것도 하지 않습니다."""
+    if "mall_product" not in conn.introspection.table_names():
+        return
+
+    if is_fts_available(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            is_created = cursor.fetchone() is None
+            for sql in SQLITE_FTS_SQL_LIST:
+                cursor.execute(sql)
+        if is_created:
+            rebuild_search_index(conn)
+
+    elif conn.vendor == "postgresql":
+        with conn.cursor() as cursor:
+            for sql in POSTGRESQL_TRGM_SQL_LIST:
+                cursor.execute(sql)
+
+
+def uninstall_search_index(conn=connection):
+    if conn.vendor == "sqlite":
+        with conn.cursor() as cursor:
+            for suffix in ["ai", "ad", "au"]:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    elif conn.vendor == "postgresql":
+        with conn.cursor() as cursor:
+            cursor.execute("DROP INDEX IF EXISTS mall_product_name_trgm")
+            cursor.execute("DROP INDEX IF EXISTS mall_product_description_trgm")
+
+
+def rebuild_search_index(conn=connection):
+    """mall_product 테이블 내용으로 FTS 색인을 다시 만듭니다. (SQLite 전용)"""
+    if is_fts_available(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def search_products(qs: QuerySet, query: str) -> QuerySet:
+    """name, description에서 query를 검색해 관련도 순으로 정렬한 QuerySet을 반환합니다."""
+    query = query.strip()
+    if not query:
+        return qs
+
+    if len(query) >= MIN_TRIGRAM_QUERY_LENGTH:
+        if is_fts_available():
+            return _search_sqlite_fts(qs, query)
+        if connection.vendor == "postgresql":
+            return _search_postgresql_trgm(qs, query)
+
+    return qs.filter(Q(name__icontains=query) | Q(description__icontains=query))
+
+
+def _search_sqlite_fts(qs: QuerySet, query: str) -> QuerySet:
+    # 검색어 전체를 하나의 구문으로 검색 (FTS5 쿼리 문법 문자를 그대로 검색하도록 이스케이프)
+    match = '"{}"'.format(query.replace('"', '""'))
+    db_table = qs.model._meta.db_table
+    return (
+        qs.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        )
+        .annotate(
+            # FTS5의 rank(bm25)는 관련도가 높을수록 작은 값
+            search_rank=RawSQL(
+                f"SELECT rank FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {db_table}.id",
+                [match],
+            )
+        )
+        .order_by("search_rank", "-pk")
+    )
+
+
+def _search_postgresql_trgm(qs: QuerySet, query: str) -> QuerySet:
+    # psycopg가 설치된 환경에서만 import 가능
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    return (
+        qs.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        .annotate(
+            search_rank=TrigramWordSimilarity(query, "name")
+            + TrigramWordSimilarity(query, "description")
+        )
+        .order_by("-search_rank", "-pk")
+    )
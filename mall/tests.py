@@ -1,3 +1,2161 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from PIL import Image
+from iamport import Iamport
+from prometheus_client import REGISTRY
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.http import HttpResponse
+from django.db import connection
+from django.test import (
+    LiveServerTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from mall.export import EXPORT_FIELD_DICT
+from mall.fake_portone import FakePortone
+from mall.management.commands.load_products import LocalSource
+from mall.metrics import MetricsMiddleware
+from mall.models import (
+    CartProduct,
+    Category,
+    DailyCategorySales,
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderPayment,
+    OrderedProduct,
+    OutOfStockError,
+    PortoneResponse,
+    Product,
+    ProductStock,
+)
+from mall.paginator import CountlessPaginator, EstimatedCountPaginator
+from mall.portone import (
+    AsyncPortoneClient,
+    PortoneClient,
+    PortoneUnavailableError,
+    get_async_portone_client,
+    get_portone_client,
+)
+from mall.query_budget import QueryBudgetMiddleware, QueryBudgetTestMixin
+from mall.sales import rebuild_sales
+from mall.search import search_products
+from mall_test.models import Payment
+
+
+def create_product(category, name="상품", price=1000, **kwargs):
+    return Product.objects.create(
+        category=category,
+        name=name,
+        price=price,
+        status=Product.Status.ACTIVE,
+        **kwargs,
+    )
+
+
+def create_order(user, product_list):
+    for product in product_list:
+        CartProduct.objects.create(user=user, product=product, quantity=1)
+    cart_product_qs = CartProduct.objects.filter(user=user)
+    return Order.create_from_cart(user=user, cart_product_ps=cart_product_qs)
+
+
+class FakePortoneMixin:
+    """FakePortone 서버를 띄우고 PORTONE_API_URL을 그 주소로 바꿉니다."""
+
+    fake_portone_latency = 0.0
+
+    def setUp(self):
+        super().setUp()
+        self.fake_portone = FakePortone(latency=self.fake_portone_latency).start()
+        self.addCleanup(self.fake_portone.stop)
+        settings_override = override_settings(PORTONE_API_URL=self.fake_portone.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class OrderNameTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품{i}") for i in range(3)
+        ]
+
+    def test_create_from_cart_stores_name(self):
+        order = create_order(self.user, self.product_list)
+        order.refresh_from_db()
+        self.assertEqual(order.product_count, 3)
+        self.assertEqual(order.name, "상품0 외 2건")
+
+    def test_create_from_cart_single_product(self):
+        order = create_order(self.user, self.product_list[:1])
+        self.assertEqual(order.name, "상품0")
+
+    def test_create_from_cart_clears_cart(self):
+        order = create_order(self.user, self.product_list)
+        self.assertFalse(CartProduct.objects.filter(user=self.user).exists())
+        ordered_product_list = list(order.orderedproduct_set.order_by("product_id"))
+        self.assertEqual(
+            [ordered_product.name for ordered_product in ordered_product_list],
+            ["상품0", "상품1", "상품2"],
+        )
+        self.assertIsNotNone(ordered_product_list[0].created_at)
+        self.assertEqual(order.total_amount, 3000)
+
+    def test_create_from_cart_query_count_is_flat(self):
+        def count_queries(size):
+            CartProduct.objects.bulk_create(
+                CartProduct(user=self.user, product=product, quantity=2)
+                for product in product_list[:size]
+            )
+            with CaptureQueriesContext(connection) as context:
+                order = Order.create_from_cart(
+                    user=self.user,
+                    cart_product_ps=CartProduct.objects.filter(user=self.user),
+                )
+            self.assertEqual(order.orderedproduct_set.count(), size)
+            self.assertEqual(order.total_amount, 1000 * 2 * size)
+            return len(context.captured_queries)
+
+        product_list = Product.objects.bulk_create(
+            Product(category=self.category, name=f"대량{i}", price=1000)
+            for i in range(500)
+        )
+        self.assertEqual(count_queries(1), count_queries(500))
+
+    def test_create_from_cart_snapshots_product(self):
+        order = create_order(self.user, self.product_list[:1])
+        # 주문 후 상품이 바뀌어도 주문 상품은 주문 시점의 값을 유지
+        Product.objects.filter(pk=self.product_list[0].pk).update(
+            name="변경", price=1, category=Category.objects.create(name="새 분류")
+        )
+        ordered_product = order.orderedproduct_set.get()
+        self.assertEqual(
+            (
+                ordered_product.product_id,
+                ordered_product.category_id,
+                ordered_product.name,
+                ordered_product.price,
+                ordered_product.quantity,
+            ),
+            (self.product_list[0].pk, self.category.pk, "상품0", 1000, 1),
+        )
+        self.assertEqual(ordered_product.created_at, ordered_product.updated_at)
+
+    def test_make_name_without_product(self):
+        self.assertEqual(Order.make_name(None, 0), "등록된 상품이 없습니다.")
+
+
+class OrderListQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            username="admin", password="password"
+        )
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품{i}") for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        # 관리자 목록의 전체 건수 캐시와 무관하게 비교
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url):
+        create_order(self.user, self.product_list)
+        num_queries = self.count_queries(url)
+
+        for _ in range(10):
+            create_order(self.user, self.product_list)
+        self.assertEqual(self.count_queries(url), num_queries)
+
+    def test_order_list(self):
+        self.assert_constant_queries(reverse("order_list"))
+
+    def test_admin_order_changelist(self):
+        self.assert_constant_queries(reverse("admin:mall_order_changelist"))
+
+    def test_admin_order_payment_changelist(self):
+        url = reverse("admin:mall_orderpayment_changelist")
+        OrderPayment.get_or_create_by_order(create_order(self.user, self.product_list))
+        num_queries = self.count_queries(url)
+
+        for _ in range(10):
+            order = create_order(self.user, self.product_list)
+            OrderPayment.get_or_create_by_order(order)
+        self.assertEqual(self.count_queries(url), num_queries)
+
+    def test_admin_cart_product_changelist(self):
+        url = reverse("admin:mall_cartproduct_changelist")
+        CartProduct.objects.create(
+            user=self.user, product=self.product_list[0], quantity=1
+        )
+        num_queries = self.count_queries(url)
+
+        for i in range(10):
+            user = User.objects.create_user(username=f"buyer{i}")
+            for product in self.product_list:
+                CartProduct.objects.create(user=user, product=product, quantity=2)
+        response = self.client.get(url)
+        self.assertEqual(self.count_queries(url), num_queries)
+        self.assertContains(response, "2000")  # 금액 = 가격 * 수량
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품{i}") for i in range(3)
+        ]
+        for _ in range(3):
+            create_order(cls.user, cls.product_list)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unfiltered_count_is_cached(self):
+        qs = Order.objects.order_by("-pk")
+        self.assertEqual(EstimatedCountPaginator(qs, 2).count, 3)
+
+        create_order(self.user, self.product_list)
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(qs, 2).count, 3)
+
+    def test_filtered_count_is_exact(self):
+        create_order(self.user, self.product_list[:1])
+        qs = Order.objects.filter(product_count=1).order_by("-pk")
+        self.assertEqual(EstimatedCountPaginator(qs, 2).count, 1)
+
+        create_order(self.user, self.product_list[:1])
+        self.assertEqual(EstimatedCountPaginator(qs, 2).count, 2)
+
+    def test_list_count(self):
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).num_pages, 2)
+
+
+def make_portone_response(response, status_code=200):
+    http_response = requests.Response()
+    http_response.status_code = status_code
+    http_response._content = json.dumps(
+        {"code": 0, "message": None, "response": response}
+    ).encode()
+    return http_response
+
+
+class FakePortoneSession:
+    """requests.Session.request를 대체해 포트원 API 호출을 기록한다."""
+
+    def __init__(self, payment_dict=None):
+        self.payment_dict = payment_dict or {}
+        self.url_list = []
+
+    def __call__(self, method, url, **kwargs):
+        self.url_list.append(url)
+        if url.endswith("users/getToken"):
+            now = int(time.time())
+            return make_portone_response(
+                {"access_token": "token", "now": now, "expired_at": now + 1800}
+            )
+        merchant_uid = url.rsplit("/", 1)[-1]
+        return make_portone_response(self.payment_dict[merchant_uid])
+
+
+@override_settings(PORTONE_API_URL="https://portone.test/")
+class PortoneClientTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, price=1000)
+
+    def test_token_is_cached(self):
+        client = PortoneClient("key", "secret", imp_url="https://portone.test/")
+        fake_session = FakePortoneSession(
+            {"a": {"status": "paid"}, "b": {"status": "ready"}}
+        )
+        with mock.patch.object(client.requests_session, "request", fake_session):
+            client.find(merchant_uid="a")
+            client.find(merchant_uid="b")
+
+        token_url_list = [u for u in fake_session.url_list if "getToken" in u]
+        self.assertEqual(len(token_url_list), 1)
+        self.assertEqual(len(fake_session.url_list), 3)
+
+    def test_shared_client(self):
+        self.assertIs(get_portone_client(), get_portone_client())
+
+    def test_order_check_single_http_call(self):
+        order = create_order(self.user, [self.product])
+        payment = OrderPayment.create_by_order(order)
+        fake_session = FakePortoneSession(
+            {payment.merchant_uid: {"status": "paid", "amount": 1000}}
+        )
+        client = get_portone_client()
+        self.client.force_login(self.user)
+
+        with mock.patch.object(client.requests_session, "request", fake_session):
+            client._get_token()
+            fake_session.url_list.clear()
+            self.client.get(reverse("order_check", args=[order.pk, payment.pk]))
+
+        self.assertEqual(len(fake_session.url_list), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PAID)
+
+
+class AsyncPortoneClientTest(FakePortoneMixin, TestCase):
+    fake_portone_latency = 0.2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, price=1000)
+
+    async def test_concurrent_find_with_slow_gateway(self):
+        for i in range(20):
+            self.fake_portone.add_payment(f"uid-{i}", amount=1000)
+        client = AsyncPortoneClient("key", "secret", imp_url=self.fake_portone.url)
+        # 토큰 발급을 제외하고 조회만 측정
+        await client.find(merchant_uid="uid-0")
+
+        started = time.monotonic()
+        response_list = await asyncio.gather(
+            *(client.find(merchant_uid=f"uid-{i}") for i in range(20))
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(all(r["status"] == "paid" for r in response_list))
+        # 순차 처리라면 20 * 0.2초가 걸리므로 동시에 대기하는지 확인
+        self.assertLess(elapsed, 2.0)
+
+    def test_token_shared_across_event_loops(self):
+        self.fake_portone.add_payment("uid", amount=1000)
+        get_portone_client().find(merchant_uid="uid")
+        # WSGI에서는 async_to_sync가 호출마다 새 이벤트 루프를 만듦
+        for _ in range(3):
+            response = async_to_sync(get_async_portone_client().find)(
+                merchant_uid="uid"
+            )
+            self.assertEqual(response["status"], "paid")
+
+        token_count = sum(
+            1 for _, path in self.fake_portone.request_log if "getToken" in path
+        )
+        self.assertEqual(token_count, 1)
+
+    async def test_cancel(self):
+        self.fake_portone.add_payment("uid", amount=1000)
+        client = get_async_portone_client()
+        response = await client.cancel(reason="test", merchant_uid="uid")
+        self.assertEqual(response["status"], "cancelled")
+
+        with self.assertRaises(AsyncPortoneClient.ResponseError):
+            await client.cancel(reason="test", merchant_uid="unknown")
+
+    def test_order_check_async(self):
+        order = create_order(self.user, [self.product])
+        payment = OrderPayment.create_by_order(order)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=1000)
+        self.client.force_login(self.user)
+
+        response = self.client.get(
+            reverse("order_check_async", args=[order.pk, payment.pk])
+        )
+
+        self.assertRedirects(response, order.get_absolute_url())
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PAID)
+
+    def test_order_check_async_requires_login(self):
+        order = create_order(self.user, [self.product])
+        payment = OrderPayment.create_by_order(order)
+        response = self.client.get(
+            reverse("order_check_async", args=[order.pk, payment.pk])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response.url)
+
+
+class ReconcilePaymentsTest(FakePortoneMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, price=1000)
+
+    def setUp(self):
+        super().setUp()
+        self.paid_order = create_order(self.user, [self.product])
+        self.paid_payment = OrderPayment.create_by_order(self.paid_order)
+        # 결제 완료 시 삭제되어야 하는 같은 주문의 다른 결제 시도
+        self.other_payment = OrderPayment.create_by_order(self.paid_order)
+        self.failed_order = create_order(self.user, [self.product])
+        self.failed_payment = OrderPayment.create_by_order(self.failed_order)
+        self.unknown_order = create_order(self.user, [self.product])
+        OrderPayment.create_by_order(self.unknown_order)
+
+        self.fake_portone.add_payment(self.paid_payment.merchant_uid, amount=1000)
+        self.fake_portone.add_payment(
+            self.failed_payment.merchant_uid, amount=1000, status="failed"
+        )
+        OrderPayment.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def test_reconcile(self):
+        out = StringIO()
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            call_command(
+                "reconcile_payments", "--workers=2", "--batch-size=2", stdout=out
+            )
+
+        self.assertIn("4건 조회", out.getvalue())
+        self.paid_order.refresh_from_db()
+        self.failed_order.refresh_from_db()
+        self.unknown_order.refresh_from_db()
+        self.assertEqual(self.paid_order.status, Order.Status.PAID)
+        self.assertEqual(self.failed_order.status, Order.Status.FAILED_PAYMEMT)
+        self.assertEqual(self.unknown_order.status, Order.Status.REQUESTED)
+        self.assertFalse(OrderPayment.objects.filter(pk=self.other_payment.pk).exists())
+
+        self.paid_payment.refresh_from_db()
+        self.assertTrue(self.paid_payment.is_paid_ok)
+        self.assertGreater(
+            self.paid_payment.updated_at, timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_dry_run(self):
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            call_command("reconcile_payments", "--dry-run", stdout=StringIO())
+
+        self.paid_order.refresh_from_db()
+        self.assertEqual(self.paid_order.status, Order.Status.REQUESTED)
+        self.assertEqual(OrderPayment.objects.filter(is_paid_ok=True).count(), 0)
+
+    def test_skip_recently_updated(self):
+        OrderPayment.objects.update(updated_at=timezone.now())
+        out = StringIO()
+        call_command("reconcile_payments", stdout=out)
+        self.assertIn("0건 조회", out.getvalue())
+
+    def test_admin_cancel_action(self):
+        admin_user = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_login(admin_user)
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            self.client.post(
+                reverse("admin:mall_order_changelist"),
+                {"action": "make_cancel", "_selected_action": [self.paid_order.pk]},
+            )
+
+        self.paid_order.refresh_from_db()
+        self.assertEqual(self.paid_order.status, Order.Status.CANCELLED)
+
+
+class PortoneWebhookTest(FakePortoneMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, price=1000)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+        self.order = create_order(self.user, [self.product])
+        self.payment = OrderPayment.create_by_order(self.order)
+        self.fake_portone.add_payment(self.payment.merchant_uid, amount=1000)
+
+    def post_webhook(self, merchant_uid, status="paid"):
+        return self.client.post(
+            reverse("portone_webhook"),
+            {"imp_uid": "imp_1", "merchant_uid": merchant_uid, "status": status},
+            content_type="application/json",
+        )
+
+    def find_count(self):
+        return sum(
+            1 for _, path in self.fake_portone.request_log if "/payments/find/" in path
+        )
+
+    def test_webhook_updates_order(self):
+        response = self.post_webhook(self.payment.merchant_uid)
+
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_duplicated_webhook(self):
+        self.post_webhook(self.payment.merchant_uid)
+        response = self.post_webhook(self.payment.merchant_uid)
+
+        self.assertEqual(response.json()["message"], "duplicated")
+        self.assertEqual(self.find_count(), 1)
+
+    def test_order_check_after_webhook(self):
+        self.post_webhook(self.payment.merchant_uid)
+        self.client.force_login(self.user)
+        self.client.get(reverse("order_check", args=[self.order.pk, self.payment.pk]))
+
+        self.assertEqual(self.find_count(), 1)
+
+    def test_mall_test_payment(self):
+        payment = Payment.objects.create(name="결제", amount=1000)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=1000)
+
+        self.post_webhook(payment.merchant_uid)
+
+        payment.refresh_from_db()
+        self.assertTrue(payment.is_paid_ok)
+
+    def test_unknown_payment(self):
+        self.assertEqual(self.post_webhook(uuid4().hex).status_code, 404)
+        self.assertEqual(self.post_webhook("invalid").status_code, 400)
+
+    def test_forged_status_does_not_block_real_webhook(self):
+        # 결제 전 위조된 paid 알림은 포트원에서 확인한 ready 상태로만 기록됨
+        self.fake_portone.add_payment(
+            self.payment.merchant_uid, amount=1000, status="ready"
+        )
+        self.post_webhook(self.payment.merchant_uid)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.REQUESTED)
+
+        self.fake_portone.add_payment(self.payment.merchant_uid, amount=1000)
+        response = self.post_webhook(self.payment.merchant_uid)
+        self.assertEqual(response.json()["message"], "ok")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_retry_after_unexpected_error(self):
+        with mock.patch.object(
+            OrderPayment, "update_by_webhook", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.post_webhook(self.payment.merchant_uid)
+
+        response = self.post_webhook(self.payment.merchant_uid)
+        self.assertEqual(response.json()["message"], "ok")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_concurrent_webhook(self):
+        cache.add(f"portone:webhook:{self.payment.uid.hex}:lock", True)
+        response = self.post_webhook(self.payment.merchant_uid)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.find_count(), 0)
+
+
+class CheckoutBenchmarkTest(FakePortoneMixin, LiveServerTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="분류")
+        create_product(category, price=1000)
+
+    def test_bench_checkout(self):
+        out = StringIO()
+        call_command(
+            "bench_checkout",
+            f"--base-url={self.live_server_url}/",
+            f"--portone-url={self.fake_portone.url}",
+            "--shoppers=1",
+            "--iterations=2",
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        for view_name in ["product_list", "order_pay", "order_check", "order_detail"]:
+            self.assertIn(view_name, output)
+        self.assertEqual(Order.objects.filter(status=Order.Status.PAID).count(), 2)
+
+
+class ProductSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="분류")
+        cls.laptop = create_product(cls.category, name="게이밍 노트북")
+        cls.bag = create_product(
+            cls.category, name="가방", description="노트북을 넣을 수 있는 가방"
+        )
+        cls.mouse = create_product(cls.category, name="무선 마우스")
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query))
+
+    def test_search_name_and_description(self):
+        self.assertEqual(self.search("노트북"), [self.laptop, self.bag])
+
+    def test_search_is_synced_on_save(self):
+        self.mouse.name = "노트북 마우스"
+        self.mouse.save()
+        self.assertIn(self.mouse, self.search("노트북"))
+
+        self.mouse.delete()
+        self.assertNotIn(self.mouse, self.search("노트북"))
+
+    def test_search_is_synced_on_bulk_operations(self):
+        Product.objects.bulk_create(
+            [Product(category=self.category, name="노트북 거치대", price=1000)]
+        )
+        Product.objects.filter(pk=self.laptop.pk).update(name="게이밍 데스크탑")
+
+        self.assertEqual([p.name for p in self.search("노트북")], ["노트북 거치대", "가방"])
+
+    def test_short_query(self):
+        self.assertEqual(self.search("마우"), [self.mouse])
+
+    def test_fts_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"노트북 OR'), [])
+
+    def test_product_list_query(self):
+        response = self.client.get(reverse("product_list"), {"query": "무선 마우"})
+        self.assertContains(response, "무선 마우스")
+        self.assertNotContains(response, "게이밍 노트북")
+
+
+class ProductListCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, name="무선 마우스")
+
+    def setUp(self):
+        cache.clear()
+
+    def get_product_list(self, **params):
+        return self.client.get(reverse("product_list"), params)
+
+    def test_cached_page_skips_queries(self):
+        self.get_product_list()
+        with self.assertNumQueries(0):
+            response = self.get_product_list()
+        self.assertContains(response, "무선 마우스")
+
+    def test_cache_is_keyed_by_query(self):
+        self.get_product_list()
+        response = self.get_product_list(query="키보드")
+        self.assertNotContains(response, "무선 마우스")
+
+    def test_invalidated_on_save_and_delete(self):
+        self.get_product_list()
+
+        self.product.name = "유선 마우스"
+        self.product.save()
+        self.assertContains(self.get_product_list(), "유선 마우스")
+
+        self.product.delete()
+        self.assertNotContains(self.get_product_list(), "유선 마우스")
+
+    def test_invalidated_on_category_save(self):
+        self.get_product_list()
+        self.category.name = "주변기기"
+        self.category.save()
+        self.assertContains(self.get_product_list(), "주변기기")
+
+    def test_invalidated_on_admin_make_active(self):
+        product = Product.objects.create(
+            category=self.category, name="키보드", price=1000
+        )
+        self.get_product_list()
+
+        admin_user = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_login(admin_user)
+        self.client.post(
+            reverse("admin:mall_product_changelist"),
+            {"action": "make_active", "_selected_action": [product.pk]},
+        )
+        self.client.logout()
+
+        self.assertContains(self.get_product_list(), "키보드")
+
+    def test_pagination_links_ignore_other_params(self):
+        for i in range(13):
+            create_product(self.category, name=f"상품 {i}")
+
+        self.get_product_list(utm_source="ad")
+        response = self.get_product_list()
+        self.assertNotContains(response, "utm_source")
+        self.assertContains(response, "?page=2")
+
+        response = self.get_product_list(query="상품", utm_source="ad")
+        self.assertNotContains(response, "utm_source")
+        self.assertContains(response, "?query=%EC%83%81%ED%92%88&page=2")
+
+
+class ProductListPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="분류")
+        for i in range(13):
+            create_product(cls.category, name=f"무선 마우스 {i}")
+
+    def setUp(self):
+        cache.clear()
+
+    def get_count_queries(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("product_list"), params)
+        count_sql_list = [
+            query["sql"]
+            for query in context.captured_queries
+            if "COUNT(" in query["sql"]
+        ]
+        return response, count_sql_list
+
+    def test_search_skips_count(self):
+        response, count_sql_list = self.get_count_queries(query="마우스")
+        self.assertEqual(count_sql_list, [])
+        # 다음 페이지가 있으면 다음 페이지 링크까지 표시
+        self.assertContains(response, "page=2")
+        self.assertNotContains(response, "page=3")
+
+        response, count_sql_list = self.get_count_queries(query="마우스", page=2)
+        self.assertEqual(count_sql_list, [])
+        self.assertContains(response, "무선 마우스")
+
+        response, _ = self.get_count_queries(query="마우스", page=3)
+        self.assertEqual(response.status_code, 404)
+
+    def test_listing_count_is_cached(self):
+        _, count_sql_list = self.get_count_queries()
+        self.assertEqual(len(count_sql_list), 1)
+
+        # 다른 페이지도 캐시된 건수를 사용
+        response, count_sql_list = self.get_count_queries(page=2)
+        self.assertEqual(count_sql_list, [])
+        self.assertContains(response, "무선 마우스")
+
+        # 상품이 바뀌면 카탈로그 버전이 올라가 다시 COUNT
+        create_product(self.category, name="유선 마우스")
+        _, count_sql_list = self.get_count_queries(page=2)
+        self.assertEqual(len(count_sql_list), 1)
+
+    def test_countless_paginator(self):
+        paginator = CountlessPaginator(list(range(25)), 10)
+        page = paginator.page(2)
+        self.assertEqual(list(page), list(range(10, 20)))
+        self.assertTrue(page.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+
+        page = paginator.page(3)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.end_index(), 25)
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+def make_image_file(name="photo.png", size=(600, 400)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color="red").save(buffer, format="PNG")
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class ProductThumbnailTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="분류")
+
+    def setUp(self):
+        # sorl-thumbnail kvstore가 캐시에 남긴 썸네일 정보를 비움
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.thumbnail_dir = os.path.join(media_root, "cache")
+
+    def thumbnail_count(self):
+        return sum(len(files) for _, _, files in os.walk(self.thumbnail_dir))
+
+    def test_thumbnail_generated_on_photo_save(self):
+        product = create_product(self.category)
+        self.assertEqual(self.thumbnail_count(), 0)
+
+        product.photo.save("photo.png", make_image_file(), save=True)
+        self.assertEqual(self.thumbnail_count(), 1)
+
+    def test_thumbnail_not_regenerated_without_photo_change(self):
+        product = create_product(self.category)
+        product.photo.save("photo.png", make_image_file(), save=True)
+
+        with mock.patch("mall.thumbnails.generate_product_thumbnails") as generate_mock:
+            product.name = "새 이름"
+            product.save()
+            product = Product.objects.get(pk=product.pk)
+            product.price += 1000
+            product.save()
+            self.assertEqual(generate_mock.call_count, 0)
+
+            product.photo.save("photo2.png", make_image_file(), save=True)
+            self.assertEqual(generate_mock.call_count, 1)
+
+    def test_warm_thumbnails(self):
+        product = create_product(self.category)
+        product.photo.save("photo.png", make_image_file(), save=True)
+        shutil.rmtree(self.thumbnail_dir)
+        # 썸네일 파일을 지워도 kvstore 기록이 남아 있으면 다시 생성하지 않으므로 함께 삭제
+        call_command("thumbnail", "clear", verbosity=0)
+
+        out = StringIO()
+        call_command("warm_thumbnails", "--workers=1", verbosity=0, stdout=out)
+        self.assertIn("1개 상품", out.getvalue())
+        self.assertEqual(self.thumbnail_count(), 1)
+
+        # 이미 생성된 썸네일은 건너뜀
+        call_command("warm_thumbnails", "--workers=1", verbosity=0, stdout=out)
+        self.assertEqual(self.thumbnail_count(), 1)
+
+    def test_warm_thumbnails_prints_last_pk_on_failure(self):
+        product_list = [create_product(self.category) for _ in range(3)]
+        for product in product_list:
+            product.photo.save("photo.png", make_image_file(), save=True)
+
+        def fail_third_photo(photo_name):
+            if photo_name == product_list[2].photo.name:
+                raise OSError("disk full")
+
+        err = StringIO()
+        with mock.patch(
+            "mall.management.commands.warm_thumbnails.generate_product_thumbnails",
+            fail_third_photo,
+        ):
+            with self.assertRaises(OSError):
+                call_command("warm_thumbnails", "--workers=1", verbosity=0, stderr=err)
+        self.assertIn(f"--start-pk={product_list[1].pk + 1}", err.getvalue())
+
+
+class LoadProductsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir)
+        os.mkdir(os.path.join(self.source_dir, "photos"))
+
+        item_dict_list = []
+        for i in range(5):
+            photo_path = f"photos/{i}.png"
+            with open(os.path.join(self.source_dir, photo_path), "wb") as f:
+                f.write(make_image_file().read())
+            item_dict_list.append(
+                {
+                    "category_name": "분류" if i % 2 else "",
+                    "name": f"상품{i}",
+                    "price": 1000 * (i + 1),
+                    "priceUnit": "원",
+                    "desc": f"상품{i} 설명",
+                    "photo_path": photo_path,
+                }
+            )
+        with open(os.path.join(self.source_dir, "product-list.json"), "w") as f:
+            json.dump(item_dict_list, f)
+
+    def load_products(self, *args):
+        out = StringIO()
+        call_command(
+            "load_products",
+            f"--source={self.source_dir}",
+            *args,
+            verbosity=0,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_bulk_load(self):
+        category = Category.objects.create(name="분류")
+        create_product(category, name="상품1", price=1)
+
+        output = self.load_products(
+            "--bulk", "--workers=4", "--batch-size=2", "--skip-thumbnails"
+        )
+
+        self.assertIn("5개 상품 중 4개 등록", output)
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Category.objects.count(), 2)
+        product = Product.objects.get(name="상품4")
+        self.assertEqual(product.price, 5000)
+        self.assertEqual(product.category.name, "미분류")
+        self.assertTrue(product.photo.storage.exists(product.photo.name))
+        self.assertEqual(
+            list(search_products(Product.objects.all(), "상품4 설명")), [product]
+        )
+
+        output = self.load_products("--bulk", "--skip-thumbnails")
+        self.assertIn("5개 상품 중 0개 등록", output)
+
+    def test_load_from_json_file(self):
+        output = self.load_products()
+        self.assertIn("5개 상품 중 5개 등록", output)
+
+    def replace_photo(self, photo_path):
+        buffer = BytesIO()
+        Image.new("RGB", (600, 400), color="blue").save(buffer, format="PNG")
+        with open(os.path.join(self.source_dir, photo_path), "wb") as f:
+            f.write(buffer.getvalue())
+
+    def test_sync(self):
+        self.load_products("--bulk", "--skip-thumbnails")
+        photo_dict = dict(Product.objects.values_list("name", "photo"))
+
+        json_path = os.path.join(self.source_dir, "product-list.json")
+        with open(json_path) as f:
+            item_dict_list = json.load(f)
+        item_dict_list[0]["price"] = 9999
+        # 같은 경로의 사진 내용만 바뀌어도 다시 내려받음
+        self.replace_photo("photos/1.png")
+        item_dict_list.append(dict(item_dict_list[2], name="상품5"))
+        with open(json_path, "w") as f:
+            json.dump(item_dict_list, f)
+
+        # 이전 사진은 커밋된 뒤에 삭제
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.load_products("--sync", "--skip-thumbnails")
+        self.assertIn("6개 상품 중 1개 등록, 2개 갱신", output)
+        self.assertEqual(Product.objects.get(name="상품0").price, 9999)
+
+        new_photo_dict = dict(Product.objects.values_list("name", "photo"))
+        old_photo, new_photo = photo_dict.pop("상품1"), new_photo_dict.pop("상품1")
+        self.assertNotEqual(new_photo, old_photo)
+        new_photo_dict.pop("상품5")
+        self.assertEqual(new_photo_dict, photo_dict)
+        self.assertFalse(default_storage.exists(old_photo))
+        self.assertTrue(default_storage.exists(new_photo))
+
+        output = self.load_products("--sync", "--skip-thumbnails")
+        self.assertIn("6개 상품 중 0개 등록, 0개 갱신", output)
+
+    def test_sync_download_failure(self):
+        self.load_products("--bulk", "--skip-thumbnails")
+        photo_dict = dict(Product.objects.values_list("name", "photo"))
+        file_set = self.get_media_file_set()
+        self.replace_photo("photos/1.png")
+        self.replace_photo("photos/2.png")
+
+        read_photo = LocalSource.read_photo
+
+        def fail_second_photo(source, photo_path):
+            if photo_path == "photos/2.png":
+                raise OSError("download failed")
+            return read_photo(source, photo_path)
+
+        with mock.patch.object(LocalSource, "read_photo", fail_second_photo):
+            with self.assertRaises(OSError):
+                self.load_products("--sync", "--skip-thumbnails", "--workers=1")
+
+        # 사진을 모두 내려받기 전에 실패하면 DB와 기존 사진 파일은 그대로 유지
+        self.assertEqual(dict(Product.objects.values_list("name", "photo")), photo_dict)
+        self.assertEqual(self.get_media_file_set(), file_set)
+
+        output = self.load_products("--sync", "--skip-thumbnails")
+        self.assertIn("5개 상품 중 0개 등록, 2개 갱신", output)
+
+    def get_media_file_set(self):
+        return {
+            os.path.join(path, name)
+            for path, _, name_list in os.walk(default_storage.location)
+            for name in name_list
+        }
+
+
+class AddToCartTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, name="상품")
+        cls.other_product = create_product(cls.category, name="다른 상품")
+        cls.inactive_product = Product.objects.create(
+            category=cls.category, name="판매중지", price=1000
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_to_cart(self, product, quantity=1):
+        url = reverse("add_to_cart", args=[product.pk])
+        return self.client.post(f"{url}?quantity={quantity}")
+
+    def get_quantity(self, product):
+        return CartProduct.objects.get(user=self.user, product=product).quantity
+
+    def test_add_increments_quantity(self):
+        self.assertEqual(self.add_to_cart(self.product, 2).status_code, 200)
+        self.assertEqual(self.add_to_cart(self.product, 3).status_code, 200)
+        self.assertEqual(self.get_quantity(self.product), 5)
+
+    def test_add_is_single_query(self):
+        self.add_to_cart(self.product)
+        # 세션, 사용자 조회를 제외하면 장바구니 담기는 쿼리 1번
+        with self.assertNumQueries(3):
+            self.add_to_cart(self.product)
+        self.assertEqual(self.get_quantity(self.product), 2)
+
+    def test_add_inactive_product(self):
+        self.assertEqual(self.add_to_cart(self.inactive_product).status_code, 404)
+        self.assertEqual(self.add_to_cart(Product(pk=9999)).status_code, 404)
+        self.assertFalse(CartProduct.objects.exists())
+
+    def test_add_invalid_quantity(self):
+        self.assertEqual(self.add_to_cart(self.product, 0).status_code, 400)
+        self.assertEqual(self.add_to_cart(self.product, "a").status_code, 400)
+        self.assertFalse(CartProduct.objects.exists())
+
+    def test_add_products_without_upsert(self):
+        with mock.patch.object(connection, "vendor", "mysql"):
+            CartProduct.add_products(self.user, {self.product.pk: 1})
+            count = CartProduct.add_products(
+                self.user,
+                {self.product.pk: 2, self.inactive_product.pk: 1},
+            )
+        self.assertEqual(count, 1)
+        self.assertEqual(self.get_quantity(self.product), 3)
+        self.assertFalse(
+            CartProduct.objects.filter(product=self.inactive_product).exists()
+        )
+
+    def test_add_batch(self):
+        self.add_to_cart(self.product)
+        item_list = [
+            {"product_pk": self.product.pk, "quantity": 2},
+            {"product_pk": self.other_product.pk},
+            {"product_pk": self.product.pk, "quantity": 1},
+            {"product_pk": self.inactive_product.pk, "quantity": 1},
+        ]
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("add_to_cart_batch"),
+                {"items": item_list},
+                content_type="application/json",
+            )
+        self.assertEqual(response.json(), {"statusCode": 200, "added": 2})
+        self.assertEqual(self.get_quantity(self.product), 4)
+        self.assertEqual(self.get_quantity(self.other_product), 1)
+        self.assertFalse(
+            CartProduct.objects.filter(product=self.inactive_product).exists()
+        )
+
+    def test_add_batch_invalid(self):
+        url = reverse("add_to_cart_batch")
+        for payload in [{}, {"items": [{"quantity": 1}]}, {"items": [1]}]:
+            response = self.client.post(url, payload, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_batch_out_of_range(self):
+        url = reverse("add_to_cart_batch")
+        for item in [
+            {"product_pk": 10**30},
+            {"product_pk": -1},
+            {"product_pk": self.product.pk, "quantity": 2**31},
+        ]:
+            response = self.client.post(
+                url, {"items": [item]}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+        item_list = [{"product_pk": self.product.pk}] * 3
+        with override_settings(CART_BATCH_MAX_ITEMS=2):
+            response = self.client.post(
+                url, {"items": item_list}, content_type="application/json"
+            )
+        self.assertEqual(response.json(), {"message": "too many items"})
+        self.assertFalse(CartProduct.objects.exists())
+
+        response = self.client.post(reverse("add_to_cart", args=[10**30]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductStockTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, name="한정판")
+        cls.unlimited_product = create_product(cls.category, name="상시판매")
+
+    def setUp(self):
+        ProductStock.set_stock(self.product, 10, shard_count=4)
+
+    def get_stock(self):
+        return sum(
+            ProductStock.objects.filter(product=self.product).values_list(
+                "quantity", flat=True
+            )
+        )
+
+    def order(self, quantity):
+        CartProduct.objects.create(user=self.user, product=self.product, quantity=quantity)
+        CartProduct.objects.create(user=self.user, product=self.unlimited_product)
+        return Order.create_from_cart(
+            user=self.user, cart_product_ps=CartProduct.objects.filter(user=self.user)
+        )
+
+    def test_set_stock(self):
+        self.assertEqual(
+            list(
+                ProductStock.objects.filter(product=self.product)
+                .order_by("shard")
+                .values_list("quantity", flat=True)
+            ),
+            [3, 3, 2, 2],
+        )
+        ProductStock.set_stock(self.product, 5, shard_count=2)
+        self.assertEqual(ProductStock.objects.filter(product=self.product).count(), 2)
+        self.assertEqual(self.get_stock(), 5)
+
+    def test_reserve_across_shards(self):
+        order = self.order(7)
+        self.assertEqual(self.get_stock(), 3)
+        self.assertEqual(
+            sum(order.stockreservation_set.values_list("quantity", flat=True)), 7
+        )
+
+        with self.assertRaises(OutOfStockError):
+            self.order(4)
+        # 재고가 부족하면 주문 생성과 재고 차감이 모두 롤백되고 장바구니는 유지
+        self.assertEqual(self.get_stock(), 3)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CartProduct.objects.filter(user=self.user).count(), 2)
+
+    def test_reserve_lock_order(self):
+        other_product = create_product(self.category, name="한정판2")
+        ProductStock.set_stock(other_product, 10, shard_count=4)
+        CartProduct.objects.create(user=self.user, product=other_product, quantity=7)
+        # 한 행에서 모두 가져갈 수 없으면 상품 pk, shard 순서로 차감 (재고 행 3, 3, 2, 2개)
+        order = self.order(7)
+        self.assertEqual(
+            list(
+                order.stockreservation_set.order_by("pk").values_list(
+                    "stock__product_id", "stock__shard", "quantity"
+                )
+            ),
+            [
+                (self.product.pk, 0, 3),
+                (self.product.pk, 1, 3),
+                (self.product.pk, 2, 1),
+                (other_product.pk, 0, 3),
+                (other_product.pk, 1, 3),
+                (other_product.pk, 2, 1),
+            ],
+        )
+
+    def test_release_on_failed_payment(self):
+        order = self.order(4)
+        payment = OrderPayment.create_by_order(order)
+        response = {"merchant_uid": payment.merchant_uid, "amount": 0, "status": "failed"}
+        payment.update(response)
+        self.assertEqual(self.get_stock(), 10)
+        # 같은 결제 결과를 여러 번 반영해도 재고는 한 번만 되돌림
+        payment.update(response)
+        self.assertEqual(self.get_stock(), 10)
+
+        self.assertTrue(order.reopen())
+        self.assertEqual(order.status, Order.Status.REQUESTED)
+        self.assertEqual(self.get_stock(), 6)
+        # 이미 다시 결제 가능한 주문은 재고를 다시 예약하지 않음
+        self.assertFalse(order.reopen())
+        self.assertEqual(self.get_stock(), 6)
+
+    def test_release_is_batched(self):
+        order = self.order(10)
+        self.assertEqual(order.stockreservation_set.count(), 4)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                ProductStock.release([order.pk])
+            return sum(
+                1
+                for query in context.captured_queries
+                if "SAVEPOINT" not in query["sql"]
+            )
+
+        # 예약 조회, 예약 삭제, 재고 증가 (재고 행 수와 관계없이 UPDATE 1번)
+        self.assertEqual(count_queries(), 3)
+        self.assertEqual(self.get_stock(), 10)
+        self.assertEqual(count_queries(), 1)
+        self.assertEqual(self.get_stock(), 10)
+
+    def test_expire_orders(self):
+        stale_order = self.order(4)
+        CartProduct.objects.filter(user=self.user).delete()
+        recent_order = self.order(3)
+        Order.objects.filter(pk=stale_order.pk).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+
+        out = StringIO()
+        call_command("expire_orders", stdout=out)
+        self.assertIn("1건 만료", out.getvalue())
+
+        stale_order.refresh_from_db()
+        recent_order.refresh_from_db()
+        self.assertEqual(stale_order.status, Order.Status.FAILED_PAYMEMT)
+        self.assertEqual(recent_order.status, Order.Status.REQUESTED)
+        self.assertEqual(self.get_stock(), 7)
+
+        # 결제 실패로 만료된 주문도 다시 결제하면 재고를 다시 예약
+        self.assertTrue(stale_order.reopen())
+        self.assertEqual(self.get_stock(), 3)
+
+    def get_reserved(self, order):
+        return sum(order.stockreservation_set.values_list("quantity", flat=True))
+
+    def fail_then_pay_by_webhook(self, order):
+        with FakePortone() as fake_portone, override_settings(
+            PORTONE_API_URL=fake_portone.url
+        ):
+            payment = OrderPayment.create_by_order(order)
+            payment.update(
+                {"merchant_uid": payment.merchant_uid, "amount": 0, "status": "failed"}
+            )
+            # 결제 실패 후 다른 결제 시도가 결제 완료되어 웹훅으로 전달
+            paid_payment = OrderPayment.create_by_order(order)
+            fake_portone.add_payment(
+                paid_payment.merchant_uid, amount=order.total_amount
+            )
+            self.client.post(
+                reverse("portone_webhook"),
+                {"merchant_uid": paid_payment.merchant_uid, "status": "paid"},
+                content_type="application/json",
+            )
+            paid_payment.refresh_from_db()
+            return paid_payment
+
+    def test_paid_after_failed_payment_reserves_stock(self):
+        order = self.order(4)
+        self.fail_then_pay_by_webhook(order)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PAID)
+        self.assertEqual(self.get_reserved(order), 4)
+        self.assertEqual(self.get_stock(), 6)
+
+    def test_paid_after_failed_payment_out_of_stock(self):
+        order = self.order(4)
+        payment = OrderPayment.create_by_order(order)
+        payment.update(
+            {"merchant_uid": payment.merchant_uid, "amount": 0, "status": "failed"}
+        )
+        # 결제 실패로 반환된 재고를 다른 주문이 모두 가져감
+        self.order(10)
+
+        with FakePortone() as fake_portone, override_settings(
+            PORTONE_API_URL=fake_portone.url
+        ):
+            paid_payment = OrderPayment.create_by_order(order)
+            fake_portone.add_payment(
+                paid_payment.merchant_uid, amount=order.total_amount
+            )
+            with self.assertLogs("mall.models", "WARNING"):
+                paid_payment.update()
+
+        order.refresh_from_db()
+        paid_payment.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELLED)
+        self.assertEqual(paid_payment.pay_status, OrderPayment.PayStatus.CANCELLED)
+        self.assertEqual(self.get_reserved(order), 0)
+        self.assertEqual(self.get_stock(), 0)
+
+    def test_order_new_out_of_stock(self):
+        self.client.force_login(self.user)
+        CartProduct.objects.create(user=self.user, product=self.product, quantity=11)
+        response = self.client.get(reverse("order_new"))
+        self.assertRedirects(response, reverse("cart_detail"))
+        self.assertFalse(Order.objects.exists())
+
+
+class StockBenchmarkTest(TransactionTestCase):
+    def test_bench_stock(self):
+        out = StringIO()
+        call_command(
+            "bench_stock",
+            "--shards", "1", "2",
+            "--stock=5",
+            "--buyers=1",
+            "--orders=7",
+            f"--database={connection.settings_dict['NAME']}",
+            stdout=out,
+        )
+        line_list = out.getvalue().splitlines()
+        self.assertEqual(len(line_list), 2)
+        for line in line_list:
+            self.assertIn("ordered=5 ", line)
+            self.assertIn("out_of_stock=2 ", line)
+            self.assertIn("reserved=5/5 remaining=0", line)
+        product = Product.objects.get(name="재고 벤치마크 상품")
+        self.assertEqual(product.status, Product.Status.INACTIVE)
+
+        with self.assertRaises(CommandError):
+            call_command("bench_stock", "--buyers=1", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command(
+                "bench_stock", "--buyers=1", "--database=other", stdout=StringIO()
+            )
+
+
+class OrderTransitionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category)
+
+    def setUp(self):
+        self.order = create_order(self.user, [self.product])
+
+    def test_transition_is_single_conditional_update(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(self.order.transition(Order.Status.PAID))
+        # 매출 집계 반영 쿼리를 제외하면 주문 상태 변경은 UPDATE 1번
+        order_sql_list = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "mall_order"')
+        ]
+        self.assertEqual(len(order_sql_list), 1)
+        sql = order_sql_list[0]
+        self.assertTrue(sql.startswith("UPDATE"))
+        self.assertIn('"status" IN', sql)
+        self.assertNotIn('"total_amount"', sql)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_illegal_transition(self):
+        with self.assertLogs("mall.models", "INFO"):
+            self.assertFalse(self.order.transition(Order.Status.SHIPPED))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.REQUESTED)
+
+    def test_lost_transition(self):
+        # 다른 요청이 먼저 결제 완료로 변경한 주문을 오래된 인스턴스로 결제 실패 처리
+        stale_order = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(self.order.transition(Order.Status.PAID))
+        with self.assertLogs("mall.models", "INFO"):
+            self.assertFalse(stale_order.transition(Order.Status.FAILED_PAYMEMT))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_payment_update_does_not_overwrite_paid_order(self):
+        failed_payment = OrderPayment.create_by_order(self.order)
+        # 결제 실패 응답을 반영하는 동안 다른 요청이 주문을 결제 완료로 변경
+        Order.transition_by_pk(self.order.pk, Order.Status.PAID)
+        with self.assertLogs("mall.models", "INFO"):
+            failed_payment.update(
+                {
+                    "merchant_uid": failed_payment.merchant_uid,
+                    "amount": 0,
+                    "status": "failed",
+                }
+            )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+
+
+class SalesRollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category_list = [
+            Category.objects.create(name=f"분류{i}") for i in range(2)
+        ]
+        cls.product_list = [
+            create_product(
+                cls.category_list[i % 2], name=f"상품{i}", price=1000 * (i + 1)
+            )
+            for i in range(3)
+        ]
+
+    def pay(self, order, status="paid"):
+        payment = OrderPayment.create_by_order(order)
+        payment.update(
+            {
+                "merchant_uid": payment.merchant_uid,
+                "amount": order.total_amount,
+                "status": status,
+            }
+        )
+        return payment
+
+    def get_sales(self):
+        return (
+            list(
+                DailySales.objects.values_list(
+                    "date", "order_count", "quantity", "amount"
+                )
+            ),
+            sorted(
+                DailyProductSales.objects.values_list(
+                    "date", "product_id", "order_count", "quantity", "amount"
+                )
+            ),
+            sorted(
+                DailyCategorySales.objects.values_list(
+                    "date", "category_id", "order_count", "quantity", "amount"
+                )
+            ),
+        )
+
+    def test_paid_and_cancelled(self):
+        today = timezone.localdate()
+        payment = self.pay(create_order(self.user, self.product_list))
+        self.pay(create_order(self.user, self.product_list[:1]))
+        # 결제 실패한 주문은 집계하지 않음
+        self.pay(create_order(self.user, self.product_list[:1]), status="failed")
+
+        sales_list, product_sales_list, category_sales_list = self.get_sales()
+        self.assertEqual(sales_list, [(today, 2, 4, 7000)])
+        self.assertEqual(
+            product_sales_list,
+            [
+                (today, self.product_list[0].pk, 2, 2, 2000),
+                (today, self.product_list[1].pk, 1, 1, 2000),
+                (today, self.product_list[2].pk, 1, 1, 3000),
+            ],
+        )
+        self.assertEqual(
+            category_sales_list,
+            [
+                (today, self.category_list[0].pk, 2, 3, 5000),
+                (today, self.category_list[1].pk, 1, 1, 2000),
+            ],
+        )
+
+        # 결제 완료 이후 상태 변경은 집계를 바꾸지 않고, 취소하면 차감
+        payment.order.transition(Order.Status.PREPARED_PRODUCT)
+        payment.update(
+            {
+                "merchant_uid": payment.merchant_uid,
+                "amount": payment.desired_amount,
+                "status": "cancelled",
+            }
+        )
+        self.assertEqual(self.get_sales()[0], [(today, 1, 1, 1000)])
+
+    def test_rebuild_matches_incremental(self):
+        for i in range(3):
+            self.pay(create_order(self.user, self.product_list[i:]))
+        cancelled_payment = self.pay(create_order(self.user, self.product_list))
+        cancelled_payment.order.transition(Order.Status.CANCELLED)
+        expected = self.get_sales()
+
+        # 상태 전이를 거치지 않은 변경으로 어긋난 집계를 다시 계산
+        DailySales.objects.update(amount=0)
+        DailyProductSales.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_sales", batch_size=2, stdout=out)
+        self.assertEqual(self.get_sales(), expected)
+        self.assertIn("주문 3건", out.getvalue())
+
+    def test_category_and_product_changes_after_payment(self):
+        today = timezone.localdate()
+        payment = self.pay(create_order(self.user, self.product_list))
+        expected = self.get_sales()
+
+        # 결제 후 상품 분류가 바뀌거나 상품이 삭제되어도 주문 시점의 분류/상품 기준으로 집계
+        product = self.product_list[0]
+        product.category = self.category_list[1]
+        product.save()
+        self.product_list[2].delete()
+        call_command("rebuild_sales", stdout=StringIO())
+        self.assertEqual(self.get_sales(), expected)
+
+        payment.update(
+            {
+                "merchant_uid": payment.merchant_uid,
+                "amount": payment.desired_amount,
+                "status": "cancelled",
+            }
+        )
+        _, product_sales_list, category_sales_list = self.get_sales()
+        self.assertEqual(
+            category_sales_list,
+            [
+                (today, self.category_list[0].pk, 0, 0, 0),
+                (today, self.category_list[1].pk, 0, 0, 0),
+            ],
+        )
+        self.assertEqual({row[2:] for row in product_sales_list}, {(0, 0, 0)})
+
+    def test_line_without_category(self):
+        today = timezone.localdate()
+        order = create_order(self.user, self.product_list[:2])
+        # 분류 스냅샷 도입 전 주문처럼 분류가 비어 있는 주문 상품
+        order.orderedproduct_set.filter(product=self.product_list[0]).update(
+            category=None
+        )
+        self.pay(order)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PAID)
+        expected = self.get_sales()
+        sales_list, _, category_sales_list = expected
+        self.assertEqual(sales_list, [(today, 1, 2, 3000)])
+        self.assertEqual(
+            category_sales_list, [(today, self.category_list[1].pk, 1, 1, 2000)]
+        )
+
+        call_command("rebuild_sales", stdout=StringIO())
+        self.assertEqual(self.get_sales(), expected)
+
+    def test_rebuild_date_range(self):
+        self.pay(create_order(self.user, self.product_list))
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailySales.objects.create(date=yesterday, order_count=1, quantity=1, amount=1)
+
+        rebuild_sales(start_date=timezone.localdate())
+        self.assertTrue(DailySales.objects.filter(date=yesterday).exists())
+        rebuild_sales(end_date=yesterday)
+        self.assertFalse(DailySales.objects.filter(date=yesterday).exists())
+        self.assertEqual(DailySales.objects.get().amount, 6000)
+
+    def test_admin_report_reads_only_rollups(self):
+        self.pay(create_order(self.user, self.product_list))
+        admin_user = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_login(admin_user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("admin:mall_dailysales_report"))
+        self.assertContains(response, "6,000원")
+        self.assertContains(response, "상품2")
+        for query in context.captured_queries:
+            self.assertNotIn('"mall_order', query["sql"])
+
+        response = self.client.get(reverse("admin:mall_dailysales_changelist"))
+        self.assertContains(response, reverse("admin:mall_dailysales_report"))
+
+    def test_admin_report_requires_view_permission(self):
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("admin:mall_dailysales_report")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        staff.user_permissions.add(Permission.objects.get(codename="view_dailysales"))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class ExportOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품, {i}") for i in range(3)
+        ]
+        cls.order_list = [create_order(cls.user, cls.product_list) for _ in range(4)]
+        cls.order_list[0].transition(Order.Status.PAID)
+        cls.order_list[1].transition(Order.Status.PAID)
+        # 지난 주문
+        Order.objects.filter(pk=cls.order_list[3].pk).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+
+    def call_export(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("export_orders", *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_filtered_by_status(self):
+        out, err = self.call_export("orders", "--status", "paid", "--chunk-size", "1")
+        row_list = list(csv.reader(StringIO(out)))
+        self.assertEqual(row_list[0], EXPORT_FIELD_DICT["orders"])
+        self.assertEqual(
+            [int(row[0]) for row in row_list[1:]],
+            [self.order_list[0].pk, self.order_list[1].pk],
+        )
+        self.assertIn("2행 내보냄", err)
+
+    def test_jsonl_filtered_by_date(self):
+        today = timezone.localdate().isoformat()
+        out, _ = self.call_export(
+            "ordered_products", "--format", "jsonl", "--start", today, "--end", today
+        )
+        row_list = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(len(row_list), 9)
+        self.assertNotIn(
+            self.order_list[3].pk, {row["order_id"] for row in row_list}
+        )
+        self.assertEqual(row_list[0]["name"], "상품, 0")
+        self.assertEqual(row_list[0]["order__uid"], str(self.order_list[0].uid))
+
+    def test_output_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "orders.csv")
+            self.call_export("ordered_products", "--output", path)
+            with open(path, encoding="utf-8", newline="") as f:
+                row_list = list(csv.reader(f))
+        self.assertEqual(len(row_list), 1 + 12)
+        self.assertEqual(row_list[1][5], "상품, 0")
+
+    def test_admin_action_streams(self):
+        admin_user = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse("admin:mall_order_changelist"),
+            {
+                "action": "export_ordered_products_csv",
+                "_selected_action": [order.pk for order in self.order_list[:2]],
+            },
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.startswith("\ufeff"))
+        row_list = list(csv.reader(StringIO(content[1:])))
+        self.assertEqual(len(row_list), 1 + 6)
+
+        response = self.client.post(
+            reverse("admin:mall_order_changelist"),
+            {
+                "action": "export_orders_jsonl",
+                "_selected_action": [self.order_list[2].pk],
+            },
+        )
+        row_list = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual([row["id"] for row in row_list], [self.order_list[2].pk])
+
+    def test_csv_formula_escaped(self):
+        formula_name_list = ["=1+2", "+cmd", "-2+3", "@SUM(A1)"]
+        Order.objects.filter(pk=self.order_list[0].pk).update(name=formula_name_list[0])
+        OrderedProduct.objects.filter(order=self.order_list[0]).update(
+            name=formula_name_list[1]
+        )
+        OrderedProduct.objects.filter(order=self.order_list[1]).update(
+            name=formula_name_list[2]
+        )
+        OrderedProduct.objects.filter(order=self.order_list[2]).update(
+            name=formula_name_list[3]
+        )
+
+        out, _ = self.call_export("orders")
+        row_list = list(csv.reader(StringIO(out)))
+        self.assertEqual(row_list[1][3], "'=1+2")
+
+        out, _ = self.call_export("ordered_products")
+        name_set = {row[5] for row in list(csv.reader(StringIO(out)))[1:]}
+        self.assertEqual(
+            name_set, {"'+cmd", "'-2+3", "'@SUM(A1)", "상품, 0", "상품, 1", "상품, 2"}
+        )
+
+        # JSONL은 값을 그대로 내보냄
+        out, _ = self.call_export("orders", "--format", "jsonl")
+        self.assertEqual(json.loads(out.splitlines()[0])["name"], "=1+2")
+
+
+class PortoneResponseTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category)
+
+    def setUp(self):
+        self.order = create_order(self.user, [self.product])
+        self.payment = OrderPayment.create_by_order(self.order)
+
+    def make_response(self, status):
+        return {"merchant_uid": self.payment.merchant_uid, "amount": 1000, "status": status}
+
+    def test_update_appends_response(self):
+        self.assertEqual(self.payment.meta, {})
+        self.payment.update(self.make_response("paid"))
+        self.payment.update(self.make_response("cancelled"))
+
+        self.assertEqual(
+            list(self.payment.response_qs.order_by("pk").values_list("status", flat=True)),
+            ["paid", "cancelled"],
+        )
+        payment = OrderPayment.objects.get(pk=self.payment.pk)
+        self.assertEqual(payment.pay_status, OrderPayment.PayStatus.CANCELLED)
+        # 결제 목록 조회에는 응답 원본이 포함되지 않고, 접근할 때 조회
+        with self.assertNumQueries(1):
+            self.assertEqual(payment.meta["status"], "cancelled")
+            self.assertEqual(payment.meta["status"], "cancelled")
+
+    def test_history_remains_after_payment_is_deleted(self):
+        self.payment.update(self.make_response("failed"))
+        self.payment.delete()
+        self.assertTrue(
+            PortoneResponse.objects.filter(merchant_uid=self.payment.uid).exists()
+        )
+
+
+class OrderPaymentReuseTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.order = create_order(self.user, [self.product])
+
+    def open_order_pay(self):
+        response = self.client.get(reverse("order_pay", args=[self.order.pk]))
+        self.assertEqual(response.status_code, 200)
+        return OrderPayment.objects.filter(order=self.order).latest("pk")
+
+    def test_reuse_ready_payment(self):
+        payment = self.open_order_pay()
+        self.assertEqual(self.open_order_pay(), payment)
+        self.assertEqual(OrderPayment.objects.filter(order=self.order).count(), 1)
+
+    @override_settings(PORTONE_PAYMENT_REUSE_TIMEOUT=60)
+    def test_expired_payment_is_not_reused(self):
+        payment = self.open_order_pay()
+        OrderPayment.objects.filter(pk=payment.pk).update(
+            created_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertNotEqual(self.open_order_pay(), payment)
+
+    def test_changed_amount_or_status_is_not_reused(self):
+        payment = self.open_order_pay()
+        Order.objects.filter(pk=self.order.pk).update(total_amount=2000)
+        self.order.refresh_from_db()
+        new_payment = self.open_order_pay()
+        self.assertNotEqual(new_payment, payment)
+
+        OrderPayment.objects.filter(pk=new_payment.pk).update(
+            pay_status=OrderPayment.PayStatus.FAILED
+        )
+        self.assertNotIn(self.open_order_pay(), [payment, new_payment])
+
+
+class PurgePaymentsTest(FakePortoneMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category, price=1000)
+
+    def setUp(self):
+        super().setUp()
+        order = create_order(self.user, [self.product])
+        # 포트원에 결제내역이 없는 건과 포트원에서도 결제 준비 상태인 건은 삭제 대상
+        self.old_payment_list = [OrderPayment.create_by_order(order) for _ in range(4)]
+        self.fake_portone.add_payment(
+            self.old_payment_list[0].merchant_uid, amount=1000, status="ready"
+        )
+        self.paid_payment = OrderPayment.create_by_order(order)
+        OrderPayment.objects.filter(pk=self.paid_payment.pk).update(
+            pay_status=OrderPayment.PayStatus.PAID, is_paid_ok=True
+        )
+        # 웹훅이 누락되어 결제 준비 상태로 남았지만 포트원에서는 결제 완료된 건
+        self.webhook_missed_order = create_order(self.user, [self.product])
+        self.webhook_missed_payment = OrderPayment.create_by_order(
+            self.webhook_missed_order
+        )
+        self.fake_portone.add_payment(
+            self.webhook_missed_payment.merchant_uid, amount=1000
+        )
+        OrderPayment.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.recent_payment = OrderPayment.create_by_order(order)
+
+    def test_purge(self):
+        out = StringIO()
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            call_command("purge_payments", "--dry-run", stdout=out)
+        self.assertIn("4건 삭제 대상 (포트원 확인 후 유지 1건)", out.getvalue())
+        self.webhook_missed_payment.refresh_from_db()
+        self.assertEqual(
+            self.webhook_missed_payment.pay_status, OrderPayment.PayStatus.READY
+        )
+
+        out = StringIO()
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            call_command("purge_payments", "--batch-size=2", "-v2", stdout=out)
+        self.assertIn("결제 준비 건 4건 삭제, 포트원 확인 후 유지 1건", out.getvalue())
+        self.assertIn("2건 삭제", out.getvalue())
+        self.assertFalse(
+            OrderPayment.objects.filter(
+                pk__in=[payment.pk for payment in self.old_payment_list]
+            ).exists()
+        )
+        self.assertEqual(
+            set(OrderPayment.objects.values_list("pk", flat=True)),
+            {
+                self.paid_payment.pk,
+                self.webhook_missed_payment.pk,
+                self.recent_payment.pk,
+            },
+        )
+        self.webhook_missed_payment.refresh_from_db()
+        self.assertTrue(self.webhook_missed_payment.is_paid_ok)
+        self.webhook_missed_order.refresh_from_db()
+        self.assertEqual(self.webhook_missed_order.status, Order.Status.PAID)
+
+    def test_keep_when_portone_unavailable(self):
+        self.fake_portone.failure_rate = 1.0
+        out = StringIO()
+        with self.assertLogs("mall.reconcile", "WARNING"):
+            call_command("purge_payments", stdout=out)
+        self.assertIn("결제 준비 건 0건 삭제, 포트원 확인 후 유지 5건", out.getvalue())
+        self.assertEqual(OrderPayment.objects.count(), 7)
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True)
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품{i}") for i in range(30)
+        ]
+        cls.order_list = [
+            create_order(cls.user, cls.product_list[i : i + 5]) for i in range(0, 30, 5)
+        ]
+        for product in cls.product_list[:10]:
+            CartProduct.objects.create(user=cls.user, product=product, quantity=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    def get(self, url_name, *args):
+        response = self.client.get(reverse(url_name, args=args))
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(response)
+        return response
+
+    def test_product_list(self):
+        self.get("product_list")
+
+    def test_cart_detail(self):
+        self.get("cart_detail")
+
+    def test_order_list(self):
+        self.get("order_list")
+
+    def test_product_list_json(self):
+        self.get("product_list_json")
+
+    def test_order_detail(self):
+        self.get("order_detail", self.order_list[0].pk)
+
+    def test_order_pay(self):
+        self.get("order_pay", self.order_list[0].pk)
+
+    def test_over_budget(self):
+        with mock.patch.dict("mall.urls.QUERY_BUDGET_DICT", {"order_list": 1}):
+            with self.assertLogs("mall.query_budget", "WARNING"):
+                response = self.client.get(reverse("order_list"))
+            with self.assertRaises(AssertionError):
+                self.assertQueryBudget(response)
+        self.assertEqual(response["X-Query-Count"], str(response.query_count))
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("order_list"))
+        self.assertNotIn("X-Query-Count", response)
+        self.assertNotIn("X-Query-Time", response)
+
+    async def test_async_client(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(get_response)))
+
+        response = await self.async_client.get(reverse("order_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.query_count, 0)
+        self.assertQueryBudget(response)
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product_list = [
+            create_product(cls.category, name=f"상품{i}") for i in range(120)
+        ]
+        cls.order_list = [
+            create_order(cls.user, cls.product_list[:1]) for _ in range(45)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_order_list(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_order_list_pages(self):
+        response, first_num_queries = self.get_order_list(reverse("order_list"))
+        pk_list = [order.pk for order in response.context["order_list"]]
+        next_url = response.context["next_url"]
+        self.assertIsNone(response.context["previous_url"])
+
+        while next_url:
+            response, num_queries = self.get_order_list(next_url)
+            self.assertEqual(num_queries, first_num_queries)
+            pk_list += [order.pk for order in response.context["order_list"]]
+            next_url = response.context["next_url"]
+
+        self.assertEqual(
+            pk_list, sorted((order.pk for order in self.order_list), reverse=True)
+        )
+
+        # 마지막 페이지에서 이전 페이지로 돌아가면 같은 주문 목록
+        response, _ = self.get_order_list(response.context["previous_url"])
+        self.assertEqual(
+            [order.pk for order in response.context["order_list"]], pk_list[20:40]
+        )
+        self.assertIsNotNone(response.context["previous_url"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("order_list"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_product_list_json(self):
+        pk_list = []
+        url = reverse("product_list_json")
+        while url:
+            response_dict = self.client.get(url).json()
+            pk_list += [item["pk"] for item in response_dict["results"]]
+            url = response_dict["next"]
+        self.assertEqual(
+            pk_list, sorted((product.pk for product in self.product_list), reverse=True)
+        )
+
+        response_dict = self.client.get(response_dict["previous"]).json()
+        self.assertEqual(
+            [item["pk"] for item in response_dict["results"]], pk_list[50:100]
+        )
+
+
+class MetricsTest(FakePortoneMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category)
+
+    def get_sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_portone_metrics(self):
+        order = create_order(self.user, [self.product])
+        payment = OrderPayment.create_by_order(order)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=1000)
+
+        find_count = self.get_sample(
+            "portone_request_duration_seconds_count", operation="find"
+        )
+        error_count = self.get_sample(
+            "portone_request_errors_total", operation="find", error="HttpError"
+        )
+        changed_count = self.get_sample(
+            "mall_order_transitions_total", status="paid", result="changed"
+        )
+
+        payment.update()
+        with self.assertRaises(Iamport.HttpError):
+            get_portone_client().find(merchant_uid=uuid4().hex)
+
+        self.assertEqual(
+            self.get_sample("portone_request_duration_seconds_count", operation="find"),
+            find_count + 2,
+        )
+        self.assertEqual(
+            self.get_sample(
+                "portone_request_errors_total", operation="find", error="HttpError"
+            ),
+            error_count + 1,
+        )
+        self.assertEqual(
+            self.get_sample(
+                "mall_order_transitions_total", status="paid", result="changed"
+            ),
+            changed_count + 1,
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("product_list"))
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "portone_request_duration_seconds")
+        self.assertContains(
+            response,
+            'mall_view_duration_seconds_count{method="GET",view="product_list"}',
+        )
+
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer invalid"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_access(self):
+        # 리버스 프록시를 거친 요청도 127.0.0.1에서 오므로 기본값으로는 허용하지 않음
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"]):
+            response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 200)
+
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    async def test_async_view_duration(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(get_response)))
+
+        order = await sync_to_async(create_order)(self.user, [self.product])
+        payment = await sync_to_async(OrderPayment.create_by_order)(order)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=1000)
+        labels = {"view": "order_check_async", "method": "GET"}
+        view_count = self.get_sample("mall_view_duration_seconds_count", **labels)
+
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(
+            reverse("order_check_async", args=[order.pk, payment.pk])
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.get_sample("mall_view_duration_seconds_count", **labels),
+            view_count + 1,
+        )
+
+
+@override_settings(
+    PORTONE_READ_TIMEOUT=0.2,
+    PORTONE_FIND_RETRIES=2,
+    PORTONE_RETRY_BACKOFF=0,
+    PORTONE_CIRCUIT_MIN_CALLS=2,
+    PORTONE_CIRCUIT_WINDOW_SIZE=4,
+    PORTONE_CIRCUIT_RESET_TIMEOUT=60,
+)
+class PortoneResilienceTest(FakePortoneMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="password")
+        cls.category = Category.objects.create(name="분류")
+        cls.product = create_product(cls.category)
+
+    def setUp(self):
+        super().setUp()
+        self.order = create_order(self.user, [self.product])
+        self.payment = OrderPayment.create_by_order(self.order)
+        self.fake_portone.add_payment(self.payment.merchant_uid, amount=1000)
+
+    def count_requests(self, path):
+        return sum(1 for _, request_path in self.fake_portone.request_log if path in request_path)
+
+    @override_settings(PORTONE_CIRCUIT_MIN_CALLS=10)
+    def test_find_retries_server_error(self):
+        client = get_portone_client()
+        client.find(merchant_uid=self.payment.merchant_uid)  # 토큰 발급
+        self.fake_portone.fail_next(2)
+        response = client.find(merchant_uid=self.payment.merchant_uid)
+        self.assertEqual(response["status"], "paid")
+        self.assertEqual(self.count_requests("/payments/find/"), 4)
+
+    def test_cancel_is_not_retried(self):
+        client = get_portone_client()
+        client.find(merchant_uid=self.payment.merchant_uid)
+        self.fake_portone.fail_next(1)
+        with self.assertRaises(PortoneUnavailableError):
+            client.cancel("취소", merchant_uid=self.payment.merchant_uid)
+        self.assertEqual(self.count_requests("/payments/cancel"), 1)
+
+    def test_timeout(self):
+        self.fake_portone.latency = 0.5
+        started = time.monotonic()
+        with self.assertRaises(PortoneUnavailableError):
+            get_portone_client().find(merchant_uid=self.payment.merchant_uid)
+        # 재시도 2번을 포함해 read timeout(0.2초) 3번 이내에 실패
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_circuit_breaker(self):
+        client = get_portone_client()
+        self.fake_portone.failure_rate = 1.0
+        with self.assertRaises(PortoneUnavailableError):
+            client.find(merchant_uid=self.payment.merchant_uid)
+        self.assertTrue(client.circuit_breaker.is_open)
+
+        # 서킷이 열려 있는 동안에는 포트원을 호출하지 않음
+        request_count = len(self.fake_portone.request_log)
+        with self.assertRaises(PortoneUnavailableError):
+            client.find(merchant_uid=self.payment.merchant_uid)
+        self.assertEqual(len(self.fake_portone.request_log), request_count)
+
+        # reset_timeout이 지나면 시험 호출에 성공해 서킷을 닫음
+        self.fake_portone.failure_rate = 0
+        client.circuit_breaker.opened_at -= 60
+        client.find(merchant_uid=self.payment.merchant_uid)
+        self.assertFalse(client.circuit_breaker.is_open)
+
+    def test_order_check_pending_while_circuit_open(self):
+        get_portone_client().circuit_breaker.open()
+        self.client.force_login(self.user)
+        url = reverse("order_check", args=[self.order.pk, self.payment.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertContains(response, "결제 확인 중", status_code=503)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.pay_status, OrderPayment.PayStatus.READY)
+        self.assertEqual(self.fake_portone.request_log, [])
+
+    def test_order_check_async_pending_while_circuit_open(self):
+        get_portone_client().circuit_breaker.open()
+        self.client.force_login(self.user)
+        url = reverse("order_check_async", args=[self.order.pk, self.payment.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
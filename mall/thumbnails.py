@@ -0,0 +1,55 @@
+import logging
+
+from django.conf import settings
+from sorl.thumbnail import delete, get_thumbnail
+
+logger = logging.getLogger(__name__)
+
+
+def generate_product_thumbnails(photo) -> int:
+    """
+    settings.PRODUCT_THUMBNAIL_LIST의 모든 크기로 썸네일을 생성합니다.
+    sorl-thumbnail은 kvstore나 스토리지에 이미 있는 썸네일은 원본을 읽지 않고 건너뜁니다.
+    photo는 ImageFieldFile 또는 스토리지 경로 문자열입니다.
+    """
+    count = 0
+    for geometry, options in settings.PRODUCT_THUMBNAIL_LIST:
+        get_thumbnail(photo, geometry, **options)
+        count += 1
+    return count
+
+
+def delete_product_photo(photo) -> None:
+    """사진 파일과 sorl-thumbnail이 만든 썸네일 파일, kvstore 정보를 함께 삭제합니다."""
+    delete(photo)
+
+
+def get_photo_name(instance):
+    # photo를 지연 로딩(defer)한 경우 접근하면 쿼리가 실행되므로 __dict__에서 직접 읽음
+    photo = instance.__dict__.get("photo")
+    return getattr(photo, "name", photo)
+
+
+def remember_photo_name(sender, instance, **kwargs):
+    # 저장 시 사진이 바뀌었는지 비교할 수 있도록 DB에서 읽은(또는 생성 시 지정한) 사진 이름을 기억
+    instance._loaded_photo_name = get_photo_name(instance)
+
+
+def generate_thumbnails_on_save(sender, instance, update_fields=None, **kwargs):
+    # 첫 방문자가 요청 중에 썸네일 생성 비용을 치르지 않도록 사진 저장 시점에 미리 생성
+    if not instance.photo:
+        return
+    if update_fields is not None and "photo" not in update_fields:
+        return
+    # 사진이 바뀌지 않은 저장(이름, 가격 수정 등)에서는 생성하지 않음
+    photo_name = instance.photo.name
+    if not kwargs.get("created") and photo_name == getattr(
+        instance, "_loaded_photo_name", None
+    ):
+        return
+    instance._loaded_photo_name = photo_name
+
+    try:
+        generate_product_thumbnails(instance.photo)
+    except Exception as e:
+        logger.error("썸네일 생성 실패 (%s): %s", photo_name, e, exc_info=e)
@@ -1,9 +1,22 @@
 from django.urls import path
 from . import views
 
+# URL 이름별로 요청 1번에 허용하는 SQL 쿼리 수 (세션, 사용자 조회 포함)
+# 예산을 넘으면 QueryBudgetMiddleware가 경고 로그를 남기고, mall.tests.QueryBudgetTest가 실패
+QUERY_BUDGET_DICT = {
+    "product_list": 4,
+    "cart_detail": 3,
+    "product_list_json": 3,
+    "order_list": 3,
+    "order_detail": 4,
+    "order_pay": 6,
+}
+
 urlpatterns = [
     path("", views.product_list, name="product_list"),
+    path("products.json", views.product_list_json, name="product_list_json"),
     path("cart/<int:product_pk>/add/", views.add_to_cart, name="add_to_cart"),
+    path("cart/add/", views.add_to_cart_batch, name="add_to_cart_batch"),
     path("cart/", views.cart_detail, name="cart_detail"),
     path("order/new/", views.order_new, name="order_new"),
     path("order/<int:pk>/pay/", views.order_pay, name="order_pay"),
@@ -13,5 +26,12 @@ urlpatterns = [
         views.order_check,
         name="order_check",
     ),
+    path(
+        "order/<int:order_pk>/check/<int:payment_pk>/async/",
+        views.order_check_async,
+        name="order_check_async",
+    ),
     path("order/<int:pk>/", views.order_detail, name="order_detail"),
+    path("portone/webhook/", views.portone_webhook, name="portone_webhook"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
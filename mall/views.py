@@ -1,15 +1,46 @@
+import json
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
 from django.forms import modelformset_factory
-from django.http import HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views.generic import ListView
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 
 from django.conf import settings
+from mall import catalog_cache
+from mall.metrics import CONTENT_TYPE_LATEST, generate_metrics
 from mall.forms import CartProductForm
-from mall.models import CartProduct, Order, OrderPayment, Product
+from mall.models import CartProduct, Order, OrderPayment, OutOfStockError, Product
+from mall.paginator import (
+    CountlessPaginator,
+    CursorPaginator,
+    EstimatedCountPaginator,
+    InvalidCursor,
+    get_cursor_url,
+)
+from mall.portone import PortoneUnavailableError
+from mall.search import search_products
+
+
+# 포트원 장애로 결제 확인이 지연될 때 다시 확인할 때까지 기다릴 시간(초)
+PAYMENT_PENDING_RETRY_AFTER = 5
+
+ORDER_LIST_PAGE_SIZE = 20
+PRODUCT_LIST_JSON_PAGE_SIZE = 50
 
 
 # Create your views here.
@@ -25,13 +56,56 @@ class ProductListView(ListView):
     )
     paginate_by = 12
 
+    def get(self, request, *args, **kwargs):
+        page = request.GET.get(self.page_kwarg) or 1
+        query = request.GET.get("query", "")
+
+        # 캐시된 조각이 있으면 상품 조회, COUNT, 썸네일 렌더링을 모두 생략
+        product_list_html = catalog_cache.get_cached_product_list(page, query)
+        if product_list_html is None:
+            self.object_list = self.get_queryset()
+            context = self.get_context_data()
+            product_list_html = render_to_string(
+                "mall/_product_list.html", context, request=request
+            )
+            catalog_cache.set_cached_product_list(page, query, product_list_html)
+
+        return render(
+            request,
+            "mall/product_list.html",
+            {"product_list_html": mark_safe(product_list_html)},
+        )
+
     def get_queryset(self):
         qs = super().get_queryset()
         query = self.request.GET.get("query", "")
         if query:
-            qs = qs.filter(name__icontains=query)
+            qs = search_products(qs, query)
         return qs
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 캐시된 조각을 모든 요청이 공유하므로 페이지 링크에는 검색어만 남김
+        pagination_url = reverse("product_list")
+        query = self.request.GET.get("query", "")
+        if query:
+            pagination_url += "?" + urlencode({"query": query})
+        context["pagination_url"] = pagination_url
+        return context
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        # 검색 결과는 COUNT 없이 다음 페이지 여부만 확인
+        if self.request.GET.get("query", ""):
+            return CountlessPaginator(queryset, per_page, **kwargs)
+        # 전체 목록의 건수는 상품이 바뀌면 올라가는 카탈로그 버전으로 캐시
+        return EstimatedCountPaginator(
+            queryset,
+            per_page,
+            count_cache_key=catalog_cache.get_product_count_cache_key(),
+            count_cache_timeout=settings.CATALOG_CACHE_TIMEOUT,
+            **kwargs,
+        )
+
 
 product_list = ProductListView.as_view()
 
@@ -61,22 +135,26 @@ def cart_detail(request):
     return render(request, "mall/cart_detail.html", {"formset": formset})
 
 
+# BigAutoField pk와 PositiveIntegerField 수량의 최댓값
+MAX_PK = 2**63 - 1
+MAX_QUANTITY = 2**31 - 1
+
+
 @login_required
 @require_POST
 def add_to_cart(request, product_pk):
-    user = request.user
-    product_qs = Product.objects.filter(status=Product.Status.ACTIVE)
-    product = get_object_or_404(product_qs, pk=product_pk)
-
-    quantity = int(request.GET.get("quantity", 1))
-
-    cart_product, is_created = CartProduct.objects.get_or_create(
-        user=user, product=product, defaults={"quantity": quantity}
-    )
-
-    if not is_created:
-        cart_product.quantity += quantity
-        cart_product.save()
+    try:
+        quantity = int(request.GET.get("quantity", 1))
+    except ValueError:
+        quantity = 0
+    if not 1 <= quantity <= MAX_QUANTITY:
+        return JsonResponse({"message": "invalid quantity"}, status=400)
+    if product_pk > MAX_PK:
+        raise Http404
+
+    # 판매중인 상품인지 확인하고 담는 것까지 쿼리 1번 (동시에 담아도 수량이 유실되지 않음)
+    if not CartProduct.add_products(request.user, {product_pk: quantity}):
+        raise Http404
 
     # messages.success(request, "장바구니에 추가했습니다.")
 
@@ -85,11 +163,85 @@ def add_to_cart(request, product_pk):
     return JsonResponse({"statusCode": 200})
 
 
+@login_required
+@require_POST
+def add_to_cart_batch(request):
+    """
+    여러 상품을 한 번에 장바구니에 담습니다.
+    {"items": [{"product_pk": 1, "quantity": 2}, ...]}
+    """
+    try:
+        item_list = json.loads(request.body)["items"]
+        if len(item_list) > settings.CART_BATCH_MAX_ITEMS:
+            return JsonResponse({"message": "too many items"}, status=400)
+        quantity_dict = {}
+        for item in item_list:
+            product_pk = int(item["product_pk"])
+            quantity = int(item.get("quantity", 1))
+            # DB 정수 범위를 넘는 값은 쿼리 실행 중 OverflowError가 발생하므로 미리 거절
+            if not (1 <= product_pk <= MAX_PK and 1 <= quantity <= MAX_QUANTITY):
+                raise ValueError
+            # 같은 상품이 여러 번 있으면 수량을 합침
+            quantity_dict[product_pk] = quantity_dict.get(product_pk, 0) + quantity
+            if quantity_dict[product_pk] > MAX_QUANTITY:
+                raise ValueError
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({"message": "invalid items"}, status=400)
+
+    added_count = CartProduct.add_products(request.user, quantity_dict)
+    return JsonResponse({"statusCode": 200, "added": added_count})
+
+
+def product_list_json(request):
+    """판매중 상품 목록 JSON. 응답의 next/previous URL로 다음/이전 페이지를 조회"""
+    qs = Product.objects.filter(status=Product.Status.ACTIVE).select_related(
+        "category"
+    )
+    try:
+        page = CursorPaginator(qs, PRODUCT_LIST_JSON_PAGE_SIZE).page(
+            request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        raise Http404
+
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "pk": product.pk,
+                    "category": product.category.name,
+                    "name": product.name,
+                    "price": product.price,
+                    "photo": product.photo.url if product.photo else None,
+                }
+                for product in page
+            ],
+            "next": get_cursor_url(request, page.next_cursor),
+            "previous": get_cursor_url(request, page.previous_cursor),
+        }
+    )
+
+
 @login_required
 def order_list(request):
     user = request.user
     order_qs = Order.objects.filter(user=user)
-    return render(request, "mall/order_list.html", {"order_list": order_qs})
+    try:
+        page = CursorPaginator(order_qs, ORDER_LIST_PAGE_SIZE).page(
+            request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        raise Http404
+
+    return render(
+        request,
+        "mall/order_list.html",
+        {
+            "order_list": page,
+            "next_url": get_cursor_url(request, page.next_cursor),
+            "previous_url": get_cursor_url(request, page.previous_cursor),
+        },
+    )
 
 
 @login_required
@@ -97,9 +249,12 @@ def order_new(request):
     user = request.user
     cart_product_qs = CartProduct.objects.filter(user=user)
 
-    # 주문 생성 -> 장바구니 삭제
-    order = Order.create_from_cart(user=user, cart_product_ps=cart_product_qs)
-    cart_product_qs.delete()
+    # 주문 생성과 재고 예약, 장바구니 삭제를 한 트랜잭션으로 처리
+    try:
+        order = Order.create_from_cart(user=user, cart_product_ps=cart_product_qs)
+    except OutOfStockError as e:
+        messages.error(request, str(e))
+        return redirect("cart_detail")
 
     return redirect("order_pay", order.pk)
 
@@ -114,8 +269,16 @@ def order_pay(request, pk):
         # return redirect("order_detail", order.pk)
         return redirect(order)
 
-    # order로부터 payment 생성
-    payment = OrderPayment.create_by_order(order)
+    if order.status == Order.Status.FAILED_PAYMEMT:
+        # 결제 실패로 반환된 재고를 다시 예약하고 주문 요청 상태로 변경
+        try:
+            order.reopen()
+        except OutOfStockError as e:
+            messages.error(request, str(e))
+            return redirect(order)
+
+    # order로부터 payment 생성 (결제 준비 중인 결제가 있으면 재사용)
+    payment = OrderPayment.get_or_create_by_order(order)
 
     payment_props = {
         "pg": settings.PORTONE_PG,
@@ -132,7 +295,10 @@ def order_pay(request, pk):
         {
             "payment_props": payment_props,
             "portone_shop_id": settings.PORTONE_SHOP_ID,
-            "next_url": reverse("order_check", args=[order.pk, payment.pk]),
+            "next_url": reverse(
+                "order_check_async" if settings.PORTONE_ASYNC_CHECK else "order_check",
+                args=[order.pk, payment.pk],
+            ),
         },
     )
 
@@ -140,7 +306,47 @@ def order_pay(request, pk):
 @login_required
 def order_check(request, order_pk, payment_pk):
     payment = get_object_or_404(OrderPayment, pk=payment_pk, order__user=request.user)
-    payment.update()
+    # 웹훅으로 이미 결제 상태가 반영된 경우 포트원 조회 생략
+    if payment.pay_status == OrderPayment.PayStatus.READY:
+        try:
+            payment.update()
+        except PortoneUnavailableError:
+            return render_payment_pending(request, payment)
+    return redirect(payment.order)
+
+
+def render_payment_pending(request, payment):
+    # 포트원 장애로 결제를 확인하지 못한 경우. 결제 결과는 웹훅이나 reconcile_payments로 반영되고,
+    # 사용자는 잠시 후 같은 주소로 다시 확인
+    response = render(
+        request,
+        "mall/order_pending.html",
+        {"order": payment.order, "retry_after": PAYMENT_PENDING_RETRY_AFTER},
+        status=503,
+    )
+    response["Retry-After"] = str(PAYMENT_PENDING_RETRY_AFTER)
+    return response
+
+
+# ASGI 환경에서 포트원 응답을 기다리는 동안 워커 스레드를 점유하지 않는 order_check
+# Django 4.2의 login_required는 비동기 뷰를 지원하지 않아 직접 인증 여부를 확인
+async def order_check_async(request, order_pk, payment_pk):
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        payment = await OrderPayment.objects.select_related("order").aget(
+            pk=payment_pk, order__user=user
+        )
+    except OrderPayment.DoesNotExist:
+        raise Http404("결제내역을 찾을 수 없습니다.")
+
+    if payment.pay_status == OrderPayment.PayStatus.READY:
+        try:
+            await payment.aupdate()
+        except PortoneUnavailableError:
+            return await sync_to_async(render_payment_pending)(request, payment)
     return redirect(payment.order)
 
 
@@ -148,3 +354,78 @@ def order_check(request, order_pk, payment_pk):
 def order_detail(request, pk):
     order = get_object_or_404(Order, pk=pk, user=request.user)
     return render(request, "mall/order_detail.html", {"order": order})
+
+
+def get_webhook_payment(uid: UUID):
+    # mall이 다른 앱의 결제 모델에 의존하지 않도록 설정에 등록된 모델에서 조회
+    for model_label in settings.PORTONE_WEBHOOK_PAYMENT_MODELS:
+        payment = apps.get_model(model_label).objects.filter(uid=uid).first()
+        if payment is not None:
+            return payment
+    return None
+
+
+# 포트원 웹훅 (https://developers.portone.io/docs/ko/result/webhook)
+# 웹훅 내용은 신뢰하지 않고 merchant_uid로 결제를 찾아 포트원 API로 다시 조회해 반영
+@csrf_exempt
+@require_POST
+def portone_webhook(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"message": "invalid json"}, status=400)
+    else:
+        data = request.POST
+
+    try:
+        uid = UUID(data.get("merchant_uid", ""))
+    except ValueError:
+        return JsonResponse({"message": "invalid merchant_uid"}, status=400)
+
+    payment = get_webhook_payment(uid)
+    if payment is None:
+        return JsonResponse({"message": "payment not found"}, status=404)
+
+    # 포트원은 같은 알림을 여러 번 보낼 수 있으므로, 포트원 API로 확인한 상태의 알림은 다시 처리하지 않음
+    # (알림 내용은 검증 전이므로 확인한 상태로만 기록해 위조된 알림이 실제 알림을 막지 못하도록 함)
+    dedup_key_prefix = f"portone:webhook:{uid.hex}"
+    if cache.get(f"{dedup_key_prefix}:{data.get('status', '')}"):
+        return JsonResponse({"message": "duplicated"})
+
+    # 같은 결제의 알림이 동시에 오면 하나만 처리하고 나머지는 포트원이 다시 보내도록 함
+    lock_key = f"{dedup_key_prefix}:lock"
+    if not cache.add(lock_key, True, timeout=60):
+        return JsonResponse({"message": "in progress"}, status=409)
+
+    try:
+        status = payment.update_by_webhook()
+    except (Http404, PortoneUnavailableError):
+        # 포트원 조회에 실패한 알림은 재전송 시 다시 처리되도록 함
+        return JsonResponse({"message": "portone lookup failed"}, status=502)
+    finally:
+        cache.delete(lock_key)
+
+    cache.set(
+        f"{dedup_key_prefix}:{status}",
+        True,
+        timeout=settings.PORTONE_WEBHOOK_DEDUP_TIMEOUT,
+    )
+    return JsonResponse({"message": "ok"})
+
+
+def is_metrics_allowed(request) -> bool:
+    if request.user.is_staff:
+        return True
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if constant_time_compare(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            return True
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+# Prometheus 수집 (METRICS_TOKEN, 스태프 계정 또는 METRICS_ALLOWED_IPS에서만 조회 가능)
+def metrics(request):
+    if not is_metrics_allowed(request):
+        return HttpResponse(status=403)
+    return HttpResponse(generate_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -1,11 +1,13 @@
 import logging
 from uuid import uuid4
-from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.http import Http404
 from iamport import Iamport
 
+from mall.portone import get_async_portone_client, get_portone_client
+
 logger = logging.getLogger("portone")
 
 
@@ -17,7 +19,7 @@ class Payment(models.Model):
         CANCELLED = "cancelled", "결제취소"
         FAILED = "failed", "결제실패"
 
-    uid = models.UUIDField(default=uuid4, editable=False)
+    uid = models.UUIDField(default=uuid4, editable=False, unique=True)
     name = models.CharField(max_length=100)
     amount = models.PositiveIntegerField(
         validators=[MinValueValidator(1, message="1원 이상의 금액을 지정해주세요.")]
@@ -36,18 +38,34 @@ class Payment(models.Model):
 
     # portOne rest api를 통해 결제 검증
     def portone_check(self, commit=True):
-        api = Iamport(
-            imp_key=settings.PORTONE_API_KEY, imp_secret=settings.PORTONE_API_SECRET
-        )
+        api = get_portone_client()
         try:
             meta = api.find(merchant_uid=self.merchant_uid)
-            self.status = meta["status"]
-            self.is_paid_ok = meta["status"] == "paid" and meta["amount"] == self.amount
+        except (Iamport.ResponseError, Iamport.HttpError) as e:
+            logger.error(str(e), exc_info=e)
+            raise Http404(str(e))
+
+        self.apply_meta(meta, commit=commit)
 
+    def update_by_webhook(self) -> str:
+        """포트원 웹훅을 받았을 때 포트원 API로 다시 조회해 반영하고, 조회한 결제 상태를 반환"""
+        self.portone_check()
+        return self.status
+
+    async def aportone_check(self, commit=True):
+        api = get_async_portone_client()
+        try:
+            meta = await api.find(merchant_uid=self.merchant_uid)
         except (Iamport.ResponseError, Iamport.HttpError) as e:
             logger.error(str(e), exc_info=e)
             raise Http404(str(e))
 
+        await sync_to_async(self.apply_meta)(meta, commit=commit)
+
+    def apply_meta(self, meta, commit=True):
+        self.status = meta["status"]
+        self.is_paid_ok = meta["status"] == "paid" and meta["amount"] == self.amount
+
         # TODO: meta 속성을 JSONField로 저장
 
         if commit:
@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from mall.fake_portone import FakePortone
+from mall_test.models import Payment
+
+
+class PaymentCheckTest(TestCase):
+    def setUp(self):
+        self.fake_portone = FakePortone().start()
+        self.addCleanup(self.fake_portone.stop)
+        settings_override = override_settings(PORTONE_API_URL=self.fake_portone.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_payment_check(self):
+        payment = Payment.objects.create(name="결제", amount=1000)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=1000)
+
+        self.client.get(reverse("payment_check", args=[payment.pk]))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PAID)
+        self.assertTrue(payment.is_paid_ok)
+
+    def test_payment_check_async(self):
+        payment = Payment.objects.create(name="결제", amount=1000)
+        self.fake_portone.add_payment(payment.merchant_uid, amount=500)
+
+        self.client.get(reverse("payment_check_async", args=[payment.pk]))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PAID)
+        self.assertFalse(payment.is_paid_ok)
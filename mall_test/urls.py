@@ -5,5 +5,10 @@ urlpatterns = [
     path("payment/new/", views.payment_new, name="payment_new"),
     path("payment/<int:pk>/pay/", views.payment_pay, name="payment_pay"),
     path("payment/<int:pk>/check/", views.payment_check, name="payment_check"),
+    path(
+        "payment/<int:pk>/check/async/",
+        views.payment_check_async,
+        name="payment_check_async",
+    ),
     path("payment/<int:pk>/", views.payment_detail, name="payment_detail"),
 ]
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
@@ -26,7 +27,10 @@ def payment_pay(request, pk):
         "name": payment.name,
         "amount": payment.amount,
     }
-    payment_check_url = reverse("payment_check", args=[payment.pk])
+    payment_check_url = reverse(
+        "payment_check_async" if settings.PORTONE_ASYNC_CHECK else "payment_check",
+        args=[payment.pk],
+    )
     portone_shop_id = settings.PORTONE_SHOP_ID
 
     return render(
@@ -42,7 +46,18 @@ def payment_pay(request, pk):
 
 def payment_check(request, pk):
     payment = get_object_or_404(Payment, pk=pk)
-    payment.portone_check()
+    if payment.status == Payment.StatusChoices.READY:
+        payment.portone_check()
+    return redirect("payment_detail", pk=payment.pk)
+
+
+async def payment_check_async(request, pk):
+    try:
+        payment = await Payment.objects.aget(pk=pk)
+    except Payment.DoesNotExist:
+        raise Http404("결제내역을 찾을 수 없습니다.")
+    if payment.status == Payment.StatusChoices.READY:
+        await payment.aportone_check()
     return redirect("payment_detail", pk=payment.pk)
 
 